@@ -1,14 +1,342 @@
+from contextlib import asynccontextmanager, contextmanager
 from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from kubernetes import client, config
-from fastapi.responses import PlainTextResponse
-import yaml
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+import asyncio
+import contextvars
+import hashlib
+import json
+import math
 import os
+from functools import partial
 
-app = FastAPI()
+import urllib3
 
-# Load Kubernetes in-cluster config
-config.load_incluster_config()
-v1 = client.CoreV1Api()
+import formats
+import metrics
+import shared
+import snapshot
+from cache import LastGoodCache, RenderCache, SingleFlight, TTLCache, ValueInterner
+from changes import ChangeFeed, CursorExpired
+from entities import EntityIndex, configmap_documents, configmap_text, value_documents
+from refresh import RefreshNotifier
+from resilience import CircuitBreaker, TokenBucket
+from informer import (
+    ConfigMapInformer, NamespacedInformer, list_config_map_metadata, list_pages, list_scopes,
+)
+
+LABEL_SELECTOR = "eda.io/backstage-catalog=true"
+
+# Serve from a list/watch cache instead of calling the API server per request
+WATCH_ENABLED = os.environ.get("CATALOG_API_WATCH", "true").lower() == "true"
+
+# Make per-request API calls with kubernetes_asyncio instead of the threadpool
+ASYNC_CLIENT = os.environ.get("CATALOG_API_ASYNC", "false").lower() == "true"
+ASYNC_POOL_SIZE = int(os.environ.get("CATALOG_API_ASYNC_POOL_SIZE", "100"))
+
+# Namespace-scoped mode: only read ConfigMaps in these namespaces (comma
+# separated), or in the namespaces labelled with CATALOG_API_NAMESPACE_SELECTOR,
+# instead of cluster-wide. Each namespace gets its own list/watch.
+NAMESPACES = [
+    ns.strip() for ns in os.environ.get("CATALOG_API_NAMESPACES", "").split(",") if ns.strip()
+]
+NAMESPACE_SELECTOR = os.environ.get("CATALOG_API_NAMESPACE_SELECTOR", "")
+
+# LIST in chunks of this many ConfigMaps (0 = single unpaginated LIST). A
+# page is decoded whole, so with ConfigMaps of up to 1 MiB each, a page can
+# take this many MiB of memory at once.
+PAGE_SIZE = int(os.environ.get("CATALOG_API_PAGE_SIZE", "50"))
+
+# List the root Location's targets as PartialObjectMetadata (no ConfigMap data)
+METADATA_ONLY = os.environ.get("CATALOG_API_METADATA_ONLY", "false").lower() == "true"
+
+# "configmaps": the root Location lists one target per ConfigMap
+# "aggregate": it lists the single multi-document /all target instead
+# "namespaces": it lists one /{namespace}/ Location per namespace, each
+# listing that namespace's ConfigMaps, so Backstage can process namespaces
+# independently and a change only alters its own namespace's Location
+ROOT_TARGETS = os.environ.get("CATALOG_API_ROOT_TARGETS", "configmaps")
+
+# Longest metadata.name Backstage accepts for the Locations served here
+LOCATION_NAME_MAX = 63
+
+# Cache direct ConfigMap reads; 404s are kept for a shorter time (0 disables)
+READ_CACHE_TTL = float(os.environ.get("CATALOG_API_READ_CACHE_TTL", "30"))
+READ_CACHE_NEGATIVE_TTL = float(os.environ.get("CATALOG_API_READ_CACHE_NEGATIVE_TTL", "5"))
+READ_CACHE_MAX_BYTES = int(os.environ.get("CATALOG_API_READ_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Rough per-entry overhead charged against the read cache, on top of the data
+ENTRY_OVERHEAD_BYTES = 512
+
+# ConfigMaps with more data than this are streamed one value at a time
+# instead of being rendered into the response cache
+STREAM_MIN_BYTES = int(os.environ.get("CATALOG_API_STREAM_MIN_BYTES", str(256 * 1024)))
+
+# Rendered response bodies kept, in bytes (LRU)
+RENDER_CACHE_MAX_BYTES = int(
+    os.environ.get("CATALOG_API_RENDER_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+)
+
+# Changes remembered for GET /-/changes; older cursors get 410 Gone
+CHANGES_MAX_EVENTS = int(os.environ.get("CATALOG_API_CHANGES_MAX_EVENTS", "10000"))
+
+# Longest a GET /-/changes?wait= long-poll is held open, in seconds
+CHANGES_MAX_WAIT = float(os.environ.get("CATALOG_API_CHANGES_MAX_WAIT", "60"))
+
+# Idle Server-Sent Events streams get a comment this often, in seconds
+SSE_HEARTBEAT = 15
+
+# At most this many Kubernetes API calls per second from request handlers,
+# in bursts of RATE_LIMIT_BURST (0 disables). A call that would wait more
+# than RATE_LIMIT_MAX_WAIT seconds for its turn fails instead.
+RATE_LIMIT_QPS = float(os.environ.get("CATALOG_API_RATE_LIMIT_QPS", "50"))
+RATE_LIMIT_BURST = int(os.environ.get("CATALOG_API_RATE_LIMIT_BURST", "100"))
+RATE_LIMIT_MAX_WAIT = float(os.environ.get("CATALOG_API_RATE_LIMIT_MAX_WAIT", "1"))
+
+# Stop calling the API server after this many consecutive failures, and try
+# again after BREAKER_RESET seconds; meanwhile serve the last good response
+BREAKER_FAILURES = int(os.environ.get("CATALOG_API_BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.environ.get("CATALOG_API_BREAKER_RESET", "30"))
+
+# Give up on a per-request API call after this many seconds, so a slow API
+# server counts as failing instead of holding requests (and threads) open
+REQUEST_TIMEOUT = float(os.environ.get("CATALOG_API_REQUEST_TIMEOUT", "10"))
+STALE_MAX_BYTES = int(os.environ.get("CATALOG_API_STALE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Save the informer's ConfigMaps here on shutdown and every
+# CATALOG_API_SNAPSHOT_INTERVAL seconds, and serve from it on start while
+# the watch catches up ("" disables)
+SNAPSHOT_PATH = os.environ.get("CATALOG_API_SNAPSHOT_PATH", "")
+SNAPSHOT_INTERVAL = float(os.environ.get("CATALOG_API_SNAPSHOT_INTERVAL", "300"))
+
+# Multi-worker mode (uvicorn --workers, or WEB_CONCURRENCY): the first worker
+# to lock this file watches the ConfigMaps and publishes them to it at most
+# every CATALOG_API_SHARED_INTERVAL seconds; the others serve the published
+# file, memory-mapped, instead of watching themselves. Use tmpfs ("" disables).
+SHARED_PATH = os.environ.get("CATALOG_API_SHARED_PATH", "")
+SHARED_INTERVAL = float(os.environ.get("CATALOG_API_SHARED_INTERVAL", "1"))
+
+# Push changes to Backstage: when the informer sees a ConfigMap change, call
+# the catalog refresh API at CATALOG_API_REFRESH_URL (Backstage's
+# .../api/catalog) for the Locations affected, batched over
+# CATALOG_API_REFRESH_WINDOW seconds ("" disables). Targets are built from
+# CATALOG_API_REFRESH_BASE_URL, the URL Backstage reaches this service at,
+# and CATALOG_API_REFRESH_TOKEN is sent as a bearer token if set.
+REFRESH_URL = os.environ.get("CATALOG_API_REFRESH_URL", "")
+REFRESH_BASE_URL = os.environ.get("CATALOG_API_REFRESH_BASE_URL", "").rstrip("/")
+REFRESH_TOKEN = os.environ.get("CATALOG_API_REFRESH_TOKEN", "")
+REFRESH_WINDOW = float(os.environ.get("CATALOG_API_REFRESH_WINDOW", "2"))
+
+# Created in lifespan, so importing the app needs no cluster
+v1 = None
+informer = None
+aio = None
+render_cache = RenderCache(RENDER_CACHE_MAX_BYTES)
+read_cache = TTLCache(READ_CACHE_MAX_BYTES)
+flights = SingleFlight()
+last_good = LastGoodCache(STALE_MAX_BYTES)
+bucket = TokenBucket(RATE_LIMIT_QPS, RATE_LIMIT_BURST)
+breaker = CircuitBreaker(BREAKER_FAILURES, BREAKER_RESET)
+# Set while call_upstream runs, so calls nested in it skip the breaker
+in_upstream_call = contextvars.ContextVar("in_upstream_call", default=False)
+change_feed = ChangeFeed(CHANGES_MAX_EVENTS)
+entity_index = EntityIndex()
+interner = ValueInterner()
+watcher_lock = None
+shared_generation = None
+notifier = None
+shared_entities_indexed = False
+# ConfigMap names per namespace as the refresh listener has seen them, and
+# whether it has seen the informer synced (after which changes are pushed)
+refresh_namespaces = {}
+refresh_live = False
+
+
+def snapshot_scope():
+    return {
+        "labelSelector": LABEL_SELECTOR,
+        "namespaces": NAMESPACES,
+        "namespaceSelector": NAMESPACE_SELECTOR,
+    }
+
+
+def save_snapshot():
+    # Before the first sync there's nothing worth keeping
+    if informer.synced:
+        snapshot.save(SNAPSHOT_PATH, snapshot_scope(), informer.snapshot())
+
+
+async def save_snapshots():
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL)
+        await run_in_threadpool(save_snapshot)
+
+
+def publish_shared():
+    global shared_generation
+    generation = shared.publish(SHARED_PATH, informer.list(), change_feed.snapshot())
+    if generation is not None:
+        shared_generation = generation
+
+
+async def publish_shared_changes():
+    """Watcher: publish the ConfigMaps whenever the change feed has moved."""
+    published = None
+    while True:
+        cursor = change_feed.cursor()
+        if informer.synced and cursor != published:
+            await run_in_threadpool(publish_shared)
+            published = cursor
+        await asyncio.sleep(SHARED_INTERVAL)
+
+
+async def refresh_shared():
+    global shared_generation
+    if await run_in_threadpool(informer.refresh):
+        shared_generation = informer.generation
+        if informer.changes is not None:
+            change_feed.restore(informer.changes)
+
+
+async def index_shared_entities():
+    global shared_entities_indexed
+    await run_in_threadpool(informer.add_listener, entity_index.on_change, True)
+    shared_entities_indexed = True
+
+
+async def follow_shared():
+    """Worker: pick up each file the watcher publishes."""
+    while True:
+        await asyncio.sleep(SHARED_INTERVAL)
+        await refresh_shared()
+
+
+def refresh_targets(event_type, key, namespaces_changed=True):
+    """Location targets Backstage has to re-read after a ConfigMap event:
+    the ConfigMap's own, and the Locations listing it when it came or went.
+    With per-namespace roots, the root itself only lists namespaces, so it
+    is only included when ``namespaces_changed``."""
+    namespace, name = key
+    if ROOT_TARGETS == "aggregate":
+        return [f"{REFRESH_BASE_URL}/all"]
+    targets = [] if event_type == "DELETED" else [f"{REFRESH_BASE_URL}/{namespace}/{name}"]
+    if event_type in ("ADDED", "DELETED"):
+        if ROOT_TARGETS != "namespaces" or namespaces_changed:
+            targets.append(f"{REFRESH_BASE_URL}/")
+        if ROOT_TARGETS == "namespaces":
+            targets.append(f"{REFRESH_BASE_URL}/{namespace}/")
+    return targets
+
+
+def track_namespace(event_type, key):
+    """Record the event's ConfigMap under its namespace; return whether the
+    namespace gained its first ConfigMap or lost its last."""
+    namespace, name = key
+    names = refresh_namespaces.setdefault(namespace, set())
+    listed = bool(names)
+    if event_type == "DELETED":
+        names.discard(name)
+    else:
+        names.add(name)
+    if not names:
+        del refresh_namespaces[namespace]
+    return listed != bool(names)
+
+
+def notify_refresh(event_type, key, cm):
+    """Informer listener, registered before it starts so no change after the
+    sync is missed. Every event is tracked, but only those after the sync
+    are pushed to Backstage: the initial LIST isn't news."""
+    global refresh_live
+    namespaces_changed = track_namespace(event_type, key)
+    if not refresh_live:
+        if not informer.synced:
+            return
+        refresh_live = True
+    notifier.queue(refresh_targets(event_type, key, namespaces_changed))
+
+
+def load_kube_client():
+    """CoreV1Api with in-cluster credentials, or the local kubeconfig when
+    running outside a cluster."""
+    try:
+        config.load_incluster_config()
+    except config.ConfigException:
+        config.load_kube_config()
+    return client.CoreV1Api()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global informer, aio, v1, watcher_lock, notifier, refresh_live
+    if v1 is None:
+        v1 = load_kube_client()
+    if ASYNC_CLIENT:
+        from async_client import AsyncConfigMapClient
+        aio = await AsyncConfigMapClient.load(
+            pool_size=ASYNC_POOL_SIZE, request_timeout=REQUEST_TIMEOUT
+        )
+    if WATCH_ENABLED and SHARED_PATH:
+        watcher_lock = shared.WatcherLock(SHARED_PATH)
+    follower = watcher_lock is not None and not watcher_lock.acquire()
+    if follower:
+        # Another worker watches; render_cache only holds JSON renders here,
+        # YAML is served straight from the mapped file
+        informer = shared.SharedCatalog(SHARED_PATH)
+        informer.add_listener(render_cache.on_change)
+        await refresh_shared()
+    elif WATCH_ENABLED and (NAMESPACES or NAMESPACE_SELECTOR):
+        informer = NamespacedInformer(
+            v1, LABEL_SELECTOR, NAMESPACES, NAMESPACE_SELECTOR, page_size=PAGE_SIZE
+        )
+    elif WATCH_ENABLED:
+        informer = ConfigMapInformer(v1, LABEL_SELECTOR, page_size=PAGE_SIZE)
+    tasks = []
+    if follower:
+        tasks.append(asyncio.create_task(follow_shared()))
+    elif informer is not None:
+        # First, so the other listeners already see the shared values
+        informer.add_listener(interner.on_change)
+        informer.add_listener(render_cache.on_change)
+        informer.add_listener(metrics.on_configmap_event)
+        informer.add_listener(change_feed.on_change)
+        if isinstance(informer, ConfigMapInformer):
+            change_feed.follow(informer)
+        informer.add_listener(entity_index.on_change)
+        if REFRESH_URL:
+            notifier = RefreshNotifier(REFRESH_URL, REFRESH_TOKEN, REFRESH_WINDOW)
+            notifier.start()
+            refresh_namespaces.clear()
+            refresh_live = False
+            informer.add_listener(notify_refresh)
+        if SNAPSHOT_PATH:
+            state = snapshot.load(SNAPSHOT_PATH, snapshot_scope())
+            if state is not None:
+                informer.restore(state)
+        informer.start()
+        if SNAPSHOT_PATH:
+            tasks.append(asyncio.create_task(save_snapshots()))
+        if SHARED_PATH:
+            tasks.append(asyncio.create_task(publish_shared_changes()))
+    yield
+    for task in tasks:
+        task.cancel()
+    if notifier is not None:
+        notifier.stop()
+    if informer is not None and not follower:
+        informer.stop()
+        if SNAPSHOT_PATH:
+            save_snapshot()
+    if watcher_lock is not None:
+        watcher_lock.release()
+    if aio is not None:
+        await aio.close()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(metrics.MetricsMiddleware)
 
 
 def detect_scheme_host(request: Request):
@@ -17,46 +345,742 @@ def detect_scheme_host(request: Request):
     return proto, host
 
 
+def etag_matches(request: Request, etag: str):
+    """If-None-Match uses the weak comparison, so W/ prefixes are ignored."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in header.split(",")
+    )
+
+
+def not_modified(etag: str):
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def requested_range(request: Request, etag: str, size: int):
+    """(start, stop) of the single byte range the request asks for, or None
+    to send the whole body. start >= size means it can't be satisfied.
+
+    Malformed and multi-range headers are ignored, as is a Range whose
+    If-Range names a different version.
+    """
+    header = request.headers.get("range")
+    if not header or request.headers.get("if-range", etag) != etag:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            stop = int(last) + 1 if last else size
+            if last and stop <= start:
+                return None
+        else:
+            # bytes=-N: the last N bytes
+            length = int(last)
+            if length < 0:
+                return None
+            start, stop = (max(size - length, 0) if length else size), size
+    except ValueError:
+        return None
+    return start, min(stop, size)
+
+
+def ranged_response(request: Request, body, media_type, headers):
+    """``body`` whole (200), or the part a Range header asks for (206/416)."""
+    span = requested_range(request, headers["ETag"], len(body))
+    if span is None:
+        return Response(body, media_type=media_type, headers=headers)
+    start, stop = span
+    if start >= len(body):
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{len(body)}"})
+    return Response(
+        body[start:stop], status_code=206, media_type=media_type,
+        headers={**headers, "Content-Range": f"bytes {start}-{stop - 1}/{len(body)}"},
+    )
+
+
+def config_map_list_func(namespaces):
+    if namespaces is None:
+        return v1.list_config_map_for_all_namespaces
+    return v1.list_namespaced_config_map
+
+
+def list_config_map_refs(namespaces=None):
+    if METADATA_ONLY:
+        list_func = partial(list_config_map_metadata, v1)
+    else:
+        list_func = config_map_list_func(namespaces)
+
+    # Only the metadata of each page is kept; the page itself is dropped
+    return [
+        (cm.metadata.namespace, cm.metadata.name)
+        for scope in list_scopes(namespaces)
+        for page in list_pages(
+            list_func, LABEL_SELECTOR, PAGE_SIZE, _request_timeout=REQUEST_TIMEOUT, **scope
+        )
+        for cm in page.items
+    ]
+
+
+def list_config_maps(namespaces=None):
+    return [
+        cm
+        for scope in list_scopes(namespaces)
+        for page in list_pages(
+            config_map_list_func(namespaces), LABEL_SELECTOR, PAGE_SIZE,
+            _request_timeout=REQUEST_TIMEOUT, **scope,
+        )
+        for cm in page.items
+    ]
+
+
+def list_namespace_names():
+    found = v1.list_namespace(
+        label_selector=NAMESPACE_SELECTOR, _request_timeout=REQUEST_TIMEOUT
+    )
+    return [ns.metadata.name for ns in found.items]
+
+
+@contextmanager
+def transport_errors():
+    """Re-raise a failure to reach the API server (refused, timed out) as an
+    ApiException without a status, like the asyncio client does."""
+    try:
+        yield
+    except urllib3.exceptions.HTTPError as e:
+        raise client.exceptions.ApiException(reason=f"Kubernetes API unreachable: {e}") from e
+
+
+def upstream_failure(e):
+    """Whether an error says the API server is unwell, rather than answering."""
+    if not isinstance(e, client.exceptions.ApiException):
+        return True
+    return e.status is None or e.status == 429 or e.status >= 500
+
+
+async def call_upstream(fetch):
+    """Run one API call under the circuit breaker and rate limit.
+
+    Calls made from inside another (watched_namespaces within
+    fetch_catalog_refs) are only rate limited: the outer call already has
+    the breaker's permission, and its outcome is the one counted.
+    """
+    if in_upstream_call.get():
+        if not await bucket.acquire(RATE_LIMIT_MAX_WAIT):
+            raise client.exceptions.ApiException(status=429, reason="Rate limited")
+        return await fetch()
+    # Breaker first, so an open circuit fails fast without using up tokens
+    if not breaker.allow():
+        raise client.exceptions.ApiException(status=503, reason="Circuit open")
+    if not await bucket.acquire(RATE_LIMIT_MAX_WAIT):
+        breaker.abandon()
+        raise client.exceptions.ApiException(status=429, reason="Rate limited")
+    token = in_upstream_call.set(True)
+    try:
+        result = await fetch()
+    except Exception as e:
+        if upstream_failure(e):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        raise
+    except BaseException:
+        # Cancelled without an answer; a half-open breaker must not keep
+        # waiting for this trial call's outcome
+        breaker.record_failure()
+        raise
+    finally:
+        in_upstream_call.reset(token)
+    breaker.record_success()
+    return result
+
+
+async def fetch_upstream(key, fetch, size):
+    """Fetch once for all concurrent callers of ``key`` (single-flight).
+
+    Returns (result, None), or, when the API server is failing or the
+    breaker is open, (last good result, its age in seconds). Errors are
+    raised only if there was never a good result to fall back on.
+    """
+    try:
+        result = await flights.do(key, lambda: call_upstream(fetch))
+    except Exception as e:
+        stale = last_good.get(key) if upstream_failure(e) else None
+        if stale is None:
+            raise
+        return stale
+    last_good.put(key, result, size(result))
+    return result, None
+
+
+def refs_size(refs):
+    return ENTRY_OVERHEAD_BYTES + 128 * len(refs)
+
+
+async def fetch_namespaces():
+    with transport_errors(), metrics.kube_call("list"):
+        if aio is not None:
+            names = await aio.list_namespace_names(NAMESPACE_SELECTOR)
+        else:
+            names = await run_in_threadpool(list_namespace_names)
+    read_cache.put(("namespaces",), names, ENTRY_OVERHEAD_BYTES, READ_CACHE_TTL)
+    return names
+
+
+async def watched_namespaces():
+    """Namespaces in scope for direct API calls, or None for cluster-wide."""
+    if NAMESPACE_SELECTOR:
+        cached = read_cache.get(("namespaces",))
+        if cached is not None:
+            return cached
+        names, _ = await fetch_upstream(("namespaces",), fetch_namespaces, refs_size)
+        return names
+    return NAMESPACES or None
+
+
+async def fetch_catalog_configmaps():
+    namespaces = await watched_namespaces()
+    with transport_errors(), metrics.kube_call("list"):
+        if aio is not None:
+            return await aio.list_config_maps(LABEL_SELECTOR, PAGE_SIZE, namespaces)
+        return await run_in_threadpool(list_config_maps, namespaces)
+
+
+def configmaps_size(cms):
+    return sum(configmap_size(cm) for cm in cms)
+
+
+async def list_catalog_configmaps():
+    """(ConfigMaps, age in seconds if stale else None)."""
+    if informer is not None and informer.synced:
+        return informer.list(), None
+    return await fetch_upstream(("all",), fetch_catalog_configmaps, configmaps_size)
+
+
+async def fetch_catalog_refs(namespace=None):
+    namespaces = await watched_namespaces()
+    if namespace is not None:
+        if namespaces is not None and namespace not in namespaces:
+            return []
+        namespaces = [namespace]
+    with transport_errors(), metrics.kube_call("list"):
+        if aio is not None:
+            return await aio.list_config_map_refs(
+                LABEL_SELECTOR, PAGE_SIZE, METADATA_ONLY, namespaces
+            )
+        return await run_in_threadpool(list_config_map_refs, namespaces)
+
+
+async def list_catalog_refs(namespace=None):
+    """((namespace, name) pairs, age in seconds if stale else None), of every
+    watched namespace or just ``namespace``."""
+    # Until the informer has synced, fall back to asking the API server
+    if informer is not None and informer.synced:
+        refs = informer.keys()
+        if namespace is not None:
+            refs = [ref for ref in refs if ref[0] == namespace]
+        return refs, None
+    if namespace is None:
+        return await fetch_upstream(("root",), fetch_catalog_refs, refs_size)
+    return await fetch_upstream(
+        ("root", namespace), lambda: fetch_catalog_refs(namespace), refs_size
+    )
+
+
+def data_size(cm):
+    if isinstance(cm, shared.SharedConfigMap):
+        return cm.data.nbytes
+    return sum(len(k) + len(v) for k, v in (cm.data or {}).items())
+
+
+def configmap_size(cm):
+    return ENTRY_OVERHEAD_BYTES + data_size(cm)
+
+
+async def fetch_configmap(namespace: str, name: str):
+    with transport_errors(), metrics.kube_call("read"):
+        if aio is not None:
+            return await aio.read_config_map(namespace, name)
+        return await run_in_threadpool(
+            v1.read_namespaced_config_map, name, namespace, _request_timeout=REQUEST_TIMEOUT
+        )
+
+
+async def read_catalog_configmap(namespace: str, name: str):
+    """(ConfigMap, age in seconds if stale else None)."""
+    if informer is not None and informer.synced:
+        cm = informer.get(namespace, name)
+        if cm is None:
+            raise client.exceptions.ApiException(status=404, reason="Not Found")
+        return cm, None
+
+    namespaces = await watched_namespaces()
+    if namespaces is not None and namespace not in namespaces:
+        raise client.exceptions.ApiException(status=404, reason="Not Found")
+
+    key = (namespace, name)
+    cached = read_cache.get(key)
+    if isinstance(cached, client.exceptions.ApiException):
+        raise cached
+    if cached is not None:
+        return cached, None
+
+    async def fetch_and_cache():
+        try:
+            cm = await fetch_configmap(namespace, name)
+        except client.exceptions.ApiException as e:
+            # Only remember "doesn't exist"; other failures are worth retrying
+            if e.status == 404:
+                read_cache.put(key, e, ENTRY_OVERHEAD_BYTES, READ_CACHE_NEGATIVE_TTL)
+            raise
+        read_cache.put(key, cm, configmap_size(cm), READ_CACHE_TTL)
+        return cm
+
+    return await fetch_upstream(("cm",) + key, fetch_and_cache, configmap_size)
+
+
+def stale_headers(age):
+    """Age and Warning headers marking a response served from the last good copy."""
+    if age is None:
+        return {}
+    return {"Age": str(int(age)), "Warning": '110 - "Response is Stale"'}
+
+
+def render_configmap(cm):
+    return configmap_text(cm).encode()
+
+
+def render_configmap_json(cm):
+    """The ConfigMap's YAML documents as a JSON array, cached like the YAML."""
+    if data_size(cm) > STREAM_MIN_BYTES:
+        return formats.dump_json(configmap_documents(cm))
+    key = ("cm", cm.metadata.namespace, cm.metadata.name)
+    return render_cache.get(
+        key, cm.metadata.resource_version,
+        lambda: formats.dump_json(configmap_documents(cm)), "json",
+    )
+
+
+def render_key(cm, key, representation):
+    """One data key's YAML or JSON; cached with its ConfigMap's renders."""
+    if representation == "yaml":
+        if isinstance(cm, shared.SharedConfigMap):
+            return cm.rendered_key(key)
+        return (cm.data[key] + "\n").encode()
+
+    def render():
+        return formats.dump_json(value_documents(cm, key))
+
+    if data_size(cm) > STREAM_MIN_BYTES:
+        return render()
+    return render_cache.get(
+        ("cm", cm.metadata.namespace, cm.metadata.name), cm.metadata.resource_version,
+        render, f"json:{key}",
+    )
+
+
+def configmap_chunks(cm):
+    """A ConfigMap's YAML: cached bytes if small, else one value at a time."""
+    if isinstance(cm, shared.SharedConfigMap):
+        # Already rendered in the shared file; served without a copy
+        yield cm.rendered
+        return
+    if data_size(cm) > STREAM_MIN_BYTES:
+        for value in cm.data.values():
+            yield value.encode()
+            yield b"\n"
+        return
+    if len(cm.data) == 1:
+        # Cached by the (interned) value rather than by ConfigMap, so
+        # ConfigMaps sharing a value share its bytes as well
+        value = next(iter(cm.data.values()))
+        yield render_cache.get(("value", value), "", lambda: (value + "\n").encode())
+        return
+    key = ("cm", cm.metadata.namespace, cm.metadata.name)
+    yield render_cache.get(
+        key, cm.metadata.resource_version, lambda: render_configmap(cm)
+    )
+
+
+def location_response(request: Request, name, targets, cache_key, stale_age):
+    """A Location listing ``targets``, versioned by the targets themselves."""
+    representation = formats.negotiate(request.headers.get("accept"))
+    digest = hashlib.sha256("\n".join(targets).encode()).hexdigest()
+    etag = formats.etag(digest[:32], representation)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    def render():
+        body = {
+            "apiVersion": "backstage.io/v1alpha1",
+            "kind": "Location",
+            "metadata": { "name": name },
+            "spec": {"targets": targets},
+        }
+        if representation == "json":
+            return formats.dump_json(body)
+        return formats.dump_yaml(body)
+
+    return PlainTextResponse(
+        render_cache.get(cache_key, digest, render, representation),
+        media_type=formats.CONTENT_TYPES[representation],
+        headers={"ETag": etag, "Vary": "Accept", **stale_headers(stale_age)},
+    )
+
+
+def retry_headers():
+    """Retry-After while the breaker is open: when it next lets a call through."""
+    wait = breaker.retry_after()
+    if wait is None:
+        return {}
+    return {"Retry-After": str(math.ceil(wait))}
+
+
+def upstream_error(e, representation):
+    """The answer when an API call failed and there was no last good copy:
+    503 if the API server is unwell or the breaker is open, 502 if it
+    refused the call. Never a 200 that would read as an empty catalog."""
+    status = 503 if upstream_failure(e) else 502
+    headers = retry_headers() if status == 503 else {}
+    if representation == "json":
+        return JSONResponse({"error": e.reason}, status_code=status, headers=headers)
+    return PlainTextResponse(
+        f"# Error: {e.reason}\n", media_type="application/yaml",
+        status_code=status, headers=headers,
+    )
+
+
+def configmap_error(e, representation):
+    # A 200 with no entities would read as an empty catalog; make
+    # outages an error status so clients keep what they had
+    if upstream_failure(e):
+        return upstream_error(e, representation)
+    if representation == "json":
+        return JSONResponse({"error": e.reason}, status_code=e.status or 502)
+    return PlainTextResponse(f"# Error: {e.reason}\n", media_type="application/yaml")
+
+
 @app.get("/", response_class=PlainTextResponse)
-def list_catalog_items(request: Request):
+async def list_catalog_items(request: Request):
     proto, host = detect_scheme_host(request)
 
-    cms = v1.list_config_map_for_all_namespaces(
-        label_selector="eda.io/backstage-catalog=true"
-    )
+    stale_age = None
+    if ROOT_TARGETS != "aggregate":
+        try:
+            refs, stale_age = await list_catalog_refs()
+        except client.exceptions.ApiException as e:
+            return upstream_error(e, formats.negotiate(request.headers.get("accept")))
 
     targets = []
-    for cm in cms.items:
-        ns = cm.metadata.namespace
-        name = cm.metadata.name
-        targets.append(f"{proto}://{host}/{ns}/{name}")
-
-    body = {
-        "apiVersion": "backstage.io/v1alpha1",
-        "kind": "Location",
-        "metadata": { "name": "backstage-catalog-api-root" },
-        "spec": {"targets": targets},
+    if ROOT_TARGETS == "aggregate":
+        targets.append(f"{proto}://{host}/all")
+    elif ROOT_TARGETS == "namespaces":
+        for ns in sorted({ns for ns, _ in refs}):
+            targets.append(f"{proto}://{host}/{ns}/")
+    else:
+        for ns, name in refs:
+            targets.append(f"{proto}://{host}/{ns}/{name}")
+
+    return location_response(
+        request, "backstage-catalog-api-root", targets, ("root", proto, host), stale_age
+    )
+
+
+@app.get("/all", response_class=PlainTextResponse)
+async def read_all(request: Request):
+    """Every catalog ConfigMap's entities as one multi-document YAML stream."""
+    representation = formats.negotiate(request.headers.get("accept"))
+    try:
+        cms, stale_age = await list_catalog_configmaps()
+    except client.exceptions.ApiException as e:
+        return upstream_error(e, representation)
+    cms = [cm for cm in cms if cm.data]
+
+    versions = "\n".join(
+        f"{cm.metadata.namespace}/{cm.metadata.name}/{cm.metadata.resource_version}"
+        for cm in cms
+    )
+    digest = hashlib.sha256(versions.encode()).hexdigest()
+    etag = formats.etag(digest[:32], representation)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    # One ConfigMap at a time, so memory per request is bounded by the
+    # largest document rather than the whole catalog
+    async def documents():
+        for cm in cms:
+            first = True
+            for chunk in configmap_chunks(cm):
+                if first and chunk[:3] != b"---":
+                    yield b"---\n"
+                first = False
+                yield chunk
+
+    # One JSON array: each ConfigMap's cached array without its brackets
+    async def json_documents():
+        yield b"["
+        separator = b""
+        for cm in cms:
+            items = render_configmap_json(cm)[1:-1]
+            if items:
+                yield separator + items
+                separator = b","
+        yield b"]"
+
+    body = json_documents() if representation == "json" else documents()
+    return StreamingResponse(
+        body, media_type=formats.CONTENT_TYPES[representation],
+        headers={"ETag": etag, "Vary": "Accept", **stale_headers(stale_age)},
+    )
+
+
+def app_stats():
+    return {
+        "render_cache": render_cache.stats(),
+        "read_cache": read_cache.stats(),
+        "single_flight": flights.stats(),
+        "last_good": last_good.stats(),
+        "rate_limit": bucket.stats(),
+        "circuit_breaker": breaker.stats(),
+        "configmaps": len(informer) if informer is not None else 0,
+        "entities": len(entity_index),
+        "interned_values": interner.stats(),
+        "shared_generation": shared_generation,
+        "backstage_refresh": notifier.stats() if notifier is not None else None,
     }
 
-    return PlainTextResponse(
-        yaml.dump(body, sort_keys=False),
-        media_type="application/yaml"
+
+REGISTRY.register(metrics.StatsCollector(app_stats))
+
+
+# Declared before /{namespace}/{configmap}; "-" is never a valid namespace.
+# Probes, stats and metrics are async so they run on the event loop and
+# keep answering when slow API calls have filled the threadpool.
+@app.get("/-/stats")
+async def cache_stats():
+    return app_stats()
+
+
+def json_response(data):
+    return Response(formats.dump_json(data), media_type="application/json")
+
+
+def entity_index_unavailable():
+    return JSONResponse(
+        {"error": "entity index requires CATALOG_API_WATCH=true"}, status_code=503
+    )
+
+
+async def ensure_entity_index():
+    """Workers following a shared file only build their (per-process) entity
+    index once /entities is used, so those that never serve it stay small."""
+    if isinstance(informer, shared.SharedCatalog) and not shared_entities_indexed:
+        await flights.do(("entities",), index_shared_entities)
+
+
+@app.get("/entities")
+async def query_entities(kind: str | None = None, namespace: str | None = None,
+                         name: str | None = None, owner: str | None = None,
+                         system: str | None = None, lifecycle: str | None = None):
+    """Entities matching every given field (case-insensitive), from the index."""
+    if informer is None:
+        return entity_index_unavailable()
+    await ensure_entity_index()
+    return json_response({"items": entity_index.query(
+        kind=kind, namespace=namespace, name=name,
+        owner=owner, system=system, lifecycle=lifecycle,
+    )})
+
+
+@app.get("/entities/{kind}/{namespace}/{name}")
+async def read_entity(kind: str, namespace: str, name: str):
+    """One entity by its ref, like Backstage's /entities/by-name."""
+    if informer is None:
+        return entity_index_unavailable()
+    await ensure_entity_index()
+    entity = entity_index.get(f"{kind}:{namespace}/{name}")
+    if entity is None:
+        return JSONResponse({"error": "entity not found"}, status_code=404)
+    return json_response(entity)
+
+
+@app.get("/healthz", response_class=PlainTextResponse)
+async def healthz():
+    """Liveness: the event loop is answering. Never calls the API server."""
+    return "ok\n"
+
+
+@app.get("/readyz", response_class=PlainTextResponse)
+async def readyz():
+    """Readiness: the ConfigMap cache has synced, so requests are answered
+    from memory. Without the informer there is nothing to wait for."""
+    if informer is not None and not informer.synced:
+        return PlainTextResponse("ConfigMap cache not synced\n", status_code=503)
+    return "ok\n"
+
+
+def change_targets(items, proto, host):
+    for item in items:
+        item["target"] = f"{proto}://{host}/{item['namespace']}/{item['name']}"
+    return items
+
+
+async def change_events(request: Request, cursor: str):
+    """Server-Sent Events: one ``change`` event per ConfigMap, forever.
+
+    The cursor goes in the id of the last event of each batch, so a client
+    reconnecting with Last-Event-ID resumes where it left off.
+    """
+    proto, host = detect_scheme_host(request)
+    while not await request.is_disconnected():
+        try:
+            items, next_cursor = change_feed.since(cursor)
+        except CursorExpired:
+            next_cursor = change_feed.cursor()
+            data = json.dumps({"cursor": next_cursor})
+            yield f"id: {next_cursor}\nevent: reset\ndata: {data}\n\n".encode()
+            items = []
+        for i, item in enumerate(change_targets(items, proto, host)):
+            event_id = f"id: {next_cursor}\n" if i == len(items) - 1 else ""
+            yield f"{event_id}event: change\ndata: {json.dumps(item)}\n\n".encode()
+        cursor = next_cursor
+        if not await change_feed.wait(cursor, SSE_HEARTBEAT):
+            yield b": keepalive\n\n"
+
+
+@app.get("/-/changes")
+async def read_changes(request: Request, cursor: str = "", wait: float = 0):
+    """ConfigMaps added, modified or deleted since ``cursor``.
+
+    Without a cursor, returns the current one to start from. With ``wait``,
+    holds the request open until something changes (long-poll). Clients
+    that accept text/event-stream get a Server-Sent Events stream instead.
+    """
+    if informer is None:
+        return JSONResponse(
+            {"error": "change feed requires CATALOG_API_WATCH=true"}, status_code=503
+        )
+
+    cursor = request.headers.get("last-event-id", cursor)
+    if "text/event-stream" in request.headers.get("accept", ""):
+        return StreamingResponse(
+            change_events(request, cursor or change_feed.cursor()),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache"},
+        )
+
+    if not cursor:
+        return {"cursor": change_feed.cursor(), "changes": []}
+    try:
+        items, next_cursor = change_feed.since(cursor)
+        if not items and wait > 0:
+            await change_feed.wait(cursor, min(wait, CHANGES_MAX_WAIT))
+            items, next_cursor = change_feed.since(cursor)
+    except CursorExpired as e:
+        # Like a watch's 410: relist everything, then follow the new cursor
+        return JSONResponse(
+            {"error": str(e), "cursor": change_feed.cursor()}, status_code=410
+        )
+
+    proto, host = detect_scheme_host(request)
+    return json_response(
+        {"cursor": next_cursor, "changes": change_targets(items, proto, host)}
+    )
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+def shard_location_name(namespace):
+    """backstage-catalog-api-{namespace}, shortened with a hash of the
+    namespace when that would be over the 63 characters Backstage allows."""
+    name = f"backstage-catalog-api-{namespace}"
+    if len(name) <= LOCATION_NAME_MAX:
+        return name
+    digest = hashlib.sha256(namespace.encode()).hexdigest()[:8]
+    return f"{name[:LOCATION_NAME_MAX - len(digest) - 1].rstrip('-')}-{digest}"
+
+
+@app.get("/{namespace}/", response_class=PlainTextResponse)
+async def list_namespace_items(namespace: str, request: Request):
+    """One namespace's share of the root Location (CATALOG_API_ROOT_TARGETS=namespaces)."""
+    proto, host = detect_scheme_host(request)
+    try:
+        refs, stale_age = await list_catalog_refs(namespace)
+    except client.exceptions.ApiException as e:
+        return upstream_error(e, formats.negotiate(request.headers.get("accept")))
+    targets = [f"{proto}://{host}/{ns}/{name}" for ns, name in refs]
+    return location_response(
+        request, shard_location_name(namespace), targets,
+        ("shard", namespace, proto, host), stale_age,
     )
 
 
 @app.get("/{namespace}/{configmap}", response_class=PlainTextResponse)
-def read_single_cm(namespace: str, configmap: str):
+async def read_single_cm(namespace: str, configmap: str, request: Request):
+    representation = formats.negotiate(request.headers.get("accept"))
     try:
-        cm = v1.read_namespaced_config_map(configmap, namespace)
+        cm, stale_age = await read_catalog_configmap(namespace, configmap)
     except client.exceptions.ApiException as e:
-        return PlainTextResponse(f"# Error: {e.reason}\n", media_type="application/yaml")
+        return configmap_error(e, representation)
 
     if not cm.data:
+        if representation == "json":
+            return Response(b"[]", media_type="application/json")
         return PlainTextResponse(
             f"# No data entries found in ConfigMap {configmap}\n",
             media_type="application/yaml"
         )
 
-    combined = "\n".join(cm.data.values()) + "\n"
+    etag = formats.etag(cm.metadata.resource_version, representation)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    headers = {"ETag": etag, "Vary": "Accept", "Accept-Ranges": "bytes",
+               **stale_headers(stale_age)}
+
+    if representation == "json":
+        return ranged_response(request, render_configmap_json(cm), "application/json",
+                               headers)
+    if isinstance(cm, shared.SharedConfigMap):
+        body = cm.rendered
+    elif data_size(cm) > STREAM_MIN_BYTES and "range" not in request.headers:
+        return StreamingResponse(
+            configmap_chunks(cm), media_type="application/yaml", headers=headers
+        )
+    else:
+        body = b"".join(configmap_chunks(cm))
+    return ranged_response(request, body, "application/yaml", headers)
 
-    return PlainTextResponse(combined, media_type="application/yaml")
+
+@app.get("/{namespace}/{configmap}/{key}", response_class=PlainTextResponse)
+async def read_configmap_key(namespace: str, configmap: str, key: str, request: Request):
+    """One data key of a ConfigMap, so a Location can target it alone."""
+    representation = formats.negotiate(request.headers.get("accept"))
+    try:
+        cm, stale_age = await read_catalog_configmap(namespace, configmap)
+    except client.exceptions.ApiException as e:
+        return configmap_error(e, representation)
+    if key not in (cm.data or {}):
+        return configmap_error(
+            client.exceptions.ApiException(status=404, reason=f"No key {key} in {configmap}"),
+            representation,
+        )
+
+    etag = formats.etag(f"{cm.metadata.resource_version}/{key}", representation)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    headers = {"ETag": etag, "Vary": "Accept", "Accept-Ranges": "bytes",
+               **stale_headers(stale_age)}
+    return ranged_response(
+        request, render_key(cm, key, representation),
+        formats.CONTENT_TYPES[representation], headers,
+    )
@@ -0,0 +1,125 @@
+"""asyncio-native Kubernetes client for per-request ConfigMap calls."""
+import asyncio
+from contextlib import contextmanager
+
+import aiohttp
+from kubernetes import client as sync_client
+from kubernetes_asyncio import client, config
+
+from informer import (
+    PARTIAL_METADATA_ACCEPT, configmaps_path, list_query, list_scopes, metadata_page,
+)
+
+
+@contextmanager
+def sync_errors():
+    """Re-raise API errors as the synchronous client's ApiException, and
+    failures to reach the API server as one without a status."""
+    try:
+        yield
+    except client.exceptions.ApiException as e:
+        raise sync_client.exceptions.ApiException(status=e.status, reason=e.reason)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        raise sync_client.exceptions.ApiException(
+            reason=f"Kubernetes API unreachable: {e}"
+        ) from e
+
+
+class AsyncConfigMapClient:
+    """Thin wrapper over kubernetes_asyncio sharing one connection pool.
+
+    API and connection errors are re-raised as the synchronous client's
+    ApiException so the route handlers don't need to know which client
+    served them.
+    """
+
+    def __init__(self, api_client, request_timeout=None):
+        self.api_client = api_client
+        self.request_timeout = request_timeout
+        self.v1 = client.CoreV1Api(api_client)
+
+    @classmethod
+    async def load(cls, pool_size=100, request_timeout=None):
+        """A client with in-cluster credentials, or the local kubeconfig when
+        running outside a cluster."""
+        configuration = client.Configuration()
+        try:
+            config.load_incluster_config(client_configuration=configuration)
+        except config.ConfigException:
+            await config.load_kube_config(client_configuration=configuration)
+        configuration.connection_pool_maxsize = pool_size
+        return cls(client.ApiClient(configuration), request_timeout)
+
+    async def list_config_map_metadata(self, label_selector, namespace=None,
+                                       _request_timeout=None, **kwargs):
+        body = await self.api_client.call_api(
+            configmaps_path(namespace), "GET",
+            query_params=list_query(label_selector, **kwargs),
+            header_params={"Accept": PARTIAL_METADATA_ACCEPT},
+            response_types_map={200: "object"},
+            auth_settings=["BearerToken"],
+            _return_http_data_only=True,
+            _request_timeout=_request_timeout,
+        )
+        return metadata_page(body)
+
+    async def list_pages(self, list_func, label_selector, page_size=0, **scope):
+        """Yield one LIST page at a time, following continue tokens."""
+        kwargs = dict(scope, limit=page_size) if page_size else dict(scope)
+        while True:
+            with sync_errors():
+                page = await list_func(
+                    label_selector=label_selector, _request_timeout=self.request_timeout,
+                    **kwargs,
+                )
+            yield page
+            if not page_size or not page.metadata._continue:
+                return
+            kwargs["_continue"] = page.metadata._continue
+
+    def _list_func(self, namespaces):
+        if namespaces is None:
+            return self.v1.list_config_map_for_all_namespaces
+        return self.v1.list_namespaced_config_map
+
+    async def list_config_map_refs(self, label_selector, page_size=0,
+                                   metadata_only=False, namespaces=None):
+        """Return (namespace, name) of every match, one page at a time.
+
+        ``namespaces`` limits the LISTs to those namespaces, one after another.
+        """
+        list_func = self._list_func(namespaces)
+        if metadata_only:
+            list_func = self.list_config_map_metadata
+        return [
+            (cm.metadata.namespace, cm.metadata.name)
+            for scope in list_scopes(namespaces)
+            async for page in self.list_pages(list_func, label_selector, page_size, **scope)
+            for cm in page.items
+        ]
+
+    async def list_config_maps(self, label_selector, page_size=0, namespaces=None):
+        """Return every matching ConfigMap, data included."""
+        list_func = self._list_func(namespaces)
+        return [
+            cm
+            for scope in list_scopes(namespaces)
+            async for page in self.list_pages(list_func, label_selector, page_size, **scope)
+            for cm in page.items
+        ]
+
+    async def list_namespace_names(self, label_selector):
+        with sync_errors():
+            found = await self.v1.list_namespace(
+                label_selector=label_selector, _request_timeout=self.request_timeout
+            )
+        return [ns.metadata.name for ns in found.items]
+
+    async def read_config_map(self, namespace, name):
+        with sync_errors():
+            return await self.v1.read_namespaced_config_map(
+                name, namespace, _request_timeout=self.request_timeout
+            )
+
+    async def close(self):
+        await self.api_client.close()
@@ -0,0 +1,53 @@
+"""Concurrency ceiling of per-request API calls: threadpool vs asyncio client.
+
+    python benchmarks/bench_concurrency.py --latency 0.1 --levels 10,50,100,200,400
+
+Runs catalog-api with the informer disabled, so every GET /{ns}/{cm} makes
+one read against a fake API server that takes --latency seconds to answer.
+With the sync client each in-flight read holds one of the threadpool's
+threads; with the asyncio client it holds only a pooled connection.
+"""
+import argparse
+
+from fake_kube import FakeKubeAPI
+from harness import AppProcess, run_load
+
+# The API rate limit and read cache are off, so every request is a real
+# read and the ceiling found is the client's own
+UNCACHED = {"CATALOG_API_WATCH": "false", "CATALOG_API_RATE_LIMIT_QPS": "0",
+            "CATALOG_API_READ_CACHE_TTL": "0"}
+MODES = {
+    "threadpool": {**UNCACHED, "CATALOG_API_ASYNC": "false"},
+    "asyncio": {**UNCACHED, "CATALOG_API_ASYNC": "true",
+                "CATALOG_API_ASYNC_POOL_SIZE": "1000"},
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--levels", default="10,50,100,200,400")
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--configmaps", type=int, default=100)
+    args = parser.parse_args()
+
+    kube = FakeKubeAPI(count=args.configmaps, latency=args.latency)
+    kube_url = kube.start()
+    paths = [f"/{ns}/{name}" for ns, name in sorted(kube.configmaps)]
+    levels = [int(level) for level in args.levels.split(",")]
+
+    print(f"{'mode':<11} {'conc':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>6}")
+    for mode, env in MODES.items():
+        with AppProcess(kube_url, env) as app:
+            ceiling = 0
+            for level in levels:
+                result = run_load(app.url, paths, level, args.duration)
+                ceiling = max(ceiling, result["rps"])
+                print(f"{mode:<11} {level:>5} {result['rps']:>8} "
+                      f"{result['p50_ms']:>8} {result['p95_ms']:>8} {result['errors']:>6}")
+            print(f"{mode:<11} ceiling {ceiling} rps\n")
+    kube.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Load test of catalog-api against a fake API server, with JSON results.
+
+    python benchmarks/bench_load.py --configmaps 5000 --levels 10,50,200 \
+        --output results/$(date +%Y%m%d-%H%M).json
+
+For each mode (informer, direct API calls with and without the read
+cache) and each route (GET /, GET /{ns}/{cm}, GET /all) it keeps each
+concurrency level's worth of clients busy for --duration seconds. Every run records RPS, p50/p95/p99 latency, the app's
+peak RSS so far and the upstream API calls made during the run. The whole
+set, with the parameters used, is written as JSON so runs can be compared
+over time.
+"""
+import argparse
+import json
+import platform
+import time
+from collections import Counter
+
+import httpx
+
+from fake_kube import FakeKubeAPI
+from harness import AppProcess, run_load
+
+# The API rate limit is off, so direct mode measures the app, not the limiter.
+# "direct" makes one API call per request; "direct-cached" keeps the default
+# read cache, so repeated reads of a ConfigMap are served from memory.
+MODES = {
+    "informer": {"CATALOG_API_WATCH": "true"},
+    "direct": {"CATALOG_API_WATCH": "false", "CATALOG_API_RATE_LIMIT_QPS": "0",
+               "CATALOG_API_READ_CACHE_TTL": "0"},
+    "direct-cached": {"CATALOG_API_WATCH": "false", "CATALOG_API_RATE_LIMIT_QPS": "0"},
+}
+
+
+def scenario_paths(kube):
+    refs = sorted(kube.configmaps)
+    return {
+        "root": ["/"],
+        "configmap": [f"/{ns}/{name}" for ns, name in refs],
+        "all": ["/all"],
+    }
+
+
+def wait_synced(app, count, timeout=120):
+    """Block until the informer holds every ConfigMap."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if httpx.get(app.url + "/-/stats", timeout=5).json()["configmaps"] >= count:
+            return
+        time.sleep(0.2)
+    raise RuntimeError("informer did not sync")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--configmaps", type=int, default=5000)
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--namespaces", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--levels", default="10,50,200")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--scenarios", default="root,configmap,all")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    kube = FakeKubeAPI(count=args.configmaps, size=args.size,
+                       namespaces=args.namespaces, latency=args.latency)
+    kube_url = kube.start()
+    paths = scenario_paths(kube)
+    levels = [int(level) for level in args.levels.split(",")]
+
+    results = []
+    print(f"{'mode':<13} {'route':<10} {'conc':>5} {'rps':>8} {'p50 ms':>8} "
+          f"{'p95 ms':>8} {'p99 ms':>8} {'RSS MiB':>8} {'upstream':>8}")
+    for mode in args.modes.split(","):
+        with AppProcess(kube_url, MODES[mode]) as app:
+            if mode == "informer":
+                wait_synced(app, args.configmaps)
+            for scenario in args.scenarios.split(","):
+                for level in levels:
+                    calls_before = Counter(kube.calls)
+                    result = run_load(app.url, paths[scenario], level, args.duration)
+                    upstream = dict(Counter(kube.calls) - calls_before)
+                    rss = app.peak_rss()
+                    results.append({"mode": mode, "route": scenario, **result,
+                                    "peak_rss_bytes": rss, "upstream_calls": upstream})
+                    print(f"{mode:<13} {scenario:<10} {level:>5} {result['rps']:>8} "
+                          f"{result['p50_ms']:>8} {result['p95_ms']:>8} "
+                          f"{result['p99_ms']:>8} {(rss or 0) / 2**20:>8.1f} "
+                          f"{sum(upstream.values()):>8}")
+    kube.stop()
+
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump({
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "host": {"python": platform.python_version(),
+                         "machine": platform.machine(),
+                         "system": platform.system()},
+                "parameters": vars(args),
+                "results": results,
+            }, out, indent=2)
+        print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
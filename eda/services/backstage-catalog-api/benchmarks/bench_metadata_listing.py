@@ -0,0 +1,47 @@
+"""Bytes and latency of GET / with full vs metadata-only ConfigMap LISTs.
+
+    python benchmarks/bench_metadata_listing.py --configmaps 200 --size 262144
+
+Runs catalog-api with the informer disabled, so each GET / LISTs the fake
+API server. The full LIST carries every ConfigMap's data; the
+PartialObjectMetadataList carries names and versions only.
+"""
+import argparse
+
+from fake_kube import FakeKubeAPI
+from harness import AppProcess, run_load
+
+# The API rate limit is off, so latencies are the LISTs' own
+MODES = {
+    "full": {"CATALOG_API_WATCH": "false", "CATALOG_API_METADATA_ONLY": "false",
+             "CATALOG_API_RATE_LIMIT_QPS": "0"},
+    "metadata": {"CATALOG_API_WATCH": "false", "CATALOG_API_METADATA_ONLY": "true",
+                 "CATALOG_API_RATE_LIMIT_QPS": "0"},
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--configmaps", type=int, default=200)
+    parser.add_argument("--size", type=int, default=256 * 1024)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=5)
+    args = parser.parse_args()
+
+    kube = FakeKubeAPI(count=args.configmaps, size=args.size)
+    kube_url = kube.start()
+
+    print(f"{'mode':<9} {'requests':>8} {'upstream KiB/req':>17} "
+          f"{'p50 ms':>8} {'p95 ms':>8}")
+    for mode, env in MODES.items():
+        with AppProcess(kube_url, env) as app:
+            sent_before = kube.bytes_sent
+            result = run_load(app.url, ["/"], args.concurrency, args.duration)
+            per_request = (kube.bytes_sent - sent_before) / max(result["requests"], 1)
+            print(f"{mode:<9} {result['requests']:>8} {per_request / 1024:>17.1f} "
+                  f"{result['p50_ms']:>8} {result['p95_ms']:>8}")
+    kube.stop()
+
+
+if __name__ == "__main__":
+    main()
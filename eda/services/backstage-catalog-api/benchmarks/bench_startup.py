@@ -0,0 +1,112 @@
+"""Import time and time-to-ready of catalog-api, cold and from a snapshot.
+
+    python benchmarks/bench_startup.py --configmaps 5000 --runs 5
+
+Import time is measured in a fresh interpreter per run; -X importtime
+names the slowest modules app.py imports. Time to ready runs serve.py against
+the fake API server and records, from spawning the process, when GET /
+first answers and when the informer holds every ConfigMap: once cold, and
+once restored from the CATALOG_API_SNAPSHOT_PATH the cold run saved.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from fake_kube import FakeKubeAPI
+from harness import AppProcess
+
+SERVICE = Path(__file__).parent.parent
+
+
+def import_times(runs):
+    """Median wall time of ``import app`` and of each module it imports directly."""
+    walls = []
+    modules = {}
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import app"],
+            cwd=SERVICE, capture_output=True, text=True, check=True,
+        )
+        walls.append(time.perf_counter() - start)
+        # "import time: self [us] | cumulative | <2 spaces per level>name",
+        # children listed before their parent
+        children = []
+        for line in result.stderr.splitlines():
+            parts = line.split("|")
+            if len(parts) != 3 or not parts[1].strip().isdigit():
+                continue
+            depth = (len(parts[2]) - len(parts[2].lstrip())) // 2
+            if depth == 0:
+                if parts[2].strip() == "app":
+                    for name, seconds in children:
+                        modules.setdefault(name, []).append(seconds)
+                children = []
+            elif depth == 1:
+                children.append((parts[2].strip(), int(parts[1]) / 1e6))
+    slowest = sorted(
+        ((statistics.median(times), name) for name, times in modules.items()),
+        reverse=True,
+    )
+    return statistics.median(walls), slowest
+
+
+def time_to_ready(kube_url, env, count, timeout=120):
+    """Seconds from spawn until GET / answers and until the cache is full."""
+    # One client, made before the clock starts: building a client per poll
+    # costs enough CPU to slow the app's own start on small hosts
+    with httpx.Client(timeout=30) as http:
+        start = time.monotonic()
+        app = AppProcess(kube_url, env)
+        first_response = synced = None
+        try:
+            while synced is None and time.monotonic() - start < timeout:
+                try:
+                    if first_response is None and http.get(app.url + "/").is_success:
+                        first_response = time.monotonic() - start
+                    if http.get(app.url + "/-/stats").json()["configmaps"] >= count:
+                        synced = time.monotonic() - start
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.02)
+        finally:
+            app.stop()
+    return first_response, synced
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--configmaps", type=int, default=5000)
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    args = parser.parse_args()
+
+    wall, slowest = import_times(args.runs)
+    print(f"import app: {wall * 1000:.0f} ms wall (median of {args.runs})")
+    for seconds, name in slowest[:args.top]:
+        print(f"  {seconds * 1000:8.1f} ms  {name}")
+
+    kube = FakeKubeAPI(count=args.configmaps, size=args.size, latency=args.latency)
+    kube_url = kube.start()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {"CATALOG_API_WATCH": "true",
+               "CATALOG_API_SNAPSHOT_PATH": str(Path(tmp) / "snapshot.json.gz")}
+        print(f"\n{'start':<6} {'first GET / s':>14} {'synced s':>9} {'upstream LISTs':>15}")
+        for label in ("cold", "warm"):
+            lists_before = kube.calls["list"]
+            first_response, synced = time_to_ready(kube_url, env, args.configmaps)
+            print(f"{label:<6} {first_response or float('nan'):>14.2f} "
+                  f"{synced or float('nan'):>9.2f} {kube.calls['list'] - lists_before:>15}")
+    kube.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Throughput and memory of catalog-api with several worker processes.
+
+    python benchmarks/bench_workers.py --configmaps 5000 --workers 1,2,4
+
+For each worker count, runs serve.py --workers N with
+CATALOG_API_SHARED_PATH set, so one worker watches and publishes and the
+others serve the memory-mapped file; --compare-unshared repeats each count
+with every worker running its own informer. Records RPS for GET /{ns}/{cm},
+the proportional set size (PSS) of the whole process tree, which counts
+shared pages once, and the LIST and WATCH requests the fake API server got.
+"""
+import argparse
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+import httpx
+
+from fake_kube import FakeKubeAPI
+from harness import AppProcess, run_load
+
+
+def wait_all_synced(app, count, workers, timeout=120):
+    """Block until enough consecutive requests, spread over the workers,
+    find every ConfigMap."""
+    deadline = time.monotonic() + timeout
+    streak = 0
+    with httpx.Client(timeout=5) as http:
+        while streak < 4 * workers:
+            if time.monotonic() > deadline:
+                raise RuntimeError("workers did not sync")
+            try:
+                synced = http.get(app.url + "/-/stats").json()["configmaps"] >= count
+            except httpx.TransportError:
+                synced = False
+            streak = streak + 1 if synced else 0
+            time.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--configmaps", type=int, default=5000)
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--namespaces", type=int, default=50)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--compare-unshared", action="store_true")
+    args = parser.parse_args()
+
+    kube = FakeKubeAPI(count=args.configmaps, size=args.size, namespaces=args.namespaces)
+    kube_url = kube.start()
+    paths = [f"/{ns}/{name}" for ns, name in sorted(kube.configmaps)]
+    modes = ["shared", "unshared"] if args.compare_unshared else ["shared"]
+
+    print(f"{'mode':<9} {'workers':>7} {'rps':>8} {'p99 ms':>8} {'PSS MiB':>8} "
+          f"{'LISTs':>6} {'WATCHes':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in modes:
+            for workers in [int(n) for n in args.workers.split(",")]:
+                env = {"CATALOG_API_WATCH": "true"}
+                if mode == "shared":
+                    path = Path(tmp) / f"catalog-{workers}.shared"
+                    env["CATALOG_API_SHARED_PATH"] = str(path)
+                calls_before = Counter(kube.calls)
+                with AppProcess(kube_url, env, workers=workers) as app:
+                    wait_all_synced(app, args.configmaps, workers)
+                    result = run_load(app.url, paths, args.concurrency, args.duration)
+                    pss = app.total_pss()
+                calls = Counter(kube.calls) - calls_before
+                print(f"{mode:<9} {workers:>7} {result['rps']:>8} {result['p99_ms']:>8} "
+                      f"{pss / 2**20:>8.1f} {calls['list']:>6} {calls['watch']:>8}")
+    kube.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Stand-in Kubernetes API server seeded with synthetic catalog ConfigMaps.
+
+Only implements the ConfigMap calls catalog-api makes. Each request sleeps
+for ``latency`` seconds to mimic a loaded control plane, and every call is
+counted so benchmarks can report upstream load. WATCHes are accepted and
+held open without events until their timeoutSeconds (or stop()), which is
+enough for the informer to sync and stay synced.
+"""
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+LABEL = "eda.io/backstage-catalog"
+
+
+def synthetic_document(namespace, name, size):
+    doc = (
+        "apiVersion: backstage.io/v1alpha1\n"
+        "kind: Component\n"
+        "metadata:\n"
+        f"  name: {name}\n"
+        f"  namespace: {namespace}\n"
+        "  description: "
+    )
+    return doc + "x" * max(size - len(doc) - 1, 0) + "\n"
+
+
+class FakeKubeAPI:
+    def __init__(self, count=100, size=1024, namespaces=10, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self.configmaps = {}
+        for i in range(count):
+            namespace = f"team-{i % namespaces}"
+            name = f"catalog-{i}"
+            self.configmaps[(namespace, name)] = {
+                "metadata": {
+                    "name": name,
+                    "namespace": namespace,
+                    "resourceVersion": str(i + 1),
+                    "labels": {LABEL: "true"},
+                },
+                "data": {"catalog.yaml": synthetic_document(namespace, name, size)},
+            }
+        self.resource_version = str(count)
+        self._server = None
+        self._stopped = threading.Event()
+
+    def list_body(self, limit=0, token=None, metadata_only=False):
+        keys = sorted(self.configmaps)
+        start = int(token) if token else 0
+        end = start + limit if limit else len(keys)
+        metadata = {"resourceVersion": self.resource_version}
+        if end < len(keys):
+            metadata["continue"] = str(end)
+        items = [self.configmaps[key] for key in keys[start:end]]
+        if metadata_only:
+            return {
+                "kind": "PartialObjectMetadataList",
+                "apiVersion": "meta.k8s.io/v1",
+                "metadata": metadata,
+                "items": [{"metadata": item["metadata"]} for item in items],
+            }
+        return {
+            "kind": "ConfigMapList",
+            "apiVersion": "v1",
+            "metadata": metadata,
+            "items": items,
+        }
+
+    def count(self, call=None, nbytes=0):
+        with self._lock:
+            if call is not None:
+                self.calls[call] += 1
+            self.bytes_sent += nbytes
+
+    def handle(self, method, path, query, accept=""):
+        """Return (status, body dict) for a request."""
+        parts = path.strip("/").split("/")
+        if parts == ["api", "v1", "configmaps"]:
+            if query.get("watch", [""])[0].lower() == "true":
+                self.count("watch")
+                return 200, None
+            self.count("list")
+            limit = int(query.get("limit", ["0"])[0])
+            return 200, self.list_body(
+                limit,
+                query.get("continue", [None])[0],
+                accept.startswith("application/json;as=PartialObjectMetadataList"),
+            )
+        if len(parts) == 6 and parts[:3] == ["api", "v1", "namespaces"] \
+                and parts[4] == "configmaps":
+            self.count("read")
+            cm = self.configmaps.get((parts[3], parts[5]))
+            if cm is None:
+                return 404, {
+                    "kind": "Status", "apiVersion": "v1", "status": "Failure",
+                    "reason": "NotFound", "code": 404,
+                    "message": f'configmaps "{parts[5]}" not found',
+                }
+            return 200, cm
+        self.count("other")
+        return 404, {"kind": "Status", "code": 404, "reason": "NotFound"}
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self, port=0):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if api.latency:
+                    time.sleep(api.latency)
+                parsed = urlparse(self.path)
+                status, body = api.handle(
+                    "GET", parsed.path, parse_qs(parsed.query),
+                    self.headers.get("Accept", ""),
+                )
+                if body is None:
+                    return self.hold_watch(parse_qs(parsed.query))
+                payload = json.dumps(body).encode()
+                api.count(nbytes=len(payload))
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def hold_watch(self, query):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                self.wfile.flush()
+                api._stopped.wait(int(query.get("timeoutSeconds", ["300"])[0]))
+                self.wfile.write(b"0\r\n\r\n")
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+            request_queue_size = 1024
+
+        self._server = Server(("127.0.0.1", port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self.url
+
+    def stop(self):
+        self._stopped.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
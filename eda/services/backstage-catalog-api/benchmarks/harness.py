@@ -0,0 +1,145 @@
+"""Shared helpers for the catalog-api benchmarks."""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+SERVE = Path(__file__).parent / "serve.py"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class AppProcess:
+    """catalog-api running in a subprocess via serve.py."""
+
+    def __init__(self, kube_url, env=None, workers=1):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.proc = subprocess.Popen(
+            [sys.executable, str(SERVE), "--kube-url", kube_url, "--port", str(self.port),
+             "--workers", str(workers)],
+            env={**os.environ, **(env or {})},
+        )
+
+    def wait_ready(self, path="/", timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                if httpx.get(self.url + path, timeout=5).status_code < 500:
+                    return
+            except httpx.TransportError:
+                pass
+            time.sleep(0.1)
+        raise RuntimeError(f"catalog-api at {self.url} did not become ready")
+
+    def peak_rss(self):
+        """Peak resident set size of the app process in bytes (Linux only)."""
+        try:
+            with open(f"/proc/{self.proc.pid}/status") as status:
+                for line in status:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return None
+
+    def pids(self):
+        """The app process and all its descendants (Linux only)."""
+        pids, pending = [], [self.proc.pid]
+        while pending:
+            pid = pending.pop()
+            pids.append(pid)
+            try:
+                with open(f"/proc/{pid}/task/{pid}/children") as children:
+                    pending.extend(int(child) for child in children.read().split())
+            except OSError:
+                pass
+        return pids
+
+    def total_pss(self):
+        """Proportional set size of the whole process tree in bytes (Linux only).
+
+        Unlike summing RSS, pages shared between processes (such as a
+        memory-mapped file) are counted once in total.
+        """
+        total = 0
+        for pid in self.pids():
+            try:
+                with open(f"/proc/{pid}/smaps_rollup") as rollup:
+                    for line in rollup:
+                        if line.startswith("Pss:"):
+                            total += int(line.split()[1]) * 1024
+            except OSError:
+                pass
+        return total
+
+    def stop(self):
+        self.proc.terminate()
+        self.proc.wait(10)
+
+    def __enter__(self):
+        self.wait_ready()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def _load(url, paths, concurrency, duration, headers):
+    latencies = []
+    errors = 0
+    received = 0
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as http:
+        async def worker(offset):
+            nonlocal errors, received
+            i = offset
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await http.get(paths[i % len(paths)], headers=headers)
+                    received += len(response.content)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+                i += concurrency
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        elapsed = time.monotonic() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "bytes_received": received,
+    }
+
+
+def run_load(url, paths, concurrency, duration, headers=None):
+    """Keep ``concurrency`` requests in flight for ``duration`` seconds."""
+    return asyncio.run(_load(url, paths, concurrency, duration, headers or {}))
@@ -0,0 +1,70 @@
+"""Run the real catalog-api against a Kubernetes API at an arbitrary URL.
+
+    python benchmarks/serve.py --kube-url http://127.0.0.1:8001 --port 8080
+
+The in-cluster config loaders are replaced with ones that point both the
+sync and asyncio clients at --kube-url. Everything else (mode switches,
+pool sizes) is read from the usual CATALOG_API_* environment variables.
+With --workers, each uvicorn worker process does the same through create_app.
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+import kubernetes.config
+import uvicorn
+from kubernetes import client
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def point_clients_at(kube_url):
+    configuration = client.Configuration(host=kube_url)
+    configuration.connection_pool_maxsize = 100
+    client.Configuration.set_default(configuration)
+
+    def load_incluster_config(client_configuration=None, **kwargs):
+        if client_configuration is not None:
+            client_configuration.host = kube_url
+
+    return load_incluster_config
+
+
+def load_app(kube_url):
+    fake_loader = point_clients_at(kube_url)
+    # The app loads its config in lifespan, so the patch has to outlive import
+    kubernetes.config.load_incluster_config = fake_loader
+    import app
+    try:
+        import kubernetes_asyncio.config
+        kubernetes_asyncio.config.load_incluster_config = fake_loader
+    except ImportError:
+        pass
+    return app.app
+
+
+def create_app():
+    """App factory for uvicorn's worker processes, which import afresh."""
+    return load_app(os.environ["CATALOG_API_BENCH_KUBE_URL"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--kube-url", required=True)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        os.environ["CATALOG_API_BENCH_KUBE_URL"] = args.kube_url
+        uvicorn.run("serve:create_app", factory=True, workers=args.workers,
+                    host=args.host, port=args.port, log_level="warning")
+    else:
+        uvicorn.run(load_app(args.kube_url), host=args.host, port=args.port,
+                    log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
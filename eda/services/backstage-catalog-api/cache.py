@@ -0,0 +1,293 @@
+"""Caches for rendered catalog-api responses and upstream reads."""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+
+class RenderCache:
+    """Rendered response bytes, tagged with the version they were rendered at.
+
+    Entries are keyed by a tuple whose first element names the endpoint
+    (``("cm", namespace, name)``, ``("root", proto, host)``,
+    ``("shard", namespace, proto, host)``, or ``("value", value)`` for a
+    single data value, whose content is its own version). Each entry holds one body per
+    representation ("yaml", "json", "json:<key>") of the same version, so
+    alternating Accept headers don't evict each other and one invalidation
+    drops them all. A lookup whose version differs from the stored one
+    re-renders, so a stale entry is never served; on_change additionally
+    drops entries as soon as the informer sees the ConfigMaps behind them
+    change. Least recently used entries are evicted until the bodies fit in
+    max_bytes and there are at most max_entries; a body larger than
+    max_bytes is returned without being cached.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_entries=4096):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version, render, representation="yaml"):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version and representation in entry[1]:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1][representation]
+            self.misses += 1
+
+        body = render()
+        if len(body) > self.max_bytes:
+            return body
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self._drop(key)
+                entry = self._entries[key] = (version, {})
+            previous = entry[1].get(representation)
+            if previous is not None:
+                self.bytes -= len(previous)
+            entry[1][representation] = body
+            self.bytes += len(body)
+            self._entries.move_to_end(key)
+            while self.bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+        return body
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= sum(len(body) for body in entry[1].values())
+
+    def invalidate(self, key):
+        with self._lock:
+            self._drop(key)
+
+    def invalidate_kind(self, *prefix):
+        """Drop every entry whose key starts with ``prefix``, e.g. ("root",)."""
+        with self._lock:
+            for key in [key for key in self._entries if key[:len(prefix)] == prefix]:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def on_change(self, event_type, key, cm):
+        """Informer listener: drop what the changed ConfigMap invalidates."""
+        self.invalidate(("cm",) + key)
+        if event_type in ("ADDED", "DELETED"):
+            self.invalidate_kind("root")
+            self.invalidate_kind("shard", key[0])
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+            }
+
+
+class TTLCache:
+    """LRU cache of upstream reads whose entries expire after a TTL.
+
+    Capacity is measured in bytes rather than entries: put takes the size of
+    the value and least recently used entries are evicted until the total
+    fits in max_bytes. Values larger than max_bytes are not cached at all.
+    """
+
+    def __init__(self, max_bytes, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value, or None if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, size, expires = entry
+                if expires > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.bytes -= size
+            self.misses += 1
+            return None
+
+    def put(self, key, value, size, ttl):
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._entries[key] = (value, size, self.clock() + ttl)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+
+    def invalidate(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry[1]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+            }
+
+
+class LastGoodCache:
+    """The most recent successful upstream result per key, kept without a TTL.
+
+    Used to keep serving when the API server is failing; get returns the
+    value together with its age in seconds. Bounded by bytes (LRU) like
+    TTLCache.
+    """
+
+    def __init__(self, max_bytes, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.bytes = 0
+        self.served = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (value, age), or None if nothing good was ever stored."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.served += 1
+            value, _, stored = entry
+            return value, self.clock() - stored
+
+    def put(self, key, value, size):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._entries[key] = (value, size, self.clock())
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+
+    def stats(self):
+        with self._lock:
+            return {"served": self.served, "entries": len(self._entries), "bytes": self.bytes}
+
+
+class ValueInterner:
+    """Keeps one copy of each distinct ConfigMap data value.
+
+    Registered as the informer's first listener, it swaps the values of
+    every stored ConfigMap for a shared copy, so documents repeated across
+    ConfigMaps (a common System or Domain definition, say) take memory once.
+    Values are matched by content (str hash, then equality) and counted per
+    ConfigMap, so a value is dropped when the last ConfigMap holding it
+    changes or is deleted.
+    """
+
+    def __init__(self):
+        self.bytes = 0
+        self.referenced_bytes = 0
+        self._values = {}
+        self._held = {}
+        self._lock = threading.Lock()
+
+    def _acquire(self, value):
+        entry = self._values.get(value)
+        if entry is None:
+            entry = self._values[value] = [value, len(value.encode()), 0]
+            self.bytes += entry[1]
+        entry[2] += 1
+        self.referenced_bytes += entry[1]
+        return entry[0]
+
+    def _release(self, value):
+        entry = self._values[value]
+        entry[2] -= 1
+        self.referenced_bytes -= entry[1]
+        if not entry[2]:
+            del self._values[value]
+            self.bytes -= entry[1]
+
+    def on_change(self, event_type, key, cm):
+        """Informer listener: intern the ConfigMap's values, in place."""
+        with self._lock:
+            held = []
+            if event_type != "DELETED" and cm.data:
+                for name, value in cm.data.items():
+                    cm.data[name] = self._acquire(value)
+                    held.append(cm.data[name])
+            # Acquire before releasing, so unchanged values keep their copy
+            for value in self._held.pop(key, ()):
+                self._release(value)
+            if held:
+                self._held[key] = held
+
+    def stats(self):
+        with self._lock:
+            return {
+                "values": len(self._values),
+                "bytes": self.bytes,
+                "saved_bytes": self.referenced_bytes - self.bytes,
+            }
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one upstream call.
+
+    The first caller for a key (the leader) starts the call; everyone who
+    asks for the same key while it is in flight awaits the same task and
+    gets its result or exception. The key is released once the call ends,
+    so later callers start a fresh one.
+    """
+
+    def __init__(self):
+        self.leaders = 0
+        self.followers = 0
+        self._calls = {}
+
+    async def do(self, key, fn):
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+            self.leaders += 1
+        else:
+            self.followers += 1
+        # Shielded so one caller going away doesn't cancel it for the rest
+        return await asyncio.shield(task)
+
+    def stats(self):
+        return {
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "in_flight": len(self._calls),
+        }
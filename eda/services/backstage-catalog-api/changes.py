@@ -0,0 +1,196 @@
+"""Change feed of catalog ConfigMaps, read with opaque cursors."""
+import asyncio
+import base64
+import secrets
+import threading
+from collections import deque
+
+
+class CursorExpired(Exception):
+    """The cursor is older than the feed remembers, or from another process
+    whose changes this one can't line up with its own."""
+
+
+def _version(resource_version):
+    """A resourceVersion as an int, or None. Kubernetes calls them opaque,
+    but the API server's (etcd's) are increasing integers, which resuming
+    another process's cursor relies on."""
+    try:
+        return int(resource_version)
+    except (TypeError, ValueError):
+        return None
+
+
+class ChangeFeed:
+    """Bounded log of ADDED/MODIFIED/DELETED ConfigMap events.
+
+    Registered as an informer listener. Each event gets a sequence number;
+    a cursor encodes the sequence number of the last event a consumer has
+    seen, a per-process epoch, and the informer's resourceVersion at that
+    event. In the process that issued it, the sequence number is used.
+    Anywhere else (after a restart, on another replica) the cursor resumes
+    from its resourceVersion, if this feed has every change since then:
+    the feed follow()s a single ConfigMapInformer, the cursor is no older
+    than that informer's last LIST, and no newer events were dropped.
+    Otherwise it is rejected rather than silently skipping changes.
+    Only the last max_events events are kept; older cursors expire.
+    """
+
+    def __init__(self, max_events=10000):
+        self.epoch = secrets.token_hex(4)
+        self._events = deque(maxlen=max_events)
+        self._seq = 0
+        self._position = ""
+        self._source = None
+        self._trimmed = None
+        self._restored_floor = None
+        self._lock = threading.Lock()
+        self._waiters = set()
+
+    def follow(self, informer):
+        """Record ``informer``'s resourceVersion with each event, so cursors
+        from other processes watching the same API server can resume here.
+
+        Only for a single ConfigMapInformer: the merged watches of a
+        NamespacedInformer aren't in resourceVersion order.
+        """
+        self._source = informer
+
+    def _encode(self, seq, position):
+        raw = f"{self.epoch}:{seq}:{position}".encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def _decode(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+            epoch, seq, position = raw.split(":", 2)
+            seq = int(seq)
+        except ValueError:
+            raise CursorExpired(f"invalid cursor {cursor!r}")
+        if epoch == self.epoch and seq <= self._seq:
+            return seq
+        return self._seq_at(position)
+
+    def _floor(self):
+        """The resourceVersion after which every change is retained, or None."""
+        if self._source is None:
+            return self._restored_floor
+        listed = _version(self._source.listed_resource_version)
+        if listed is None or self._trimmed is None:
+            return listed
+        return max(listed, self._trimmed)
+
+    def _seq_at(self, position):
+        """The sequence number of a cursor from another process."""
+        version, floor = _version(position), self._floor()
+        if version is None or floor is None or version < floor:
+            raise CursorExpired("cursor is from another run and older than its changes")
+        for seq, _, _, _, event_position in reversed(self._events):
+            event_version = _version(event_position)
+            if event_version is not None and event_version <= version:
+                return seq
+        return self._events[0][0] - 1 if self._events else self._seq
+
+    def cursor(self):
+        """Cursor for the current end of the feed."""
+        with self._lock:
+            return self._encode(self._seq, self._position)
+
+    def on_change(self, event_type, key, cm):
+        """Informer listener: append the event and wake waiting readers."""
+        with self._lock:
+            self._seq += 1
+            if self._source is not None:
+                self._position = self._source.resource_version or ""
+            if len(self._events) == self._events.maxlen:
+                # Changes up to the dropped event are no longer known
+                self._trimmed = _version(self._events[0][4])
+            self._events.append((self._seq, event_type, key,
+                                 cm.metadata.resource_version or "", self._position))
+            waiters = list(self._waiters)
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+    def since(self, cursor):
+        """Changes after ``cursor`` as (changes, next cursor).
+
+        Several events for one ConfigMap collapse into the latest, so the
+        result says what to refetch (or drop), not how it got there.
+        """
+        with self._lock:
+            seq = self._decode(cursor)
+            if seq < self._seq and (not self._events or self._events[0][0] > seq + 1):
+                raise CursorExpired("cursor is older than the retained changes")
+            latest = {}
+            for event_seq, event_type, key, resource_version, _ in self._events:
+                if event_seq > seq:
+                    latest.pop(key, None)
+                    latest[key] = (event_type, resource_version)
+            changes = [
+                {"type": event_type, "namespace": key[0], "name": key[1],
+                 "resourceVersion": resource_version}
+                for key, (event_type, resource_version) in latest.items()
+            ]
+            return changes, self._encode(self._seq, self._position)
+
+    def snapshot(self):
+        """The retained events and position, as plain JSON types."""
+        with self._lock:
+            return {
+                "epoch": self.epoch,
+                "seq": self._seq,
+                "position": self._position,
+                "floor": self._floor(),
+                "events": [[seq, event_type, list(key), resource_version, position]
+                           for seq, event_type, key, resource_version, position
+                           in self._events],
+            }
+
+    def restore(self, state):
+        """Replace the feed with another process's snapshot() and wake readers.
+
+        Worker processes follow the watcher's feed this way, so a cursor
+        from any of them is valid on all of them.
+        """
+        with self._lock:
+            self.epoch = state["epoch"]
+            self._seq = state["seq"]
+            self._position = state["position"]
+            self._restored_floor = state["floor"]
+            self._events.clear()
+            self._events.extend(
+                (seq, event_type, tuple(key), resource_version, position)
+                for seq, event_type, key, resource_version, position in state["events"]
+            )
+            waiters = list(self._waiters)
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+    async def wait(self, cursor, timeout):
+        """Wait up to ``timeout`` seconds for a change after ``cursor``.
+
+        Returns whether one arrived.
+        """
+        loop = asyncio.get_running_loop()
+        waiter = (loop, loop.create_future())
+        with self._lock:
+            if self._decode(cursor) < self._seq:
+                return True
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+    def stats(self):
+        with self._lock:
+            return {"events": len(self._events), "waiters": len(self._waiters)}
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,182 @@
+"""In-memory index of the Backstage entities held in catalog ConfigMaps."""
+import logging
+import threading
+
+import yaml
+
+from formats import load_documents
+
+log = logging.getLogger(__name__)
+
+# Entity fields that can be queried, and where they live in the document
+INDEXED_FIELDS = {
+    "kind": ("kind",),
+    "namespace": ("metadata", "namespace"),
+    "name": ("metadata", "name"),
+    "owner": ("spec", "owner"),
+    "system": ("spec", "system"),
+    "lifecycle": ("spec", "lifecycle"),
+}
+
+
+def field_value(entity, path):
+    value = entity
+    for part in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    if value is None:
+        return None
+    return str(value).lower()
+
+
+def entity_ref(entity):
+    """Backstage entity reference, kind:namespace/name, lowercased."""
+    return "{}:{}/{}".format(
+        field_value(entity, ("kind",)),
+        field_value(entity, ("metadata", "namespace")) or "default",
+        field_value(entity, ("metadata", "name")),
+    )
+
+
+def value_documents(cm, key):
+    """The documents of one ConfigMap value; none (logged) if it isn't YAML."""
+    try:
+        return load_documents(cm.data[key])
+    except yaml.YAMLError as e:
+        log.warning("Skipping %s/%s %s: %s",
+                    cm.metadata.namespace, cm.metadata.name, key, e)
+        return []
+
+
+def configmap_text(cm):
+    """A ConfigMap's YAML, as GET /{ns}/{cm} serves it: its values joined by
+    newlines into one stream, as Backstage has always read them.
+
+    A value only starts a new document if it begins with a ``---`` marker
+    (or the value before it ends with one); otherwise it continues the
+    previous value's document. The JSON representation and the entity
+    index parse this same stream, so every view of a ConfigMap agrees.
+    """
+    return "\n".join(cm.data.values()) + "\n"
+
+
+def configmap_documents(cm):
+    """The documents of a ConfigMap's YAML; none (logged) if it isn't YAML."""
+    if not cm.data:
+        return []
+    try:
+        return load_documents(configmap_text(cm))
+    except yaml.YAMLError as e:
+        log.warning("Skipping %s/%s: %s", cm.metadata.namespace, cm.metadata.name, e)
+        return []
+
+
+def parse_entities(cm):
+    """Every entity document in a ConfigMap's YAML; bad YAML is skipped."""
+    return [
+        document for document in configmap_documents(cm)
+        if isinstance(document, dict) and document.get("kind")
+        and field_value(document, ("metadata", "name"))
+    ]
+
+
+class EntityIndex:
+    """Parsed entities, indexed by ref and by each of INDEXED_FIELDS.
+
+    Registered as an informer listener, so a ConfigMap's YAML is parsed
+    once per change rather than per request. Matching is case-insensitive,
+    and entities without a namespace are in "default", as in Backstage.
+    """
+
+    def __init__(self):
+        self._entities = {}
+        # ref -> {ConfigMap key: entity}, oldest definition first
+        self._copies = {}
+        self._sources = {}
+        self._index = {field: {} for field in INDEXED_FIELDS}
+        self._lock = threading.Lock()
+
+    def _values(self, entity):
+        values = {field: field_value(entity, path) for field, path in INDEXED_FIELDS.items()}
+        values["namespace"] = values["namespace"] or "default"
+        return values
+
+    def _add(self, ref, entity):
+        self._entities[ref] = entity
+        for field, value in self._values(entity).items():
+            if value is not None:
+                self._index[field].setdefault(value, set()).add(ref)
+
+    def _discard(self, ref):
+        entity = self._entities.pop(ref)
+        for field, value in self._values(entity).items():
+            refs = self._index[field].get(value)
+            if refs is not None:
+                refs.discard(ref)
+                if not refs:
+                    del self._index[field][value]
+
+    def _select(self, ref):
+        """Index the most recently defined copy of ``ref``, if any is left."""
+        if ref in self._entities:
+            self._discard(ref)
+        copies = self._copies.get(ref)
+        if copies:
+            self._add(ref, next(reversed(copies.values())))
+
+    def on_change(self, event_type, key, cm):
+        """Informer listener: re-index the entities of the changed ConfigMap.
+
+        An entity defined in several ConfigMaps is served from the one that
+        defined it last, and stays until every one of them drops it.
+        """
+        entities = parse_entities(cm) if event_type != "DELETED" else []
+        with self._lock:
+            changed = self._sources.pop(key, set())
+            for ref in changed:
+                copies = self._copies[ref]
+                del copies[key]
+                if not copies:
+                    del self._copies[ref]
+            refs = set()
+            for entity in entities:
+                ref = entity_ref(entity)
+                copies = self._copies.setdefault(ref, {})
+                copies.pop(key, None)
+                copies[key] = entity
+                if len(copies) > 1 and ref not in refs:
+                    log.warning("Entity %s defined in %d ConfigMaps, serving the copy from %s/%s",
+                                ref, len(copies), *key)
+                refs.add(ref)
+            if refs:
+                self._sources[key] = refs
+            for ref in changed | refs:
+                self._select(ref)
+
+    def get(self, ref):
+        with self._lock:
+            return self._entities.get(ref.lower())
+
+    def query(self, **filters):
+        """Entities matching every given field, ordered by ref.
+
+        Intersects the per-field sets starting from the smallest, so the
+        cost follows the number of matches rather than the catalog size.
+        """
+        filters = {field: str(value).lower() for field, value in filters.items()
+                   if value is not None}
+        with self._lock:
+            if not filters:
+                refs = set(self._entities)
+            else:
+                candidates = sorted(
+                    (self._index[field].get(value, set()) for field, value in filters.items()),
+                    key=len,
+                )
+                refs = set(candidates[0]).intersection(*candidates[1:])
+            return [self._entities[ref] for ref in sorted(refs)]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entities)
@@ -0,0 +1,75 @@
+"""Response representations (YAML, JSON) and Accept negotiation."""
+import orjson
+import yaml
+
+# libyaml's C implementations when PyYAML was built with them
+YAML_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+MEDIA_TYPES = {
+    "application/yaml": "yaml",
+    "application/x-yaml": "yaml",
+    "text/yaml": "yaml",
+    "text/x-yaml": "yaml",
+    "application/json": "json",
+}
+
+CONTENT_TYPES = {"yaml": "application/yaml", "json": "application/json"}
+
+
+def negotiate(accept):
+    """"json" or "yaml" for an Accept header; YAML unless JSON's q is higher.
+
+    Each media type takes the q of the most specific range matching it
+    (application/json, then application/*, then */*), so wildcards count:
+    "application/json;q=0.1, */*" prefers YAML.
+    """
+    ranges = {}
+    for media_range in (accept or "").split(","):
+        media_type, *params = media_range.split(";")
+        q = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        media_type = media_type.strip().lower()
+        ranges[media_type] = max(q, ranges.get(media_type, 0.0))
+    quality = {"yaml": 0.0, "json": 0.0}
+    for media_type, representation in MEDIA_TYPES.items():
+        for candidate in (media_type, media_type.split("/")[0] + "/*", "*/*"):
+            if candidate in ranges:
+                quality[representation] = max(quality[representation], ranges[candidate])
+                break
+    return "json" if quality["json"] > quality["yaml"] else "yaml"
+
+
+def etag(tag, representation):
+    """Strong ETag for one representation of the same state."""
+    return f'"{tag}"' if representation == "yaml" else f'"{tag}-{representation}"'
+
+
+def dump_yaml(data):
+    return yaml.dump(data, Dumper=YAML_DUMPER, sort_keys=False).encode()
+
+
+def json_default(value):
+    """YAML types orjson has no encoding for: !!set and !!binary."""
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    raise TypeError
+
+
+def dump_json(data):
+    # YAML mappings can have int, bool or null keys (8080: http, on: true)
+    return orjson.dumps(data, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def load_documents(text):
+    """The non-empty documents of a (multi-document) YAML string."""
+    return [document for document in yaml.load_all(text, Loader=YAML_LOADER)
+            if document is not None]
@@ -0,0 +1,487 @@
+"""In-process list/watch cache of the labelled catalog ConfigMaps."""
+import logging
+import threading
+import time
+
+from kubernetes import client, watch
+
+from metrics import kube_call
+
+log = logging.getLogger(__name__)
+
+HTTP_GONE = 410
+
+# Ask for names and versions only; servers that can't do that send full JSON
+PARTIAL_METADATA_ACCEPT = (
+    "application/json;as=PartialObjectMetadataList;g=meta.k8s.io;v=v1,"
+    "application/json"
+)
+
+
+def list_query(label_selector, limit=None, _continue=None):
+    query = [("labelSelector", label_selector)]
+    if limit:
+        query.append(("limit", limit))
+    if _continue:
+        query.append(("continue", _continue))
+    return query
+
+
+def metadata_page(body):
+    """Turn a (PartialObjectMetadata or ConfigMap) list body into a V1ConfigMapList
+    whose items carry metadata only, so it pages like a regular LIST."""
+    meta = body.get("metadata") or {}
+    return client.V1ConfigMapList(
+        metadata=client.V1ListMeta(
+            _continue=meta.get("continue"),
+            resource_version=meta.get("resourceVersion"),
+        ),
+        items=[
+            client.V1ConfigMap(metadata=client.V1ObjectMeta(
+                namespace=item["metadata"]["namespace"],
+                name=item["metadata"]["name"],
+                resource_version=item["metadata"].get("resourceVersion"),
+            ))
+            for item in body.get("items") or []
+        ],
+    )
+
+
+def configmaps_path(namespace=None):
+    if namespace is None:
+        return "/api/v1/configmaps"
+    return f"/api/v1/namespaces/{namespace}/configmaps"
+
+
+def list_config_map_metadata(api, label_selector, limit=None, _continue=None,
+                             namespace=None, _request_timeout=None):
+    """LIST ConfigMaps as PartialObjectMetadata, skipping their data."""
+    body = api.api_client.call_api(
+        configmaps_path(namespace), "GET",
+        query_params=list_query(label_selector, limit, _continue),
+        header_params={"Accept": PARTIAL_METADATA_ACCEPT},
+        response_type="object",
+        auth_settings=["BearerToken"],
+        _return_http_data_only=True,
+        _request_timeout=_request_timeout,
+    )
+    return metadata_page(body)
+
+
+def list_scopes(namespaces=None):
+    """LIST kwargs for each namespace, or one cluster-wide LIST for None."""
+    if namespaces is None:
+        return [{}]
+    return [{"namespace": ns} for ns in namespaces]
+
+
+def list_pages(list_func, label_selector, page_size, **kwargs):
+    """Yield one LIST page at a time, following continue tokens.
+
+    A page_size of 0 disables chunking and asks for everything at once.
+    """
+    token = None
+    while True:
+        if page_size:
+            kwargs.update(limit=page_size)
+            if token:
+                kwargs.update(_continue=token)
+        page = list_func(label_selector=label_selector, **kwargs)
+        yield page
+        token = page.metadata._continue
+        if not page_size or not token:
+            return
+
+
+def encode_configmap(cm):
+    """The parts of a ConfigMap catalog-api uses, as plain JSON types."""
+    return {
+        "namespace": cm.metadata.namespace,
+        "name": cm.metadata.name,
+        "resourceVersion": cm.metadata.resource_version,
+        "data": cm.data,
+    }
+
+
+def decode_configmap(item):
+    return client.V1ConfigMap(
+        metadata=client.V1ObjectMeta(
+            namespace=item["namespace"],
+            name=item["name"],
+            resource_version=item["resourceVersion"],
+        ),
+        data=item["data"],
+    )
+
+
+def diff(old, new):
+    """Watch-style events that turn store ``old`` into store ``new``."""
+    changes = []
+    for key, cm in new.items():
+        previous = old.get(key)
+        if previous is None:
+            changes.append(("ADDED", key, cm))
+        elif previous.metadata.resource_version != cm.metadata.resource_version:
+            changes.append(("MODIFIED", key, cm))
+    for key, cm in old.items():
+        if key not in new:
+            changes.append(("DELETED", key, cm))
+    return changes
+
+
+def keep_unchanged(old, new):
+    """Put ``old``'s object in ``new`` wherever the resourceVersion matches.
+
+    diff() reports nothing for those keys, so listeners (the ValueInterner,
+    render caches) never see the fresh copy; keeping the object they did see
+    keeps their view of the store true.
+    """
+    for key, cm in new.items():
+        previous = old.get(key)
+        if (previous is not None
+                and previous.metadata.resource_version == cm.metadata.resource_version):
+            new[key] = previous
+
+
+class ConfigMapInformer:
+    """Keeps an in-memory map of (namespace, name) -> ConfigMap.
+
+    Does one LIST to seed the map, then follows a WATCH from the LIST's
+    resourceVersion. If the server answers 410 Gone (our resourceVersion has
+    been compacted away) the map is rebuilt from a fresh LIST.
+
+    Listeners registered with add_listener are called as
+    ``listener(event_type, (namespace, name), cm)`` for every ADDED, MODIFIED
+    or DELETED ConfigMap, including the differences found by a relist.
+
+    With ``namespace`` set, lists and watches that namespace only, which
+    needs a Role there rather than cluster-wide access.
+    """
+
+    def __init__(self, api, label_selector, page_size=50, watch_timeout=300,
+                 retry_delay=5, namespace=None):
+        self.api = api
+        self.label_selector = label_selector
+        self.namespace = namespace
+        self.page_size = page_size
+        self.watch_timeout = watch_timeout
+        self.retry_delay = retry_delay
+        self.resource_version = None
+        # Where the last LIST (or restore) left off; every change after it
+        # arrives as a watch event, in resourceVersion order
+        self.listed_resource_version = None
+        self._store = {}
+        self._lock = threading.Lock()
+        self._synced = threading.Event()
+        self._stopped = threading.Event()
+        self._watch = None
+        self._thread = None
+        self._listeners = []
+
+    @property
+    def synced(self):
+        return self._synced.is_set()
+
+    def wait_synced(self, timeout=None):
+        return self._synced.wait(timeout)
+
+    def _list_call(self):
+        """The LIST function and its scope kwargs, for list_pages and watches."""
+        if self.namespace is None:
+            return self.api.list_config_map_for_all_namespaces, {}
+        return self.api.list_namespaced_config_map, {"namespace": self.namespace}
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def _notify(self, changes):
+        for event_type, key, cm in changes:
+            for listener in self._listeners:
+                try:
+                    listener(event_type, key, cm)
+                except Exception:
+                    log.exception("ConfigMap listener failed on %s %s", event_type, key)
+
+    def get(self, namespace, name):
+        with self._lock:
+            return self._store.get((namespace, name))
+
+    def list(self):
+        """Return the cached ConfigMaps ordered by namespace and name."""
+        with self._lock:
+            return [self._store[key] for key in sorted(self._store)]
+
+    def keys(self):
+        """Return the cached (namespace, name) pairs in order."""
+        with self._lock:
+            return sorted(self._store)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._store)
+
+    def relist(self):
+        """Replace the whole map with the result of a fresh (paged) LIST."""
+        store = {}
+        list_func, scope = self._list_call()
+        with kube_call("list"):
+            for page in list_pages(
+                list_func, self.label_selector, self.page_size, **scope
+            ):
+                for cm in page.items:
+                    store[(cm.metadata.namespace, cm.metadata.name)] = cm
+                resource_version = page.metadata.resource_version
+        with self._lock:
+            old, self._store = self._store, store
+            keep_unchanged(old, store)
+            self.resource_version = self.listed_resource_version = resource_version
+        # Listeners hear a LIST's differences before it counts as synced, so
+        # they can tell the initial LIST from the changes that follow it
+        self._notify(diff(old, store))
+        self._synced.set()
+        log.info("Listed %d catalog ConfigMaps at resourceVersion %s",
+                 len(store), self.resource_version)
+
+    def snapshot(self):
+        """The map and its resourceVersion, as plain JSON types."""
+        with self._lock:
+            return {
+                "resourceVersion": self.resource_version,
+                "configmaps": [encode_configmap(cm) for cm in self._store.values()],
+            }
+
+    def restore(self, state):
+        """Seed the map from a snapshot() so it can serve before any LIST.
+
+        The next watch resumes from the snapshot's resourceVersion; if that
+        has been compacted away the 410 triggers a relist as usual.
+        """
+        store = {}
+        for item in state["configmaps"]:
+            cm = decode_configmap(item)
+            store[(cm.metadata.namespace, cm.metadata.name)] = cm
+        with self._lock:
+            old, self._store = self._store, store
+            keep_unchanged(old, store)
+            self.resource_version = self.listed_resource_version = state["resourceVersion"]
+        self._notify(diff(old, store))
+        self._synced.set()
+        log.info("Restored %d catalog ConfigMaps at resourceVersion %s",
+                 len(store), self.resource_version)
+
+    def apply(self, event_type, cm):
+        """Apply a single watch event to the map."""
+        key = (cm.metadata.namespace, cm.metadata.name)
+        with self._lock:
+            if event_type in ("ADDED", "MODIFIED"):
+                self._store[key] = cm
+            elif event_type == "DELETED":
+                self._store.pop(key, None)
+            self.resource_version = cm.metadata.resource_version
+        if event_type in ("ADDED", "MODIFIED", "DELETED"):
+            self._notify([(event_type, key, cm)])
+
+    def bookmark(self, resource_version):
+        """A BOOKMARK: nothing changed up to ``resource_version``."""
+        with self._lock:
+            self.resource_version = resource_version
+
+    def watch_once(self):
+        """Follow one WATCH request until the server closes it."""
+        self._watch = watch.Watch()
+        list_func, scope = self._list_call()
+        with kube_call("watch"):
+            for event in self._watch.stream(
+                list_func,
+                **scope,
+                label_selector=self.label_selector,
+                resource_version=self.resource_version,
+                timeout_seconds=self.watch_timeout,
+                allow_watch_bookmarks=True,
+            ):
+                if event["type"] == "BOOKMARK":
+                    # The client doesn't deserialize bookmarks: the object is
+                    # a plain dict with nothing but the resourceVersion
+                    self.bookmark(event["raw_object"]["metadata"]["resourceVersion"])
+                else:
+                    self.apply(event["type"], event["object"])
+                if self._stopped.is_set():
+                    break
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                if self.resource_version is None:
+                    self.relist()
+                self.watch_once()
+            except client.exceptions.ApiException as e:
+                if e.status == HTTP_GONE:
+                    log.info("Watch expired at resourceVersion %s, relisting",
+                             self.resource_version)
+                    self.resource_version = None
+                    continue
+                log.warning("ConfigMap watch failed: %s", e.reason)
+                self._stopped.wait(self.retry_delay)
+            except Exception:
+                log.exception("ConfigMap watch failed")
+                self._stopped.wait(self.retry_delay)
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.run, name="configmap-informer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout=1):
+        self._stopped.set()
+        if self._watch is not None:
+            self._watch.stop()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+class NamespacedInformer:
+    """One ConfigMapInformer per namespace, merged into a single view.
+
+    Namespaces are either given explicitly or found by listing namespaces
+    matching ``namespace_selector`` every ``resync_period`` seconds; each
+    gets its own list/watch thread. When a namespace stops matching, its
+    informer is stopped and its ConfigMaps are reported DELETED. Offers the
+    same read and listener interface as ConfigMapInformer.
+    """
+
+    def __init__(self, api, label_selector, namespaces=(), namespace_selector=None,
+                 resync_period=60, retry_delay=5, **informer_kwargs):
+        self.api = api
+        self.label_selector = label_selector
+        self.namespaces = list(namespaces)
+        self.namespace_selector = namespace_selector
+        self.resync_period = resync_period
+        self.retry_delay = retry_delay
+        self.informer_kwargs = informer_kwargs
+        self._informers = {}
+        self._lock = threading.Lock()
+        self._resolved = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._listeners = []
+
+    def _children(self):
+        with self._lock:
+            return [self._informers[ns] for ns in sorted(self._informers)]
+
+    @property
+    def synced(self):
+        return self._resolved.is_set() and all(i.synced for i in self._children())
+
+    def wait_synced(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def remaining():
+            return None if deadline is None else max(deadline - time.monotonic(), 0)
+
+        if not self._resolved.wait(remaining()):
+            return False
+        return all(i.wait_synced(remaining()) for i in self._children())
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def _notify(self, event_type, key, cm):
+        for listener in self._listeners:
+            try:
+                listener(event_type, key, cm)
+            except Exception:
+                log.exception("ConfigMap listener failed on %s %s", event_type, key)
+
+    def get(self, namespace, name):
+        with self._lock:
+            informer = self._informers.get(namespace)
+        return informer.get(namespace, name) if informer is not None else None
+
+    def list(self):
+        return [cm for informer in self._children() for cm in informer.list()]
+
+    def keys(self):
+        return [key for informer in self._children() for key in informer.keys()]
+
+    def __len__(self):
+        return sum(len(informer) for informer in self._children())
+
+    def _new_informer(self, namespace):
+        informer = ConfigMapInformer(
+            self.api, self.label_selector, namespace=namespace,
+            retry_delay=self.retry_delay, **self.informer_kwargs,
+        )
+        informer.add_listener(self._notify)
+        return informer
+
+    def snapshot(self):
+        return {"namespaces": {
+            informer.namespace: informer.snapshot() for informer in self._children()
+        }}
+
+    def restore(self, state):
+        """Seed one informer per snapshotted namespace; see ConfigMapInformer.
+
+        The namespaces themselves are re-checked when the informer starts.
+        """
+        with self._lock:
+            for namespace in state["namespaces"]:
+                self._informers[namespace] = self._new_informer(namespace)
+        for informer in self._children():
+            informer.restore(state["namespaces"][informer.namespace])
+        self._resolved.set()
+
+    def watched_namespaces(self):
+        if not self.namespace_selector:
+            return set(self.namespaces)
+        with kube_call("list"):
+            found = self.api.list_namespace(label_selector=self.namespace_selector)
+        return {ns.metadata.name for ns in found.items}
+
+    def sync_namespaces(self):
+        """Start informers for new namespaces and stop those for gone ones."""
+        wanted = self.watched_namespaces()
+        with self._lock:
+            added = wanted - self._informers.keys()
+            removed = {ns: self._informers.pop(ns) for ns in self._informers.keys() - wanted}
+            for ns in added:
+                self._informers[ns] = self._new_informer(ns)
+            # Includes informers restored from a snapshot but not yet running
+            started = [i for i in self._informers.values() if i._thread is None]
+        for informer in started:
+            informer.start()
+        for ns, informer in removed.items():
+            informer.stop()
+            for cm in informer.list():
+                self._notify("DELETED", (ns, cm.metadata.name), cm)
+        if added or removed:
+            log.info("Watching ConfigMaps in %d namespaces (+%d -%d)",
+                     len(wanted), len(added), len(removed))
+        self._resolved.set()
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                self.sync_namespaces()
+            except Exception:
+                log.exception("Listing catalog namespaces failed")
+                self._stopped.wait(self.retry_delay)
+                continue
+            if not self.namespace_selector:
+                return
+            self._stopped.wait(self.resync_period)
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.run, name="namespace-informer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout=1):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        for informer in self._children():
+            informer.stop(timeout)
@@ -0,0 +1,169 @@
+"""Prometheus metrics for catalog-api."""
+import time
+from contextlib import contextmanager
+
+from kubernetes import client
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+REQUEST_DURATION = Histogram(
+    "catalog_api_request_duration_seconds",
+    "Time to serve an HTTP request, by route template.",
+    ["route", "method", "status"],
+)
+RESPONSE_SIZE = Histogram(
+    "catalog_api_response_size_bytes",
+    "Size of HTTP response bodies, by route template.",
+    ["route"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216),
+)
+KUBE_REQUESTS = Counter(
+    "catalog_api_kube_requests_total",
+    "Calls made to the Kubernetes API server. A paged LIST counts once.",
+    ["operation", "outcome"],
+)
+KUBE_DURATION = Histogram(
+    "catalog_api_kube_request_duration_seconds",
+    "Latency of Kubernetes API calls (list, read). Watches are not timed.",
+    ["operation"],
+)
+WATCH_EVENTS = Counter(
+    "catalog_api_watch_events_total",
+    "ConfigMap changes applied to the informer cache.",
+    ["type"],
+)
+
+
+@contextmanager
+def kube_call(operation):
+    """Count and time one Kubernetes API call made inside the block."""
+    start = time.perf_counter()
+    outcome = "success"
+    try:
+        yield
+    except client.exceptions.ApiException as e:
+        outcome = str(e.status)
+        raise
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        KUBE_REQUESTS.labels(operation, outcome).inc()
+        if operation != "watch":
+            KUBE_DURATION.labels(operation).observe(time.perf_counter() - start)
+
+
+def on_configmap_event(event_type, key, cm):
+    """Informer listener counting applied changes."""
+    WATCH_EVENTS.labels(event_type).inc()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and body size for every request.
+
+    Wraps send() rather than the response object so streamed bodies are
+    measured as they go out.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_and_measure(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_measure)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_DURATION.labels(route, scope["method"], str(status)).observe(
+                time.perf_counter() - start
+            )
+            RESPONSE_SIZE.labels(route).observe(size)
+
+
+class StatsCollector:
+    """Exports the app's cache and informer stats at scrape time.
+
+    ``stats`` is a callable returning the same dict GET /-/stats serves.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def collect(self):
+        stats = self.stats()
+
+        hits = CounterMetricFamily(
+            "catalog_api_cache_hits", "Cache lookups answered from cache.", labels=["cache"])
+        misses = CounterMetricFamily(
+            "catalog_api_cache_misses", "Cache lookups that had to render or fetch.", labels=["cache"])
+        entries = GaugeMetricFamily(
+            "catalog_api_cache_entries", "Entries currently cached.", labels=["cache"])
+        cached_bytes = GaugeMetricFamily(
+            "catalog_api_cache_bytes", "Bytes currently cached.", labels=["cache"])
+        for name in ("render_cache", "read_cache"):
+            cache = stats[name]
+            label = [name.removesuffix("_cache")]
+            hits.add_metric(label, cache["hits"])
+            misses.add_metric(label, cache["misses"])
+            entries.add_metric(label, cache["entries"])
+            cached_bytes.add_metric(label, cache["bytes"])
+        yield from (hits, misses, entries, cached_bytes)
+
+        flights = CounterMetricFamily(
+            "catalog_api_single_flight_calls",
+            "Upstream fetches started (leader) or joined (follower).", labels=["role"])
+        flights.add_metric(["leader"], stats["single_flight"]["leaders"])
+        flights.add_metric(["follower"], stats["single_flight"]["followers"])
+        yield flights
+
+        yield CounterMetricFamily(
+            "catalog_api_stale_responses",
+            "Responses served from the last good copy while the API server failed.",
+            value=stats["last_good"]["served"],
+        )
+        yield CounterMetricFamily(
+            "catalog_api_rate_limited",
+            "API calls refused by the client-side rate limit.",
+            value=stats["rate_limit"]["rejected"],
+        )
+        yield GaugeMetricFamily(
+            "catalog_api_circuit_open",
+            "1 while the Kubernetes API circuit breaker is open or half-open.",
+            value=int(stats["circuit_breaker"]["state"] != "closed"),
+        )
+
+        if stats.get("backstage_refresh") is not None:
+            refreshes = CounterMetricFamily(
+                "catalog_api_backstage_refreshes",
+                "Location refreshes requested from Backstage.", labels=["result"])
+            refreshes.add_metric(["sent"], stats["backstage_refresh"]["sent"])
+            refreshes.add_metric(["failed"], stats["backstage_refresh"]["failed"])
+            yield refreshes
+
+        interned = GaugeMetricFamily(
+            "catalog_api_interned_value_bytes",
+            "ConfigMap data held once per distinct value (stored), and the "
+            "duplicate bytes that saved (saved).", labels=["kind"])
+        interned.add_metric(["stored"], stats["interned_values"]["bytes"])
+        interned.add_metric(["saved"], stats["interned_values"]["saved_bytes"])
+        yield interned
+
+        yield GaugeMetricFamily(
+            "catalog_api_tracked_configmaps",
+            "Catalog ConfigMaps held by the informer.",
+            value=stats["configmaps"],
+        )
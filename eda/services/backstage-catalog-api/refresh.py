@@ -0,0 +1,102 @@
+"""Asking Backstage to re-read the Locations whose ConfigMaps changed."""
+import hashlib
+import json
+import logging
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+
+def location_ref(target):
+    """The ref of the Location entity Backstage creates for a url target
+    (generated-<sha1 of "url:<target>">, as locationSpecToMetadataName)."""
+    digest = hashlib.sha1(f"url:{target}".encode()).hexdigest()
+    return f"location:default/generated-{digest}"
+
+
+class RefreshNotifier:
+    """Batches informer events into calls to Backstage's catalog refresh API.
+
+    Location targets passed to ``queue`` are collected for ``window``
+    seconds after the first one, de-duplicated, and then each is sent as ``POST {catalog_url}/refresh`` with its Location's entity ref,
+    ``concurrency`` at a time. Failures are logged and counted but not
+    retried: Backstage's own polling still catches up.
+    """
+
+    def __init__(self, catalog_url, token="", window=2, concurrency=4, timeout=10):
+        self.url = catalog_url.rstrip("/") + "/refresh"
+        self.token = token
+        self.window = window
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.sent = 0
+        self.failed = 0
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def queue(self, targets):
+        """Add Location targets to the next batch."""
+        with self._lock:
+            self._pending.update(targets)
+        self._wake.set()
+
+    def post(self, target):
+        body = json.dumps({"entityRef": location_ref(target)}).encode()
+        request = urllib.request.Request(
+            self.url, data=body, method="POST",
+            headers={"Content-Type": "application/json"},
+        )
+        if self.token:
+            request.add_header("Authorization", f"Bearer {self.token}")
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout):
+                pass
+        except (urllib.error.URLError, OSError) as e:
+            log.warning("Backstage refresh of %s failed: %s", target, e)
+            return False
+        return True
+
+    def flush(self):
+        """Send everything queued so far; return the number of targets sent."""
+        with self._lock:
+            batch, self._pending = sorted(self._pending), set()
+        if not batch:
+            return 0
+        with ThreadPoolExecutor(self.concurrency) as pool:
+            results = list(pool.map(self.post, batch))
+        with self._lock:
+            self.sent += results.count(True)
+            self.failed += results.count(False)
+        log.info("Asked Backstage to refresh %d Locations", len(batch))
+        return len(batch)
+
+    def run(self):
+        while not self._stopped.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            # Let the rest of a burst (a relist, kubectl apply -f dir/) arrive
+            if self._stopped.wait(self.window):
+                break
+            self.flush()
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.run, name="backstage-refresh", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout=1):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {"pending": len(self._pending), "sent": self.sent, "failed": self.failed}
@@ -0,0 +1,111 @@
+"""Rate limiting and circuit breaking for calls to the Kubernetes API."""
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """Allows ``rate`` calls per second on average, in bursts of up to ``burst``.
+
+    acquire() reserves a token and sleeps until it is due, unless that would
+    take longer than max_wait, in which case it gives up without waiting.
+    A rate of 0 disables the limit.
+    """
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = burst
+        self.rejected = 0
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait):
+        """Take a token; return the seconds to wait for it, or None if too long."""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(0.0, (1 - self.tokens) / self.rate)
+            if wait > max_wait:
+                self.rejected += 1
+                return None
+            self.tokens -= 1
+            return wait
+
+    async def acquire(self, max_wait):
+        wait = self.reserve(max_wait)
+        if wait is None:
+            return False
+        if wait:
+            await asyncio.sleep(wait)
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {"tokens": round(self.tokens, 2), "rejected": self.rejected}
+
+
+class CircuitBreaker:
+    """Stops calling a failing upstream for a while.
+
+    Opens after ``threshold`` consecutive failures. While open, allow()
+    refuses calls; after ``reset_timeout`` seconds one trial call is let
+    through (half-open), and its outcome closes or re-opens the breaker.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and \
+                    self.clock() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def abandon(self):
+        """Give back a trial call that allow() granted but that wasn't made."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                if self.state != self.OPEN:
+                    self.opened += 1
+                self.state = self.OPEN
+                self._opened_at = self.clock()
+
+    def retry_after(self):
+        """Seconds until an open breaker lets a trial call through, else None."""
+        with self._lock:
+            if self.state != self.OPEN:
+                return None
+            return max(0.0, self.reset_timeout - (self.clock() - self._opened_at))
+
+    def stats(self):
+        with self._lock:
+            return {"state": self.state, "failures": self.failures, "opened": self.opened}
@@ -0,0 +1,244 @@
+"""The watcher's ConfigMaps, published to a memory-mapped file for other workers.
+
+With several worker processes, one of them (the holder of WatcherLock) runs
+the informer and publish()es its ConfigMaps; the rest serve from a
+SharedCatalog mapping the latest published file. Put the file on tmpfs
+(/dev/shm, or an emptyDir with medium: Memory) and every worker reads the
+same pages, so memory and the number of watches don't grow with workers.
+
+File layout: a fixed HEADER, then each ConfigMap's values back to back, each
+followed by a newline (so a ConfigMap's region is exactly its rendered YAML),
+then a JSON index of names, resourceVersions, offsets and value lengths.
+"""
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections.abc import Mapping
+from types import SimpleNamespace
+
+import orjson
+
+from informer import diff
+
+log = logging.getLogger(__name__)
+
+MAGIC = b"CATAPI\x00\x01"
+
+# magic, generation, index offset, index length
+HEADER = struct.Struct("<8sQQQ")
+
+
+def publish(path, configmaps, changes=None):
+    """Write ``configmaps`` to ``path`` as a new file, replacing it atomically.
+
+    Published files are never modified, so readers that mapped an earlier
+    one keep a consistent view until they move on. ``changes`` is stored
+    alongside for the readers' change feeds. Returns the new generation,
+    or None if the file could not be written (logged, not raised).
+    """
+    generation = time.time_ns()
+    try:
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".shared-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                out.write(HEADER.pack(MAGIC, 0, 0, 0))
+                offset = HEADER.size
+                entries = []
+                for cm in configmaps:
+                    start, lengths = offset, []
+                    for key, value in (cm.data or {}).items():
+                        encoded = value.encode()
+                        out.write(encoded)
+                        out.write(b"\n")
+                        lengths.append([key, len(encoded)])
+                        offset += len(encoded) + 1
+                    entries.append([cm.metadata.namespace, cm.metadata.name,
+                                    cm.metadata.resource_version, start, lengths])
+                index = orjson.dumps({"configmaps": entries, "changes": changes})
+                out.write(index)
+                out.seek(0)
+                out.write(HEADER.pack(MAGIC, generation, offset, len(index)))
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except OSError as e:
+        log.warning("Could not publish %s: %s", path, e)
+        return None
+    return generation
+
+
+class SharedData(Mapping):
+    """A ConfigMap's data, decoded from the mapped file on access."""
+
+    def __init__(self, view, spans):
+        self._view = view
+        self._spans = spans
+        self.nbytes = sum(end - start for start, end in spans.values())
+
+    def __getitem__(self, key):
+        start, end = self._spans[key]
+        return str(self._view[start:end], "utf-8")
+
+    def __iter__(self):
+        return iter(self._spans)
+
+    def __len__(self):
+        return len(self._spans)
+
+
+class SharedConfigMap:
+    """Read-only stand-in for a V1ConfigMap held in a published file.
+
+    ``rendered`` is the ConfigMap's YAML as served by GET /{ns}/{cm}, a view
+    of the mapped file rather than a copy.
+    """
+
+    def __init__(self, view, namespace, name, resource_version, start, lengths):
+        spans, offset = {}, start
+        for key, length in lengths:
+            spans[key] = (offset, offset + length)
+            offset += length + 1
+        self.metadata = SimpleNamespace(
+            namespace=namespace, name=name, resource_version=resource_version
+        )
+        self._view = view
+        self._spans = spans
+        self.data = SharedData(view, spans)
+        self.rendered = view[start:offset]
+
+    def rendered_key(self, key):
+        """One value as served by GET /{ns}/{cm}/{key}, newline included."""
+        start, end = self._spans[key]
+        return self._view[start:end + 1]
+
+
+class SharedCatalog:
+    """The read interface of ConfigMapInformer, over the latest published file.
+
+    refresh() maps a newly published file, if there is one, and calls the
+    listeners with the differences from the previous one, as an informer's
+    relist does.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.generation = None
+        self.changes = None
+        self._identity = None
+        self._store = {}
+        self._lock = threading.Lock()
+        self._notify_lock = threading.Lock()
+        self._listeners = []
+
+    @property
+    def synced(self):
+        return self.generation is not None
+
+    def add_listener(self, listener, replay=False):
+        """With ``replay``, first call ``listener`` with ADDED for every
+        ConfigMap already mapped, so it can join after the first refresh()."""
+        with self._notify_lock:
+            self._listeners.append(listener)
+            if replay:
+                with self._lock:
+                    added = [("ADDED", key, cm) for key, cm in sorted(self._store.items())]
+                self._notify(added, [listener])
+
+    def _notify(self, changes, listeners=None):
+        for event_type, key, cm in changes:
+            for listener in listeners or self._listeners:
+                try:
+                    listener(event_type, key, cm)
+                except Exception:
+                    log.exception("ConfigMap listener failed on %s %s", event_type, key)
+
+    def get(self, namespace, name):
+        with self._lock:
+            return self._store.get((namespace, name))
+
+    def list(self):
+        """Return the published ConfigMaps ordered by namespace and name."""
+        with self._lock:
+            return [self._store[key] for key in sorted(self._store)]
+
+    def keys(self):
+        """Return the published (namespace, name) pairs in order."""
+        with self._lock:
+            return sorted(self._store)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._store)
+
+    def refresh(self):
+        """Map the file at ``path`` if it was replaced; return whether it was."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if (stat.st_ino, stat.st_mtime_ns) == self._identity:
+            return False
+        try:
+            with open(self.path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, generation, offset, length = HEADER.unpack_from(buffer)
+            if magic != MAGIC:
+                raise ValueError("not a catalog-api shared file")
+            index = orjson.loads(buffer[offset:offset + length])
+        except (OSError, ValueError, struct.error) as e:
+            log.warning("Ignoring unreadable shared file %s: %s", self.path, e)
+            self._identity = (stat.st_ino, stat.st_mtime_ns)
+            return False
+
+        # Views keep the mapping alive; it's unmapped once the last
+        # ConfigMap (or response) referring to it is gone
+        view = memoryview(buffer)
+        store = {}
+        for entry in index["configmaps"]:
+            cm = SharedConfigMap(view, *entry)
+            store[(cm.metadata.namespace, cm.metadata.name)] = cm
+        with self._notify_lock:
+            with self._lock:
+                old, self._store = self._store, store
+                self._identity = (stat.st_ino, stat.st_mtime_ns)
+                self.generation = generation
+                self.changes = index.get("changes")
+            self._notify(diff(old, store))
+        return True
+
+
+class WatcherLock:
+    """Exclusive lock on ``<path>.lock``; the worker holding it is the watcher.
+
+    Held until release() or process exit, so when the watcher dies the
+    next worker process to start takes its place.
+    """
+
+    def __init__(self, path):
+        self.path = path + ".lock"
+        self._file = None
+
+    def acquire(self):
+        """Take the lock without waiting; return whether this process has it."""
+        if self._file is not None:
+            return True
+        f = open(self.path, "a")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,50 @@
+"""Warm-restart snapshots of the informer's ConfigMaps on local disk."""
+import gzip
+import json
+import logging
+import os
+import tempfile
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+
+def save(path, scope, state):
+    """Write an informer snapshot() to ``path``, replacing it atomically.
+
+    ``scope`` describes what was watched (selectors, namespaces); load()
+    ignores snapshots taken with a different one. Failures are logged, not
+    raised: a missing snapshot only costs a full LIST on the next start.
+    """
+    body = {"version": SNAPSHOT_VERSION, "scope": scope, "state": state}
+    try:
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".snapshot-")
+        try:
+            with os.fdopen(fd, "wb") as raw, \
+                    gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as out:
+                out.write(json.dumps(body, separators=(",", ":")).encode())
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except OSError as e:
+        log.warning("Could not write snapshot %s: %s", path, e)
+        return False
+    return True
+
+
+def load(path, scope):
+    """The state saved at ``path`` for ``scope``, or None if there's none usable."""
+    try:
+        with gzip.open(path, "rb") as f:
+            body = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        log.warning("Ignoring unreadable snapshot %s: %s", path, e)
+        return None
+    if body.get("version") != SNAPSHOT_VERSION or body.get("scope") != scope:
+        log.info("Ignoring snapshot %s taken with a different configuration", path)
+        return None
+    return body["state"]
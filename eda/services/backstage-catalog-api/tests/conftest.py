@@ -6,10 +6,7 @@ from pathlib import Path
 # Add parent directory to path so we can import app
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-# Patch Kubernetes config loading BEFORE importing app
-with patch('kubernetes.config.load_incluster_config'):
-    with patch('kubernetes.client.CoreV1Api'):
-        import app
+import app
 
 
 @pytest.fixture
@@ -24,3 +21,40 @@ def mock_k8s_client():
     """Mock Kubernetes client for testing."""
     with patch('app.client.CoreV1Api') as mock_api:
         yield mock_api.return_value
+
+
+@pytest.fixture
+def make_cm():
+    """Factory for ConfigMap objects as returned by the Kubernetes client."""
+    from kubernetes import client as k8s_client
+
+    def _make(namespace, name, data=None, resource_version="1"):
+        return k8s_client.V1ConfigMap(
+            metadata=k8s_client.V1ObjectMeta(
+                namespace=namespace,
+                name=name,
+                resource_version=resource_version,
+            ),
+            data=data,
+        )
+    return _make
+
+
+@pytest.fixture(autouse=True)
+def reset_caches():
+    """Start every test with empty caches, change feed and entity index,
+    a closed circuit breaker and no rate limit."""
+    from cache import LastGoodCache, RenderCache, TTLCache, ValueInterner
+    from changes import ChangeFeed
+    from entities import EntityIndex
+    from resilience import CircuitBreaker, TokenBucket
+
+    with patch('app.render_cache', RenderCache(app.RENDER_CACHE_MAX_BYTES)), \
+            patch('app.read_cache', TTLCache(app.READ_CACHE_MAX_BYTES)), \
+            patch('app.change_feed', ChangeFeed()), \
+            patch('app.entity_index', EntityIndex()), \
+            patch('app.interner', ValueInterner()), \
+            patch('app.last_good', LastGoodCache(app.STALE_MAX_BYTES)), \
+            patch('app.bucket', TokenBucket(0, 0)), \
+            patch('app.breaker', CircuitBreaker(app.BREAKER_FAILURES, app.BREAKER_RESET)):
+        yield
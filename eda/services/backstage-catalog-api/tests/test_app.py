@@ -1,5 +1,9 @@
 from fastapi.testclient import TestClient
-from unittest.mock import Mock, MagicMock, patch
+import asyncio
+import httpx
+import threading
+import time
+from unittest.mock import AsyncMock, Mock, MagicMock, patch
 import pytest
 import sys
 from pathlib import Path
@@ -7,7 +11,7 @@ from pathlib import Path
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from app import app, detect_scheme_host
+from app import REQUEST_TIMEOUT, app, detect_scheme_host
 
 
 @pytest.fixture
@@ -29,7 +33,7 @@ class TestRootEndpoint:
         """Test that root endpoint returns 200 OK."""
         # Mock empty ConfigMap list
         with patch('app.v1') as mock_v1:
-            mock_v1.list_config_map_for_all_namespaces.return_value = Mock(items=[])
+            mock_v1.list_config_map_for_all_namespaces.return_value = Mock(items=[], metadata=Mock(_continue=None))
             
             response = client.get("/")
             assert response.status_code == 200
@@ -37,7 +41,7 @@ class TestRootEndpoint:
     def test_root_endpoint_returns_yaml(self, client, mock_k8s_client):
         """Test that root endpoint returns YAML content."""
         with patch('app.v1') as mock_v1:
-            mock_v1.list_config_map_for_all_namespaces.return_value = Mock(items=[])
+            mock_v1.list_config_map_for_all_namespaces.return_value = Mock(items=[], metadata=Mock(_continue=None))
             
             response = client.get("/")
             assert "application/yaml" in response.headers["content-type"]
@@ -57,7 +61,7 @@ class TestRootEndpoint:
         
         with patch('app.v1') as mock_v1:
             mock_v1.list_config_map_for_all_namespaces.return_value = Mock(
-                items=[mock_cm1, mock_cm2]
+                items=[mock_cm1, mock_cm2], metadata=Mock(_continue=None)
             )
             
             response = client.get("/")
@@ -74,7 +78,7 @@ class TestRootEndpoint:
         
         with patch('app.v1') as mock_v1:
             mock_v1.list_config_map_for_all_namespaces.return_value = Mock(
-                items=[mock_cm]
+                items=[mock_cm], metadata=Mock(_continue=None)
             )
             
             response = client.get(
@@ -175,3 +179,1380 @@ class TestHelperFunctions:
         proto, host = detect_scheme_host(mock_request)
         assert proto == "http"
         assert host == "localhost:8080"
+
+
+class TestKubeClient:
+    """Tests for creating the Kubernetes client."""
+
+    def test_import_needs_no_cluster(self):
+        """Test that the app can be imported where no cluster config exists."""
+        import subprocess
+
+        result = subprocess.run(
+            [sys.executable, "-c", "import app; assert app.v1 is None"],
+            cwd=Path(__file__).parent.parent, env={"PATH": ""}, capture_output=True,
+        )
+
+        assert result.returncode == 0, result.stderr.decode()
+
+    def test_falls_back_to_kubeconfig(self):
+        """Test that outside a cluster the local kubeconfig is used."""
+        from app import config, load_kube_client
+
+        with patch('app.config.load_incluster_config',
+                   side_effect=config.ConfigException("not in cluster")), \
+                patch('app.config.load_kube_config') as load_kube_config, \
+                patch('app.client.CoreV1Api') as api:
+            assert load_kube_client() is api.return_value
+
+        load_kube_config.assert_called_once()
+
+
+@pytest.fixture
+def synced_informer(make_cm):
+    """An informer seeded with two catalog ConfigMaps, installed on the app."""
+    from informer import ConfigMapInformer
+
+    api = MagicMock()
+    api.list_config_map_for_all_namespaces.return_value = Mock(
+        items=[
+            make_cm("default", "catalog-1", {"a.yaml": "kind: Component"}),
+            make_cm("production", "catalog-2", {}),
+        ],
+        metadata=Mock(resource_version="10", _continue=None),
+    )
+    informer = ConfigMapInformer(api, "eda.io/backstage-catalog=true")
+    informer.relist()
+    with patch('app.informer', informer):
+        yield informer
+
+
+class TestInformerBackedEndpoints:
+    """Tests for serving both endpoints from the informer cache."""
+
+    def test_root_endpoint_served_from_cache(self, client, synced_informer):
+        """Test that GET / lists cached ConfigMaps without calling the API."""
+        with patch('app.v1') as mock_v1:
+            response = client.get("/")
+            assert response.status_code == 200
+            assert "default/catalog-1" in response.text
+            assert "production/catalog-2" in response.text
+            mock_v1.list_config_map_for_all_namespaces.assert_not_called()
+
+    def test_configmap_endpoint_served_from_cache(self, client, synced_informer):
+        """Test that a cached ConfigMap is returned without calling the API."""
+        with patch('app.v1') as mock_v1:
+            response = client.get("/default/catalog-1")
+            assert response.text == "kind: Component\n"
+            mock_v1.read_namespaced_config_map.assert_not_called()
+
+    def test_configmap_endpoint_not_in_cache(self, client, synced_informer):
+        """Test that an unknown ConfigMap reports Not Found."""
+        response = client.get("/default/missing")
+        assert "Error: Not Found" in response.text
+
+    def test_unsynced_informer_falls_back_to_api(self, client):
+        """Test that requests before the first LIST go to the API server."""
+        from informer import ConfigMapInformer
+
+        with patch('app.informer', ConfigMapInformer(MagicMock(), "x")):
+            with patch('app.v1') as mock_v1:
+                mock_v1.list_config_map_for_all_namespaces.return_value = Mock(items=[], metadata=Mock(_continue=None))
+                response = client.get("/")
+                assert response.status_code == 200
+                mock_v1.list_config_map_for_all_namespaces.assert_called_once()
+
+
+class TestETags:
+    """Tests for ETag / If-None-Match handling."""
+
+    def test_configmap_etag_from_resource_version(self, client, synced_informer):
+        """Test that the ConfigMap ETag is derived from its resourceVersion."""
+        response = client.get("/default/catalog-1")
+        assert response.headers["etag"] == '"1"'
+
+    def test_configmap_not_modified(self, client, synced_informer):
+        """Test that a matching If-None-Match returns an empty 304."""
+        response = client.get("/default/catalog-1", headers={"if-none-match": '"1"'})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == '"1"'
+
+    def test_configmap_modified(self, client, synced_informer, make_cm):
+        """Test that a new resourceVersion invalidates the client's ETag."""
+        synced_informer.apply(
+            "MODIFIED", make_cm("default", "catalog-1", {"a.yaml": "kind: API"}, "11")
+        )
+        response = client.get("/default/catalog-1", headers={"if-none-match": '"1"'})
+        assert response.status_code == 200
+        assert response.headers["etag"] == '"11"'
+        assert response.text == "kind: API\n"
+
+    def test_if_none_match_list_and_weak(self, client, synced_informer):
+        """Test that any tag in the list matches and W/ is ignored."""
+        response = client.get(
+            "/default/catalog-1", headers={"if-none-match": '"7", W/"1"'}
+        )
+        assert response.status_code == 304
+
+    def test_root_not_modified(self, client, synced_informer):
+        """Test that the root Location is 304 until the target list changes."""
+        etag = client.get("/").headers["etag"]
+
+        response = client.get("/", headers={"if-none-match": etag})
+        assert response.status_code == 304
+
+        synced_informer.apply("DELETED", synced_informer.get("production", "catalog-2"))
+        response = client.get("/", headers={"if-none-match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+
+    def test_root_etag_depends_on_host(self, client, synced_informer):
+        """Test that targets rendered for another host get another ETag."""
+        etag = client.get("/").headers["etag"]
+        response = client.get(
+            "/", headers={"if-none-match": etag, "x-forwarded-host": "example.com"}
+        )
+        assert response.status_code == 200
+
+
+class TestAsyncClientMode:
+    """Tests for serving per-request calls through the asyncio client."""
+
+    def test_root_endpoint_uses_async_client(self, client, make_cm):
+        """Test that GET / awaits the asyncio client instead of app.v1."""
+        aio = Mock()
+        aio.list_config_map_refs = AsyncMock(return_value=[("default", "catalog-1")])
+
+        with patch('app.aio', aio), patch('app.v1') as mock_v1:
+            response = client.get("/")
+            assert "default/catalog-1" in response.text
+            aio.list_config_map_refs.assert_awaited_once_with(
+                "eda.io/backstage-catalog=true", 50, False, None
+            )
+            mock_v1.list_config_map_for_all_namespaces.assert_not_called()
+
+    def test_configmap_endpoint_uses_async_client(self, client, make_cm):
+        """Test that GET /{ns}/{cm} awaits the asyncio client."""
+        aio = Mock()
+        aio.read_config_map = AsyncMock(
+            return_value=make_cm("default", "catalog-1", {"a.yaml": "kind: API"})
+        )
+
+        with patch('app.aio', aio):
+            response = client.get("/default/catalog-1")
+            assert response.text == "kind: API\n"
+            aio.read_config_map.assert_awaited_once_with("default", "catalog-1")
+
+    def test_configmap_endpoint_async_error(self, client):
+        """Test that asyncio client errors are reported like sync ones."""
+        from kubernetes import client as k8s_client
+
+        aio = Mock()
+        aio.read_config_map = AsyncMock(
+            side_effect=k8s_client.exceptions.ApiException(status=404, reason="Not Found")
+        )
+
+        with patch('app.aio', aio):
+            response = client.get("/default/missing")
+            assert "Error: Not Found" in response.text
+
+
+class TestPagination:
+    """Tests for chunked LISTs on the direct API path."""
+
+    def test_root_endpoint_follows_continue_tokens(self, client, make_cm):
+        """Test that GET / pages through the LIST with limit/_continue."""
+        with patch('app.v1') as mock_v1, patch('app.PAGE_SIZE', 2):
+            mock_v1.list_config_map_for_all_namespaces.side_effect = [
+                Mock(items=[make_cm("a", "1"), make_cm("a", "2")],
+                     metadata=Mock(_continue="token-1")),
+                Mock(items=[make_cm("b", "3")], metadata=Mock(_continue=None)),
+            ]
+
+            response = client.get("/")
+            assert "a/1" in response.text
+            assert "a/2" in response.text
+            assert "b/3" in response.text
+
+            calls = mock_v1.list_config_map_for_all_namespaces.call_args_list
+            assert calls[0].kwargs == {
+                "label_selector": "eda.io/backstage-catalog=true", "limit": 2,
+                "_request_timeout": REQUEST_TIMEOUT,
+            }
+            assert calls[1].kwargs["_continue"] == "token-1"
+
+    def test_page_size_zero_disables_chunking(self, client):
+        """Test that a page size of 0 makes one unpaginated LIST."""
+        with patch('app.v1') as mock_v1, patch('app.PAGE_SIZE', 0):
+            mock_v1.list_config_map_for_all_namespaces.return_value = Mock(
+                items=[], metadata=Mock(_continue="ignored")
+            )
+
+            client.get("/")
+            mock_v1.list_config_map_for_all_namespaces.assert_called_once_with(
+                label_selector="eda.io/backstage-catalog=true",
+                _request_timeout=REQUEST_TIMEOUT,
+            )
+
+
+class TestMetadataOnlyListing:
+    """Tests for listing root targets as PartialObjectMetadata."""
+
+    def test_root_endpoint_lists_metadata_only(self, client):
+        """Test that GET / asks for PartialObjectMetadataList, not ConfigMaps."""
+        with patch('app.v1') as mock_v1, patch('app.METADATA_ONLY', True):
+            mock_v1.api_client.call_api.return_value = {
+                "kind": "PartialObjectMetadataList",
+                "metadata": {"resourceVersion": "5"},
+                "items": [{"metadata": {"namespace": "default", "name": "catalog-1"}}],
+            }
+
+            response = client.get("/")
+            assert "default/catalog-1" in response.text
+            mock_v1.list_config_map_for_all_namespaces.assert_not_called()
+
+            kwargs = mock_v1.api_client.call_api.call_args.kwargs
+            assert "as=PartialObjectMetadataList" in kwargs["header_params"]["Accept"]
+            assert ("labelSelector", "eda.io/backstage-catalog=true") in kwargs["query_params"]
+
+
+class TestRenderCache:
+    """Tests for serving pre-rendered response bytes."""
+
+    def test_configmap_rendered_once(self, client, synced_informer, make_cm):
+        """Test that repeated reads are served from the render cache."""
+        synced_informer.apply("ADDED", make_cm("team", "multi", {
+            "a.yaml": "kind: A", "b.yaml": "kind: B",
+        }, "11"))
+        client.get("/team/multi")
+        response = client.get("/team/multi")
+
+        assert response.text == "kind: A\nkind: B\n"
+        stats = client.get("/-/stats").json()["render_cache"]
+        assert stats["misses"] == 1
+        assert stats["hits"] == 1
+
+    def test_single_values_cached_once_per_value(self, client, synced_informer, make_cm):
+        """Test that one-value ConfigMaps are encoded once, and share the bytes
+        of an identical value."""
+        synced_informer.apply("ADDED", make_cm("team", "copy", {
+            "catalog-info.yaml": "kind: Component",
+        }, "11"))
+        response = client.get("/default/catalog-1")
+        client.get("/default/catalog-1")
+        copy = client.get("/team/copy")
+
+        assert response.text == copy.text == "kind: Component\n"
+        stats = client.get("/-/stats").json()["render_cache"]
+        assert stats["misses"] == 1
+        assert stats["hits"] == 2
+        assert stats["entries"] == 1
+
+    def test_root_rendered_once_per_change(self, client, synced_informer, make_cm):
+        """Test that the root Location is re-rendered only when targets change."""
+        client.get("/")
+        client.get("/")
+        synced_informer.apply("ADDED", make_cm("default", "catalog-3", {}))
+        response = client.get("/")
+
+        assert "default/catalog-3" in response.text
+        stats = client.get("/-/stats").json()["render_cache"]
+        assert stats["misses"] == 2
+        assert stats["hits"] == 1
+
+    def test_modified_configmap_is_re_rendered(self, client, synced_informer, make_cm):
+        """Test that a new resourceVersion is never served stale bytes."""
+        client.get("/default/catalog-1")
+        synced_informer.apply(
+            "MODIFIED", make_cm("default", "catalog-1", {"a.yaml": "kind: API"}, "2")
+        )
+
+        assert client.get("/default/catalog-1").text == "kind: API\n"
+
+
+class TestReadCache:
+    """Tests for caching direct ConfigMap reads."""
+
+    def test_repeated_reads_hit_cache(self, client, make_cm):
+        """Test that a second read within the TTL skips the API server."""
+        with patch('app.v1') as mock_v1:
+            mock_v1.read_namespaced_config_map.return_value = make_cm(
+                "default", "catalog-1", {"a.yaml": "kind: API"}
+            )
+
+            client.get("/default/catalog-1")
+            response = client.get("/default/catalog-1")
+
+            assert response.text == "kind: API\n"
+            mock_v1.read_namespaced_config_map.assert_called_once()
+
+    def test_not_found_is_cached(self, client):
+        """Test that repeated requests for a missing ConfigMap cost one call."""
+        from kubernetes import client as k8s_client
+
+        with patch('app.v1') as mock_v1:
+            mock_v1.read_namespaced_config_map.side_effect = \
+                k8s_client.exceptions.ApiException(status=404, reason="Not Found")
+
+            for _ in range(3):
+                response = client.get("/default/missing")
+                assert "Error: Not Found" in response.text
+            mock_v1.read_namespaced_config_map.assert_called_once()
+
+    def test_other_errors_are_not_cached(self, client):
+        """Test that transient API failures are retried on the next request."""
+        from kubernetes import client as k8s_client
+
+        with patch('app.v1') as mock_v1:
+            mock_v1.read_namespaced_config_map.side_effect = \
+                k8s_client.exceptions.ApiException(status=500, reason="Internal Server Error")
+
+            client.get("/default/catalog-1")
+            client.get("/default/catalog-1")
+            assert mock_v1.read_namespaced_config_map.call_count == 2
+
+    def test_read_cache_disabled(self, client, make_cm):
+        """Test that a TTL of 0 sends every read upstream."""
+        with patch('app.v1') as mock_v1, patch('app.READ_CACHE_TTL', 0):
+            mock_v1.read_namespaced_config_map.return_value = make_cm(
+                "default", "catalog-1", {"a.yaml": "kind: API"}
+            )
+
+            client.get("/default/catalog-1")
+            client.get("/default/catalog-1")
+            assert mock_v1.read_namespaced_config_map.call_count == 2
+
+
+class TestSingleFlight:
+    """Tests for coalescing concurrent misses into one API call."""
+
+    async def concurrent_get(self, path, n):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await asyncio.gather(*(http.get(path) for _ in range(n)))
+
+    def test_concurrent_reads_share_one_call(self, make_cm):
+        """Test that simultaneous reads of one ConfigMap make one API call."""
+        def slow_read(name, namespace, _request_timeout=None):
+            time.sleep(0.05)
+            return make_cm(namespace, name, {"a.yaml": "kind: API"})
+
+        with patch('app.v1') as mock_v1:
+            mock_v1.read_namespaced_config_map.side_effect = slow_read
+
+            responses = asyncio.run(self.concurrent_get("/default/catalog-1", 5))
+
+            assert [r.text for r in responses] == ["kind: API\n"] * 5
+            mock_v1.read_namespaced_config_map.assert_called_once()
+
+    def test_concurrent_root_lists_share_one_call(self, make_cm):
+        """Test that simultaneous GET / requests make one LIST."""
+        def slow_list(**kwargs):
+            time.sleep(0.05)
+            return Mock(items=[make_cm("default", "catalog-1")],
+                        metadata=Mock(_continue=None))
+
+        with patch('app.v1') as mock_v1:
+            mock_v1.list_config_map_for_all_namespaces.side_effect = slow_list
+
+            responses = asyncio.run(self.concurrent_get("/", 5))
+
+            assert all("default/catalog-1" in r.text for r in responses)
+            mock_v1.list_config_map_for_all_namespaces.assert_called_once()
+
+
+class TestAggregateEndpoint:
+    """Tests for the multi-document GET /all endpoint."""
+
+    def test_all_joins_configmaps_as_documents(self, client, synced_informer, make_cm):
+        """Test that every ConfigMap with data becomes a --- separated document."""
+        synced_informer.apply(
+            "ADDED", make_cm("team", "catalog-3", {"b.yaml": "---\nkind: API"}, "12")
+        )
+
+        response = client.get("/all")
+
+        assert response.status_code == 200
+        assert response.text == "---\nkind: Component\n---\nkind: API\n"
+
+    def test_all_served_from_single_list(self, client, make_cm):
+        """Test that the direct path builds /all from one LIST and no reads."""
+        with patch('app.v1') as mock_v1:
+            mock_v1.list_config_map_for_all_namespaces.return_value = Mock(
+                items=[make_cm("a", "1", {"x": "kind: A"}), make_cm("b", "2", {"x": "kind: B"})],
+                metadata=Mock(_continue=None),
+            )
+
+            response = client.get("/all")
+
+            assert response.text == "---\nkind: A\n---\nkind: B\n"
+            mock_v1.list_config_map_for_all_namespaces.assert_called_once()
+            mock_v1.read_namespaced_config_map.assert_not_called()
+
+    def test_all_etag_changes_with_any_configmap(self, client, synced_informer, make_cm):
+        """Test that /all is 304 until one of its ConfigMaps changes."""
+        etag = client.get("/all").headers["etag"]
+        assert client.get("/all", headers={"if-none-match": etag}).status_code == 304
+
+        synced_informer.apply(
+            "MODIFIED", make_cm("default", "catalog-1", {"a.yaml": "kind: API"}, "11")
+        )
+        response = client.get("/all", headers={"if-none-match": etag})
+        assert response.status_code == 200
+        assert response.text == "---\nkind: API\n"
+
+    def test_root_points_at_aggregate(self, client, synced_informer):
+        """Test that the root Location can target /all instead of each ConfigMap."""
+        with patch('app.ROOT_TARGETS', "aggregate"):
+            response = client.get("/", headers={"host": "catalog"})
+
+        assert "http://catalog/all" in response.text
+        assert "catalog-1" not in response.text
+
+
+class TestStreaming:
+    """Tests for streaming large catalog payloads."""
+
+    def test_large_configmap_streamed_uncached(self, client, synced_informer, make_cm):
+        """Test that ConfigMaps over the threshold bypass the render cache."""
+        synced_informer.apply(
+            "ADDED", make_cm("default", "big", {"a": "kind: A", "b": "kind: B"}, "20")
+        )
+
+        with patch('app.STREAM_MIN_BYTES', 4):
+            response = client.get("/default/big")
+
+        assert response.text == "kind: A\nkind: B\n"
+        assert "content-length" not in response.headers
+        assert response.headers["etag"] == '"20"'
+        assert client.get("/-/stats").json()["render_cache"]["entries"] == 0
+
+    def test_small_configmap_has_content_length(self, client, synced_informer):
+        """Test that cached ConfigMaps are sent whole with a Content-Length."""
+        response = client.get("/default/catalog-1")
+
+        assert response.headers["content-length"] == str(len("kind: Component\n"))
+
+    def test_all_streams_each_document(self, client, synced_informer, make_cm):
+        """Test that /all is streamed and mixes cached and streamed documents."""
+        synced_informer.apply(
+            "ADDED", make_cm("team", "big", {"a": "kind: Big"}, "21")
+        )
+
+        with patch('app.STREAM_MIN_BYTES', 10):
+            response = client.get("/all")
+
+        assert response.text == "---\nkind: Component\n---\nkind: Big\n"
+        assert "content-length" not in response.headers
+
+
+class TestMetricsEndpoint:
+    """Tests for GET /metrics."""
+
+    def test_metrics_exposes_route_latency_and_sizes(self, client, synced_informer):
+        """Test that requests are recorded under their route template."""
+        client.get("/default/catalog-1")
+
+        text = client.get("/metrics").text
+
+        assert 'catalog_api_request_duration_seconds_count{method="GET",' \
+            'route="/{namespace}/{configmap}",status="200"}' in text
+        assert 'catalog_api_response_size_bytes_sum{route="/{namespace}/{configmap}"}' in text
+        assert "catalog_api_tracked_configmaps 2.0" in text
+        assert 'catalog_api_cache_misses_total{cache="render"} 1.0' in text
+
+    def test_metrics_counts_kube_reads(self, client, make_cm):
+        """Test that direct ConfigMap reads are counted as API calls."""
+        from prometheus_client import REGISTRY
+
+        labels = {"operation": "read", "outcome": "success"}
+        before = REGISTRY.get_sample_value("catalog_api_kube_requests_total", labels) or 0
+
+        with patch('app.v1') as mock_v1:
+            mock_v1.read_namespaced_config_map.return_value = make_cm(
+                "default", "catalog-1", {"a.yaml": "kind: API"}
+            )
+            client.get("/default/catalog-1")
+            client.get("/default/catalog-1")
+
+        assert REGISTRY.get_sample_value("catalog_api_kube_requests_total", labels) == before + 1
+
+
+@pytest.fixture
+def feed(synced_informer):
+    """The app's change feed, following the synced informer."""
+    import app as catalog_app
+
+    synced_informer.add_listener(catalog_app.change_feed.on_change)
+    return catalog_app.change_feed
+
+
+class TestChangesEndpoint:
+    """Tests for GET /-/changes."""
+
+    def test_requires_informer(self, client):
+        """Test that the feed is unavailable without the watch cache."""
+        response = client.get("/-/changes")
+
+        assert response.status_code == 503
+
+    def test_without_cursor_returns_current_cursor(self, client, feed):
+        """Test that a first call only hands out a cursor."""
+        response = client.get("/-/changes")
+
+        assert response.json() == {"cursor": feed.cursor(), "changes": []}
+
+    def test_returns_changes_since_cursor(self, client, feed, synced_informer, make_cm):
+        """Test that only ConfigMaps changed after the cursor are listed."""
+        cursor = client.get("/-/changes").json()["cursor"]
+        synced_informer.apply("ADDED", make_cm("default", "catalog-3", {}, "11"))
+        synced_informer.apply("DELETED", make_cm("production", "catalog-2", {}, "12"))
+
+        body = client.get(f"/-/changes?cursor={cursor}").json()
+
+        assert body["changes"] == [
+            {"type": "ADDED", "namespace": "default", "name": "catalog-3",
+             "resourceVersion": "11", "target": "http://testserver/default/catalog-3"},
+            {"type": "DELETED", "namespace": "production", "name": "catalog-2",
+             "resourceVersion": "12", "target": "http://testserver/production/catalog-2"},
+        ]
+        assert client.get(f"/-/changes?cursor={body['cursor']}").json()["changes"] == []
+
+    def test_expired_cursor_is_gone(self, client, feed):
+        """Test that unknown cursors get 410 and a fresh cursor to resync from."""
+        response = client.get("/-/changes?cursor=bogus")
+
+        assert response.status_code == 410
+        assert response.json()["cursor"] == feed.cursor()
+
+    def test_long_poll_returns_when_something_changes(self, client, feed,
+                                                      synced_informer, make_cm):
+        """Test that ?wait= holds the request until a change arrives."""
+        cursor = client.get("/-/changes").json()["cursor"]
+
+        def change_later():
+            time.sleep(0.1)
+            synced_informer.apply("MODIFIED", make_cm("default", "catalog-1", {}, "11"))
+
+        threading.Thread(target=change_later).start()
+        start = time.monotonic()
+        body = client.get(f"/-/changes?cursor={cursor}&wait=10").json()
+
+        assert time.monotonic() - start < 5
+        assert [c["name"] for c in body["changes"]] == ["catalog-1"]
+
+    def test_long_poll_times_out_empty(self, client, feed):
+        """Test that a long-poll with no changes returns an empty list."""
+        cursor = client.get("/-/changes").json()["cursor"]
+
+        body = client.get(f"/-/changes?cursor={cursor}&wait=0.05").json()
+
+        assert body == {"cursor": cursor, "changes": []}
+
+    def test_server_sent_events(self, feed, synced_informer, make_cm):
+        """Test that SSE emits one change event per ConfigMap with the cursor as id."""
+        from app import change_events
+
+        cursor = feed.cursor()
+        synced_informer.apply("ADDED", make_cm("default", "catalog-3", {}, "11"))
+        request = Mock(headers={"host": "catalog"}, url=Mock(scheme="http"))
+        request.is_disconnected = AsyncMock(side_effect=[False, True])
+
+        async def collect():
+            return [event async for event in change_events(request, cursor)]
+
+        with patch('app.SSE_HEARTBEAT', 0.01):
+            events = asyncio.run(collect())
+
+        assert events[0].startswith(f"id: {feed.cursor()}\nevent: change\n".encode())
+        assert b'"name": "catalog-3"' in events[0]
+        assert events[1] == b": keepalive\n\n"
+
+
+class TestNamespaceScoped:
+    """Tests for limiting direct API calls to configured namespaces."""
+
+    def test_root_lists_each_namespace(self, client, make_cm):
+        """Test that GET / LISTs only the configured namespaces."""
+        with patch('app.v1') as mock_v1, patch('app.NAMESPACES', ["team-a", "team-b"]):
+            mock_v1.list_namespaced_config_map.side_effect = lambda namespace, **kwargs: Mock(
+                items=[make_cm(namespace, "catalog")], metadata=Mock(_continue=None)
+            )
+            response = client.get("/")
+
+        assert "http://testserver/team-a/catalog" in response.text
+        assert "http://testserver/team-b/catalog" in response.text
+        mock_v1.list_config_map_for_all_namespaces.assert_not_called()
+
+    def test_configmap_outside_namespaces_not_read(self, client):
+        """Test that ConfigMaps outside the scope are 404 without an API call."""
+        with patch('app.v1') as mock_v1, patch('app.NAMESPACES', ["team-a"]):
+            response = client.get("/kube-system/secrets")
+
+        assert response.text == "# Error: Not Found\n"
+        mock_v1.read_namespaced_config_map.assert_not_called()
+
+    def test_namespace_selector_resolved_and_cached(self, client, make_cm):
+        """Test that selected namespaces are listed once per cache TTL."""
+        from kubernetes import client as k8s_client
+
+        with patch('app.v1') as mock_v1, patch('app.NAMESPACE_SELECTOR', "catalog=true"):
+            mock_v1.list_namespace.return_value = k8s_client.V1NamespaceList(items=[
+                k8s_client.V1Namespace(metadata=k8s_client.V1ObjectMeta(name="team-a")),
+            ])
+            mock_v1.read_namespaced_config_map.return_value = make_cm(
+                "team-a", "catalog", {"a.yaml": "kind: API"}
+            )
+            assert client.get("/team-a/catalog").text == "kind: API\n"
+            assert client.get("/team-b/catalog").text == "# Error: Not Found\n"
+
+        mock_v1.list_namespace.assert_called_once_with(
+            label_selector="catalog=true", _request_timeout=REQUEST_TIMEOUT
+        )
+
+
+class TestWarmRestart:
+    """Tests for loading and saving snapshots around the app lifespan."""
+
+    def test_serves_snapshot_then_saves_on_shutdown(self, tmp_path, make_cm):
+        """Test that a snapshot is served before any LIST and rewritten at shutdown."""
+        import snapshot
+        from app import snapshot_scope
+
+        path = str(tmp_path / "snapshot.json.gz")
+        snapshot.save(path, snapshot_scope(), {"resourceVersion": "42", "configmaps": [
+            {"namespace": "default", "name": "catalog-1", "resourceVersion": "40",
+             "data": {"a.yaml": "kind: Component"}},
+        ]})
+
+        with patch('app.v1') as mock_v1, patch('app.WATCH_ENABLED', True), \
+                patch('app.SNAPSHOT_PATH', path), patch('app.informer', None), \
+                patch('informer.watch.Watch') as mock_watch:
+            mock_watch.return_value.stream.side_effect = lambda *a, **kw: iter([
+                {"type": "ADDED",
+                 "object": make_cm("default", "catalog-2", {"b.yaml": "kind: API"}, "43")},
+            ])
+            with TestClient(app) as client:
+                assert client.get("/default/catalog-1").text == "kind: Component\n"
+                mock_v1.list_config_map_for_all_namespaces.assert_not_called()
+                mock_v1.read_namespaced_config_map.assert_not_called()
+                kwargs = mock_watch.return_value.stream.call_args_list[0].kwargs
+                assert kwargs["resource_version"] == "42"
+
+        state = snapshot.load(path, snapshot_scope())
+        assert state["resourceVersion"] == "43"
+        assert {cm["name"] for cm in state["configmaps"]} == {"catalog-1", "catalog-2"}
+
+
+class TestProbes:
+    """Tests for /healthz and /readyz."""
+
+    def test_healthz(self, client):
+        """Test that liveness answers without calling the API server."""
+        with patch('app.v1') as mock_v1:
+            response = client.get("/healthz")
+
+        assert response.status_code == 200
+        assert mock_v1.mock_calls == []
+
+    def test_not_ready_until_synced(self, client):
+        """Test that readiness fails while the informer is still listing."""
+        from informer import ConfigMapInformer
+
+        with patch('app.v1') as mock_v1, \
+                patch('app.informer', ConfigMapInformer(mock_v1, "x=y")):
+            response = client.get("/readyz")
+
+        assert response.status_code == 503
+        assert mock_v1.mock_calls == []
+
+    def test_ready_once_synced(self, client, synced_informer):
+        """Test that readiness passes once the cache is populated."""
+        assert client.get("/readyz").status_code == 200
+
+    def test_ready_without_informer(self, client):
+        """Test that direct-API mode is ready as soon as it serves."""
+        assert client.get("/readyz").status_code == 200
+
+    @pytest.mark.parametrize("path", ["/healthz", "/readyz", "/metrics", "/-/stats"])
+    def test_answered_without_threadpool(self, client, path):
+        """Test that probes and stats don't wait for a threadpool thread,
+        which slow API calls may be holding."""
+        with patch('fastapi.routing.run_in_threadpool',
+                   side_effect=AssertionError("threadpool used")):
+            assert client.get(path).status_code == 200
+
+
+@pytest.fixture
+def entity_index(synced_informer):
+    """The app's entity index, following the synced informer."""
+    import app as catalog_app
+
+    synced_informer.add_listener(catalog_app.entity_index.on_change)
+    return catalog_app.entity_index
+
+
+class TestEntitiesEndpoint:
+    """Tests for GET /entities."""
+
+    def test_requires_informer(self, client):
+        """Test that the index is unavailable without the watch cache."""
+        assert client.get("/entities").status_code == 503
+
+    def test_query(self, client, entity_index, synced_informer, make_cm):
+        """Test that entities are filtered by the query parameters."""
+        synced_informer.apply("ADDED", make_cm("team", "catalog", {
+            "a.yaml": "kind: Component\nmetadata: {name: web}\nspec: {owner: team-a}",
+            "b.yaml": "---\nkind: System\nmetadata: {name: shop}\nspec: {owner: team-a}",
+        }, "11"))
+
+        response = client.get("/entities?kind=Component&owner=team-a")
+
+        assert response.json() == {"items": [
+            {"kind": "Component", "metadata": {"name": "web"}, "spec": {"owner": "team-a"}},
+        ]}
+
+    def test_read_entity(self, client, entity_index, synced_informer, make_cm):
+        """Test that one entity can be fetched by kind, namespace and name."""
+        synced_informer.apply("ADDED", make_cm("team", "catalog", {
+            "a.yaml": "kind: Component\nmetadata: {name: web}",
+        }, "11"))
+
+        assert client.get("/entities/component/default/web").json()["kind"] == "Component"
+        assert client.get("/entities/component/default/missing").status_code == 404
+
+
+class TestJsonRepresentation:
+    """Tests for Accept: application/json."""
+
+    JSON = {"accept": "application/json"}
+
+    def test_configmap_as_json(self, client, synced_informer):
+        """Test that a ConfigMap's documents come back as a JSON array."""
+        response = client.get("/default/catalog-1", headers=self.JSON)
+
+        assert response.json() == [{"kind": "Component"}]
+        assert response.headers["content-type"] == "application/json"
+        assert response.headers["etag"] == '"1-json"'
+        assert response.headers["vary"] == "Accept"
+
+    def test_root_as_json(self, client, synced_informer):
+        """Test that the root Location can be rendered as JSON."""
+        body = client.get("/", headers=self.JSON).json()
+
+        assert body["kind"] == "Location"
+        assert body["spec"]["targets"] == [
+            "http://testserver/default/catalog-1",
+            "http://testserver/production/catalog-2",
+        ]
+
+    def test_all_as_json(self, client, synced_informer, make_cm):
+        """Test that /all is one JSON array of every document."""
+        synced_informer.apply("ADDED", make_cm("team", "c", {"a": "kind: A\n---\nkind: B"}, "11"))
+
+        response = client.get("/all", headers=self.JSON)
+
+        assert response.json() == [{"kind": "Component"}, {"kind": "A"}, {"kind": "B"}]
+
+    def test_each_representation_cached(self, client, synced_informer, make_cm):
+        """Test that YAML and JSON are each rendered once and cached side by side."""
+        synced_informer.apply("ADDED", make_cm("team", "multi", {
+            "a.yaml": "kind: A", "b.yaml": "kind: B",
+        }, "11"))
+        for _ in range(2):
+            client.get("/team/multi")
+            client.get("/team/multi", headers=self.JSON)
+
+        stats = client.get("/-/stats").json()["render_cache"]
+        assert stats["misses"] == 2
+        assert stats["hits"] == 2
+        assert stats["entries"] == 1
+
+    def test_json_errors(self, client, synced_informer):
+        """Test that JSON clients get a JSON error with the API status."""
+        response = client.get("/default/missing", headers=self.JSON)
+
+        assert response.status_code == 404
+        assert response.json() == {"error": "Not Found"}
+
+    def test_non_string_keys(self, client, entity_index, synced_informer, make_cm):
+        """Test that YAML's int and bool mapping keys become JSON strings."""
+        synced_informer.apply("ADDED", make_cm("team", "svc", {
+            "a.yaml": "kind: Component\nmetadata: {name: web}\non: true\n"
+                      "spec:\n  ports:\n    8080: http",
+        }, "11"))
+        expected = [{"kind": "Component", "metadata": {"name": "web"}, "true": True,
+                     "spec": {"ports": {"8080": "http"}}}]
+
+        assert client.get("/team/svc", headers=self.JSON).json() == expected
+        assert client.get("/team/svc/a.yaml", headers=self.JSON).json() == expected
+        assert client.get("/entities").json() == {"items": expected}
+
+    def test_same_documents_as_yaml(self, client, synced_informer, make_cm):
+        """Test that JSON reads the values as the one stream YAML serves."""
+        import yaml
+
+        synced_informer.apply("ADDED", make_cm("team", "svc", {
+            "a.yaml": "kind: A\nmetadata: {name: a}",
+            "b.yaml": "spec: {owner: x}\n---\nkind: B",
+        }, "11"))
+
+        documents = list(yaml.safe_load_all(client.get("/team/svc").text))
+        assert client.get("/team/svc", headers=self.JSON).json() == documents == [
+            {"kind": "A", "metadata": {"name": "a"}, "spec": {"owner": "x"}}, {"kind": "B"},
+        ]
+
+    def test_invalid_yaml_skipped(self, client, synced_informer, make_cm):
+        """Test that YAML that doesn't parse is left out rather than failing."""
+        synced_informer.apply("ADDED", make_cm("team", "bad", {
+            "a.yaml": "kind: A", "b.yaml": "kind: [unclosed",
+        }, "11"))
+
+        assert client.get("/team/bad", headers=self.JSON).json() == []
+        assert client.get("/team/bad/a.yaml", headers=self.JSON).json() == [{"kind": "A"}]
+        assert client.get("/team/bad/b.yaml", headers=self.JSON).json() == []
+        response = client.get("/all", headers=self.JSON)
+        assert response.status_code == 200
+        assert response.json() == [{"kind": "Component"}]
+
+
+class TestUpstreamFailures:
+    """Tests for serving through Kubernetes API outages."""
+
+    @staticmethod
+    def outage():
+        from kubernetes import client as k8s_client
+        return k8s_client.exceptions.ApiException(status=500, reason="Internal Server Error")
+
+    def test_serves_last_good_configmap_with_age(self, client, make_cm):
+        """Test that a failing read falls back to the last good ConfigMap."""
+        with patch('app.v1') as mock_v1, patch('app.READ_CACHE_TTL', 0):
+            mock_v1.read_namespaced_config_map.return_value = make_cm(
+                "default", "catalog-1", {"a.yaml": "kind: API"}
+            )
+            client.get("/default/catalog-1")
+            mock_v1.read_namespaced_config_map.side_effect = self.outage()
+            response = client.get("/default/catalog-1")
+
+        assert response.status_code == 200
+        assert response.text == "kind: API\n"
+        assert response.headers["age"] == "0"
+        assert "Stale" in response.headers["warning"]
+
+    def test_outage_without_fallback_is_an_error_status(self, client):
+        """Test that an outage is never a 200 that looks like an empty catalog."""
+        with patch('app.v1') as mock_v1:
+            mock_v1.read_namespaced_config_map.side_effect = self.outage()
+            response = client.get("/default/catalog-1")
+
+        assert response.status_code == 503
+        assert response.text == "# Error: Internal Server Error\n"
+
+    def test_breaker_stops_calls_and_serves_stale_root(self, client, make_cm):
+        """Test that an open breaker skips the API and serves the last root."""
+        from resilience import CircuitBreaker
+
+        with patch('app.v1') as mock_v1, patch('app.breaker', CircuitBreaker(threshold=2)):
+            mock_v1.list_config_map_for_all_namespaces.return_value = Mock(
+                items=[make_cm("default", "catalog-1")], metadata=Mock(_continue=None)
+            )
+            client.get("/")
+            mock_v1.list_config_map_for_all_namespaces.side_effect = self.outage()
+            client.get("/")
+            client.get("/")
+            calls = mock_v1.list_config_map_for_all_namespaces.call_count
+            response = client.get("/")
+
+            assert mock_v1.list_config_map_for_all_namespaces.call_count == calls == 3
+            assert client.get("/-/stats").json()["circuit_breaker"]["state"] == "open"
+        assert "http://testserver/default/catalog-1" in response.text
+        assert "age" in response.headers
+
+    def test_not_found_does_not_trip_breaker(self, client):
+        """Test that 404s count as answers, not failures."""
+        from kubernetes import client as k8s_client
+
+        with patch('app.v1') as mock_v1:
+            mock_v1.read_namespaced_config_map.side_effect = k8s_client.exceptions.ApiException(
+                status=404, reason="Not Found"
+            )
+            for i in range(10):
+                client.get(f"/default/missing-{i}")
+
+        assert client.get("/-/stats").json()["circuit_breaker"]["failures"] == 0
+
+    def test_rate_limited_calls_fail_fast(self, client):
+        """Test that calls over the limit are refused without reaching the API."""
+        from resilience import TokenBucket
+
+        with patch('app.v1') as mock_v1, patch('app.bucket', TokenBucket(0.001, 0)), \
+                patch('app.RATE_LIMIT_MAX_WAIT', 0):
+            response = client.get("/default/catalog-1")
+
+        assert response.status_code == 503
+        mock_v1.read_namespaced_config_map.assert_not_called()
+
+    def test_open_breaker_takes_no_tokens(self, client):
+        """Test that an open circuit is refused before waiting on the rate limit."""
+        from resilience import CircuitBreaker, TokenBucket
+
+        breaker = CircuitBreaker(threshold=1)
+        breaker.record_failure()
+        with patch('app.v1') as mock_v1, patch('app.breaker', breaker), \
+                patch('app.bucket', TokenBucket(1, 1)):
+            response = client.get("/default/catalog-1")
+            stats = client.get("/-/stats").json()
+
+        assert response.status_code == 503
+        assert stats["rate_limit"] == {"tokens": 1, "rejected": 0}
+        mock_v1.read_namespaced_config_map.assert_not_called()
+
+    def test_nested_failure_counted_once(self, client):
+        """Test that a failed namespace lookup inside GET / is one failure."""
+        with patch('app.v1') as mock_v1, patch('app.NAMESPACE_SELECTOR', "catalog=true"):
+            mock_v1.list_namespace.side_effect = self.outage()
+            response = client.get("/")
+            stats = client.get("/-/stats").json()
+
+        assert response.status_code == 503
+        assert stats["circuit_breaker"]["failures"] == 1
+
+    @pytest.mark.parametrize("path", ["/", "/all", "/default/"])
+    def test_open_breaker_on_list_routes(self, client, path):
+        """Test that list routes with nothing stale to serve answer 503 with
+        Retry-After instead of failing."""
+        from resilience import CircuitBreaker
+
+        breaker = CircuitBreaker(threshold=1, reset_timeout=30)
+        breaker.record_failure()
+        with patch('app.v1') as mock_v1, patch('app.breaker', breaker):
+            response = client.get(path)
+            json_response = client.get(path, headers={"Accept": "application/json"})
+
+        assert response.status_code == 503
+        assert response.text == "# Error: Circuit open\n"
+        assert 0 < int(response.headers["retry-after"]) <= 30
+        assert json_response.status_code == 503
+        assert json_response.json() == {"error": "Circuit open"}
+        mock_v1.list_config_map_for_all_namespaces.assert_not_called()
+
+    def test_rate_limited_list_is_an_error_status(self, client):
+        """Test that a rate-limited GET / is a 503, not a server error."""
+        from resilience import TokenBucket
+
+        with patch('app.v1'), patch('app.bucket', TokenBucket(0.001, 0)), \
+                patch('app.RATE_LIMIT_MAX_WAIT', 0):
+            response = client.get("/")
+
+        assert response.status_code == 503
+        assert "retry-after" not in response.headers
+
+    def test_slow_api_server_times_out(self, client):
+        """Test that reads are bounded and a timeout counts as a failure."""
+        import urllib3
+
+        with patch('app.v1') as mock_v1:
+            mock_v1.read_namespaced_config_map.side_effect = \
+                urllib3.exceptions.ReadTimeoutError(None, "/api/v1", "Read timed out.")
+            response = client.get("/default/catalog-1")
+            stats = client.get("/-/stats").json()
+
+            kwargs = mock_v1.read_namespaced_config_map.call_args.kwargs
+        assert kwargs["_request_timeout"] == REQUEST_TIMEOUT
+        assert response.status_code == 503
+        assert stats["circuit_breaker"]["failures"] == 1
+
+    def test_cancelled_trial_call_reopens_breaker(self):
+        """Test that a cancelled half-open trial doesn't leave the breaker stuck."""
+        import app as catalog_app
+        from resilience import CircuitBreaker
+
+        breaker = CircuitBreaker(threshold=1, reset_timeout=0)
+        breaker.record_failure()
+
+        async def cancelled():
+            raise asyncio.CancelledError()
+
+        with patch('app.breaker', breaker):
+            with pytest.raises(asyncio.CancelledError):
+                asyncio.run(catalog_app.call_upstream(cancelled))
+
+        assert breaker.state == "open"
+        assert breaker.allow()
+
+    @pytest.mark.parametrize("path", ["/", "/default/catalog-1"])
+    def test_unreachable_api_server(self, client, path):
+        """Test that connection failures are an outage, not a server error."""
+        import urllib3
+
+        unreachable = urllib3.exceptions.MaxRetryError(None, "/api/v1/configmaps")
+        with patch('app.v1') as mock_v1:
+            mock_v1.list_config_map_for_all_namespaces.side_effect = unreachable
+            mock_v1.read_namespaced_config_map.side_effect = unreachable
+            response = client.get(path)
+            stats = client.get("/-/stats").json()
+
+        assert response.status_code == 503
+        assert "Kubernetes API unreachable" in response.text
+        assert stats["circuit_breaker"]["failures"] == 1
+
+
+class TestSharedWorkers:
+    """Tests for one watcher process publishing to the other workers."""
+
+    @pytest.fixture
+    def shared_env(self, tmp_path):
+        path = str(tmp_path / "catalog.shared")
+        with patch('app.v1') as mock_v1, patch('app.WATCH_ENABLED', True), \
+                patch('app.SHARED_PATH', path), patch('app.SHARED_INTERVAL', 0.01), \
+                patch('app.informer', None), patch('app.watcher_lock', None), \
+                patch('app.shared_generation', None), \
+                patch('informer.watch.Watch') as mock_watch:
+            mock_watch.return_value.stream.side_effect = lambda *a, **kw: iter([])
+            yield path, mock_v1, mock_watch
+
+    def test_watcher_publishes(self, shared_env, make_cm):
+        """Test that the lock holder watches and publishes what it lists."""
+        import shared
+
+        path, mock_v1, _ = shared_env
+        mock_v1.list_config_map_for_all_namespaces.return_value = Mock(
+            items=[make_cm("default", "catalog-1", {"a.yaml": "kind: Component"})],
+            metadata=Mock(_continue=None, resource_version="10"),
+        )
+        with TestClient(app) as client:
+            deadline = time.monotonic() + 5
+            while client.get("/-/stats").json()["shared_generation"] is None:
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+
+        catalog = shared.SharedCatalog(path)
+        catalog.refresh()
+        assert bytes(catalog.get("default", "catalog-1").rendered) == b"kind: Component\n"
+
+    def test_follower_serves_published_file(self, shared_env, make_cm):
+        """Test that other workers serve the mapped file without watching."""
+        import shared
+        from changes import ChangeFeed
+
+        path, mock_v1, mock_watch = shared_env
+        feed = ChangeFeed()
+        cursor = feed.cursor()
+        document = "kind: Component\nmetadata:\n  name: svc"
+        cm = make_cm("default", "catalog-1", {"a.yaml": document}, "5")
+        feed.on_change("ADDED", ("default", "catalog-1"), cm)
+        shared.publish(path, [cm], feed.snapshot())
+        watcher = shared.WatcherLock(path)
+        assert watcher.acquire()
+        entity = {"kind": "Component", "metadata": {"name": "svc"}}
+
+        try:
+            with TestClient(app) as client:
+                assert client.get("/default/catalog-1").text == document + "\n"
+                assert client.get("/default/catalog-1",
+                                  headers={"Accept": "application/json"}).json() == [entity]
+                assert client.get("/all").text == "---\n" + document + "\n"
+                assert "http://testserver/default/catalog-1" in client.get("/").text
+                assert client.get("/readyz").status_code == 200
+                assert client.get("/entities").json() == {"items": [entity]}
+                changes = client.get("/-/changes", params={"cursor": cursor}).json()
+                assert [c["name"] for c in changes["changes"]] == ["catalog-1"]
+        finally:
+            watcher.release()
+
+        mock_watch.return_value.stream.assert_not_called()
+        assert mock_v1.mock_calls == []
+
+
+class TestNamespaceShards:
+    """Tests for CATALOG_API_ROOT_TARGETS=namespaces."""
+
+    @pytest.fixture(autouse=True)
+    def sharded(self):
+        with patch('app.ROOT_TARGETS', "namespaces"):
+            yield
+
+    def test_root_lists_namespace_locations(self, client, synced_informer):
+        """Test that the root Location points at one Location per namespace."""
+        response = client.get("/")
+
+        assert "http://testserver/default/\n" in response.text
+        assert "http://testserver/production/\n" in response.text
+        assert "catalog-1" not in response.text
+
+    def test_namespace_location_lists_its_configmaps(self, client, synced_informer):
+        """Test that a namespace's Location lists only its own ConfigMaps."""
+        response = client.get("/default/")
+
+        assert response.status_code == 200
+        assert "name: backstage-catalog-api-default" in response.text
+        assert "http://testserver/default/catalog-1" in response.text
+        assert "production" not in response.text
+
+    def test_change_leaves_other_shards_unchanged(self, client, synced_informer, make_cm):
+        """Test that adding a ConfigMap only changes its namespace's ETag."""
+        root, default, production = (client.get(p).headers["etag"]
+                                     for p in ("/", "/default/", "/production/"))
+
+        synced_informer.apply("ADDED", make_cm("production", "catalog-3", {}))
+
+        assert client.get("/", headers={"If-None-Match": root}).status_code == 304
+        assert client.get("/default/", headers={"If-None-Match": default}).status_code == 304
+        changed = client.get("/production/", headers={"If-None-Match": production})
+        assert changed.status_code == 200
+        assert "production/catalog-3" in changed.text
+
+    def test_long_namespace_location_name(self, client, synced_informer, make_cm):
+        """Test that a long namespace still gives a valid, distinct Location name."""
+        import yaml
+        from app import shard_location_name
+
+        namespace = "team-" + "a" * 58
+        synced_informer.apply("ADDED", make_cm(namespace, "catalog-1", {}))
+
+        name = yaml.safe_load(client.get(f"/{namespace}/").text)["metadata"]["name"]
+        assert len(name) <= 63
+        assert name[-1].isalnum()
+        assert name.startswith("backstage-catalog-api-team-aaa")
+        assert name != shard_location_name(namespace[:-1] + "b")
+
+    def test_direct_mode_lists_one_namespace(self, client, make_cm):
+        """Test that without the informer a shard LISTs just its namespace."""
+        with patch('app.v1') as mock_v1:
+            mock_v1.list_namespaced_config_map.return_value = Mock(
+                items=[make_cm("team-a", "catalog-1")], metadata=Mock(_continue=None)
+            )
+            response = client.get("/team-a/")
+
+            assert mock_v1.list_namespaced_config_map.call_args.kwargs["namespace"] == "team-a"
+            mock_v1.list_config_map_for_all_namespaces.assert_not_called()
+        assert "http://testserver/team-a/catalog-1" in response.text
+
+
+class TestBackstageRefresh:
+    """Tests for choosing which Locations Backstage is asked to refresh."""
+
+    @pytest.fixture(autouse=True)
+    def base_url(self):
+        with patch('app.REFRESH_BASE_URL', "http://catalog"):
+            yield
+
+    def test_modified_refreshes_its_own_target(self):
+        """Test that a changed ConfigMap only needs its own Location re-read."""
+        from app import refresh_targets
+
+        assert refresh_targets("MODIFIED", ("default", "a")) == ["http://catalog/default/a"]
+
+    def test_added_and_deleted_refresh_the_root(self):
+        """Test that membership changes also refresh the Location listing them."""
+        from app import refresh_targets
+
+        assert refresh_targets("ADDED", ("default", "a")) == [
+            "http://catalog/default/a", "http://catalog/"]
+        assert refresh_targets("DELETED", ("default", "a")) == ["http://catalog/"]
+
+    def test_namespace_shards(self):
+        """Test that with sharded roots the namespace's Location is refreshed too."""
+        from app import refresh_targets
+
+        with patch('app.ROOT_TARGETS', "namespaces"):
+            assert refresh_targets("DELETED", ("default", "a")) == [
+                "http://catalog/", "http://catalog/default/"]
+
+    def test_aggregate(self):
+        """Test that with the aggregate root everything lives at /all."""
+        from app import refresh_targets
+
+        with patch('app.ROOT_TARGETS', "aggregate"):
+            assert refresh_targets("MODIFIED", ("default", "a")) == ["http://catalog/all"]
+
+    def test_namespace_shards_root_only_when_namespaces_change(self):
+        """Test that a sharded root is only refreshed when a namespace comes or goes."""
+        from app import refresh_targets
+
+        with patch('app.ROOT_TARGETS', "namespaces"):
+            assert refresh_targets("ADDED", ("default", "b"), False) == [
+                "http://catalog/default/b", "http://catalog/default/"]
+
+    def test_pushes_changes_after_initial_list(self, make_cm):
+        """Test that the initial LIST isn't pushed but everything after it is."""
+        import app as catalog_app
+        from informer import ConfigMapInformer
+        from refresh import RefreshNotifier
+
+        api = MagicMock()
+        api.list_config_map_for_all_namespaces.return_value = Mock(
+            items=[make_cm("default", "catalog-1", {})],
+            metadata=Mock(resource_version="10", _continue=None),
+        )
+        informer = ConfigMapInformer(api, "eda.io/backstage-catalog=true")
+        notifier = RefreshNotifier("http://backstage/api/catalog")
+        with patch('app.informer', informer), patch('app.notifier', notifier), \
+                patch('app.refresh_namespaces', {}), patch('app.refresh_live', False), \
+                patch('app.ROOT_TARGETS', "namespaces"):
+            informer.add_listener(catalog_app.notify_refresh)
+            informer.relist()
+            assert notifier.stats()["pending"] == 0
+
+            informer.apply("ADDED", make_cm("default", "catalog-2", {}, "11"))
+            assert sorted(notifier._pending) == [
+                "http://catalog/default/", "http://catalog/default/catalog-2"]
+
+            informer.apply("DELETED", make_cm("default", "catalog-1", {}, "12"))
+            informer.apply("DELETED", make_cm("default", "catalog-2", {}, "13"))
+            assert "http://catalog/" in notifier._pending
+
+
+class TestRangeRequests:
+    """Tests for Range support on ConfigMap responses."""
+
+    def test_single_range(self, client, synced_informer):
+        """Test that a byte range is served as 206 Partial Content."""
+        response = client.get("/default/catalog-1", headers={"Range": "bytes=0-3"})
+
+        assert response.status_code == 206
+        assert response.content == b"kind"
+        assert response.headers["content-range"] == "bytes 0-3/16"
+        assert response.headers["accept-ranges"] == "bytes"
+
+    def test_open_and_suffix_ranges(self, client, synced_informer):
+        """Test that bytes=N- and bytes=-N select the tail."""
+        assert client.get("/default/catalog-1",
+                          headers={"Range": "bytes=6-"}).content == b"Component\n"
+        assert client.get("/default/catalog-1",
+                          headers={"Range": "bytes=-10"}).content == b"Component\n"
+
+    def test_unsatisfiable_range(self, client, synced_informer):
+        """Test that a range past the end is 416 with the full length."""
+        response = client.get("/default/catalog-1", headers={"Range": "bytes=100-"})
+
+        assert response.status_code == 416
+        assert response.headers["content-range"] == "bytes */16"
+
+    def test_ignored_ranges(self, client, synced_informer):
+        """Test that multi-range, malformed and outdated If-Range get the whole body."""
+        for headers in ({"Range": "bytes=0-1,4-5"}, {"Range": "bytes=5-1"},
+                        {"Range": "lines=1-2"},
+                        {"Range": "bytes=0-3", "If-Range": '"old"'}):
+            response = client.get("/default/catalog-1", headers=headers)
+            assert response.status_code == 200
+            assert response.content == b"kind: Component\n"
+
+    def test_range_of_streamed_configmap(self, client, synced_informer):
+        """Test that ranges work on ConfigMaps that are otherwise streamed."""
+        with patch('app.STREAM_MIN_BYTES', 0):
+            response = client.get("/default/catalog-1", headers={"Range": "bytes=6-"})
+
+        assert response.status_code == 206
+        assert response.content == b"Component\n"
+
+
+class TestConfigMapKeys:
+    """Tests for GET /{namespace}/{configmap}/{key}."""
+
+    @pytest.fixture
+    def multi_key(self, synced_informer, make_cm):
+        synced_informer.apply("MODIFIED", make_cm("default", "catalog-1", {
+            "a.yaml": "kind: Component", "b.yaml": "kind: API\n---\nkind: System",
+        }, "2"))
+        return synced_informer
+
+    def test_reads_one_key(self, client, multi_key):
+        """Test that only the requested key's YAML is returned."""
+        response = client.get("/default/catalog-1/b.yaml")
+
+        assert response.status_code == 200
+        assert response.text == "kind: API\n---\nkind: System\n"
+        assert response.headers["etag"] == '"2/b.yaml"'
+
+    def test_key_as_json(self, client, multi_key):
+        """Test that a key's documents are available as JSON."""
+        response = client.get("/default/catalog-1/b.yaml",
+                              headers={"Accept": "application/json"})
+
+        assert response.json() == [{"kind": "API"}, {"kind": "System"}]
+
+    def test_missing_key(self, client, multi_key):
+        """Test that an unknown key is reported like a missing ConfigMap."""
+        assert client.get("/default/catalog-1/c.yaml").text.startswith("# Error: No key c.yaml")
+        response = client.get("/default/catalog-1/c.yaml",
+                              headers={"Accept": "application/json"})
+        assert response.status_code == 404
+
+    def test_key_not_modified_and_ranges(self, client, multi_key):
+        """Test that keys support conditional and range requests."""
+        etag = client.get("/default/catalog-1/a.yaml").headers["etag"]
+
+        assert client.get("/default/catalog-1/a.yaml",
+                          headers={"If-None-Match": etag}).status_code == 304
+        assert client.get("/default/catalog-1/a.yaml",
+                          headers={"Range": "bytes=0-3"}).content == b"kind"
+
+    def test_key_from_shared_file(self, client, tmp_path, make_cm):
+        """Test that workers serve a key straight from the mapped file."""
+        import shared
+
+        path = str(tmp_path / "catalog.shared")
+        shared.publish(path, [make_cm("default", "catalog-1",
+                                      {"a.yaml": "kind: A", "b.yaml": "kind: B"})])
+        catalog = shared.SharedCatalog(path)
+        catalog.refresh()
+
+        with patch('app.informer', catalog):
+            assert client.get("/default/catalog-1/b.yaml").text == "kind: B\n"
+            assert client.get("/default/catalog-1",
+                              headers={"Range": "bytes=-8"}).text == "kind: B\n"
+
+
+class TestInterning:
+    """Tests for de-duplicating ConfigMap values held by the informer."""
+
+    def test_shared_documents_stored_once(self, client, make_cm):
+        """Test that the informer's copies of a common document are one object."""
+        import app as catalog_app
+        from informer import ConfigMapInformer
+
+        system = "kind: System\nmetadata:\n  name: shared\n"
+        api = MagicMock()
+        api.list_config_map_for_all_namespaces.return_value = Mock(
+            items=[make_cm(f"team-{i}", "catalog", {"system.yaml": "".join(list(system)),
+                                                     "own.yaml": f"kind: Component {i}"})
+                   for i in range(3)],
+            metadata=Mock(resource_version="10", _continue=None),
+        )
+        informer = ConfigMapInformer(api, "eda.io/backstage-catalog=true")
+        informer.add_listener(catalog_app.interner.on_change)
+        informer.relist()
+
+        values = {id(cm.data["system.yaml"]) for cm in informer.list()}
+        assert len(values) == 1
+        with patch('app.informer', informer):
+            assert client.get("/team-2/catalog").text.startswith("kind: System")
+            stats = client.get("/-/stats").json()["interned_values"]
+        assert stats["saved_bytes"] == 2 * len(system)
+
+    def test_values_stay_shared_after_relist(self, client, make_cm):
+        """Test that a relist (after a 410) doesn't undo the sharing."""
+        import app as catalog_app
+        from informer import ConfigMapInformer
+
+        value = "x" * 100_000
+
+        def listing():
+            return Mock(
+                items=[make_cm("default", name, {"s": "".join(list(value))})
+                       for name in ("a", "b")],
+                metadata=Mock(resource_version="10", _continue=None),
+            )
+
+        api = MagicMock()
+        api.list_config_map_for_all_namespaces.side_effect = [listing(), listing()]
+        informer = ConfigMapInformer(api, "eda.io/backstage-catalog=true")
+        informer.add_listener(catalog_app.interner.on_change)
+        informer.relist()
+        informer.relist()
+
+        a, b = informer.get("default", "a"), informer.get("default", "b")
+        assert a.data["s"] is b.data["s"]
+        assert catalog_app.interner.stats()["saved_bytes"] == len(value)
@@ -0,0 +1,163 @@
+from unittest.mock import AsyncMock, Mock, patch
+import pytest
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+pytest.importorskip("kubernetes_asyncio")
+
+from kubernetes import client as k8s_client
+from kubernetes_asyncio import client as aio_client
+from async_client import AsyncConfigMapClient
+
+
+@pytest.fixture
+def aio():
+    with patch('async_client.client.CoreV1Api') as mock_api:
+        mock_api.return_value.list_config_map_for_all_namespaces = AsyncMock()
+        mock_api.return_value.list_namespaced_config_map = AsyncMock()
+        mock_api.return_value.read_namespaced_config_map = AsyncMock()
+        yield AsyncConfigMapClient(Mock(call_api=AsyncMock()), request_timeout=5)
+
+
+class TestAsyncConfigMapClient:
+    """Tests for the kubernetes_asyncio wrapper."""
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_kubeconfig(self):
+        """Test that outside a cluster the local kubeconfig is loaded instead."""
+        from kubernetes_asyncio import config
+
+        with patch('async_client.config.load_incluster_config',
+                   side_effect=config.ConfigException("not in cluster")), \
+                patch('async_client.config.load_kube_config',
+                      new_callable=AsyncMock) as load_kube_config, \
+                patch('async_client.client.ApiClient') as api_client:
+            aio = await AsyncConfigMapClient.load(pool_size=7)
+
+        configuration = load_kube_config.await_args.kwargs["client_configuration"]
+        assert configuration.connection_pool_maxsize == 7
+        api_client.assert_called_once_with(configuration)
+        assert aio.api_client is api_client.return_value
+
+    @pytest.mark.asyncio
+    async def test_list_config_map_refs(self, aio, make_cm):
+        """Test that listing returns (namespace, name) of each item."""
+        aio.v1.list_config_map_for_all_namespaces.return_value = Mock(
+            items=[make_cm("default", "a"), make_cm("prod", "b")]
+        )
+
+        assert await aio.list_config_map_refs("x=y") == [("default", "a"), ("prod", "b")]
+        aio.v1.list_config_map_for_all_namespaces.assert_awaited_once_with(
+            label_selector="x=y", _request_timeout=5
+        )
+
+    @pytest.mark.asyncio
+    async def test_list_config_map_refs_paged(self, aio, make_cm):
+        """Test that listing follows continue tokens page by page."""
+        aio.v1.list_config_map_for_all_namespaces.side_effect = [
+            Mock(items=[make_cm("default", "a")], metadata=Mock(_continue="t")),
+            Mock(items=[make_cm("default", "b")], metadata=Mock(_continue=None)),
+        ]
+
+        refs = await aio.list_config_map_refs("x=y", page_size=1)
+
+        assert refs == [("default", "a"), ("default", "b")]
+        second = aio.v1.list_config_map_for_all_namespaces.await_args_list[1]
+        assert second.kwargs == {
+            "label_selector": "x=y", "limit": 1, "_continue": "t", "_request_timeout": 5,
+        }
+
+    @pytest.mark.asyncio
+    async def test_read_config_map(self, aio):
+        """Test that reads pass name and namespace in client order."""
+        aio.v1.read_namespaced_config_map.return_value = "cm"
+
+        assert await aio.read_config_map("default", "catalog-1") == "cm"
+        aio.v1.read_namespaced_config_map.assert_awaited_once_with(
+            "catalog-1", "default", _request_timeout=5
+        )
+
+    @pytest.mark.asyncio
+    async def test_errors_are_translated(self, aio):
+        """Test that asyncio ApiExceptions surface as sync ApiExceptions."""
+        aio.v1.read_namespaced_config_map.side_effect = \
+            aio_client.exceptions.ApiException(status=404, reason="Not Found")
+
+        with pytest.raises(k8s_client.exceptions.ApiException) as excinfo:
+            await aio.read_config_map("default", "missing")
+        assert excinfo.value.status == 404
+        assert excinfo.value.reason == "Not Found"
+
+    @pytest.mark.asyncio
+    async def test_connection_errors_are_translated(self, aio):
+        """Test that an unreachable API server surfaces as a status-less ApiException."""
+        import aiohttp
+
+        aio.v1.list_config_map_for_all_namespaces.side_effect = \
+            aiohttp.ClientConnectionError("Connection refused")
+
+        with pytest.raises(k8s_client.exceptions.ApiException) as excinfo:
+            await aio.list_config_map_refs("x=y")
+        assert excinfo.value.status is None
+        assert "unreachable" in excinfo.value.reason
+
+    @pytest.mark.asyncio
+    async def test_list_config_map_refs_metadata_only(self, aio):
+        """Test that metadata-only listing asks for PartialObjectMetadataList."""
+        aio.api_client.call_api.return_value = {
+            "metadata": {},
+            "items": [{"metadata": {"namespace": "default", "name": "a"}}],
+        }
+
+        refs = await aio.list_config_map_refs("x=y", metadata_only=True)
+
+        assert refs == [("default", "a")]
+        aio.v1.list_config_map_for_all_namespaces.assert_not_awaited()
+        kwargs = aio.api_client.call_api.await_args.kwargs
+        assert "as=PartialObjectMetadataList" in kwargs["header_params"]["Accept"]
+
+    @pytest.mark.asyncio
+    async def test_list_config_maps_keeps_data(self, aio, make_cm):
+        """Test that full listing returns the ConfigMaps themselves."""
+        cm = make_cm("default", "a", {"k": "v"})
+        aio.v1.list_config_map_for_all_namespaces.return_value = Mock(
+            items=[cm], metadata=Mock(_continue=None)
+        )
+
+        assert await aio.list_config_maps("x=y", page_size=10) == [cm]
+
+    @pytest.mark.asyncio
+    async def test_list_config_maps_per_namespace(self, aio, make_cm):
+        """Test that namespace-scoped listing LISTs each namespace in turn."""
+        aio.v1.list_namespaced_config_map.side_effect = [
+            Mock(items=[make_cm("a", "1")], metadata=Mock(_continue=None)),
+            Mock(items=[make_cm("b", "2")], metadata=Mock(_continue=None)),
+        ]
+
+        refs = await aio.list_config_map_refs("x=y", namespaces=["a", "b"])
+
+        assert refs == [("a", "1"), ("b", "2")]
+        aio.v1.list_config_map_for_all_namespaces.assert_not_awaited()
+        namespaces = [c.kwargs["namespace"] for c in aio.v1.list_namespaced_config_map.await_args_list]
+        assert namespaces == ["a", "b"]
+
+    @pytest.mark.asyncio
+    async def test_metadata_listing_with_real_client(self):
+        """Test that metadata LISTs work through the installed client's ApiClient."""
+        sys.path.insert(0, str(Path(__file__).parent.parent / "benchmarks"))
+        from fake_kube import FakeKubeAPI
+
+        kube = FakeKubeAPI(count=3, namespaces=1)
+        configuration = aio_client.Configuration(host=kube.start())
+        aio = AsyncConfigMapClient(aio_client.ApiClient(configuration), request_timeout=5)
+        try:
+            refs = await aio.list_config_map_refs("x=y", page_size=2, metadata_only=True)
+        finally:
+            await aio.close()
+            kube.stop()
+
+        assert refs == [("team-0", "catalog-0"), ("team-0", "catalog-1"), ("team-0", "catalog-2")]
+        assert kube.calls["list"] == 2
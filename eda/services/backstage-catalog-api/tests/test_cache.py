@@ -0,0 +1,330 @@
+from unittest.mock import Mock
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cache import LastGoodCache, RenderCache, SingleFlight, TTLCache, ValueInterner
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRenderCache:
+    """Tests for the rendered-response cache."""
+
+    def test_renders_once_per_version(self):
+        """Test that a second lookup at the same version is a hit."""
+        cache = RenderCache()
+        render = Mock(return_value=b"body")
+
+        assert cache.get(("cm", "a", "b"), "1", render) == b"body"
+        assert cache.get(("cm", "a", "b"), "1", render) == b"body"
+
+        render.assert_called_once()
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_new_version_re_renders(self):
+        """Test that a different version is never served the old bytes."""
+        cache = RenderCache()
+        cache.get(("cm", "a", "b"), "1", lambda: b"old")
+
+        assert cache.get(("cm", "a", "b"), "2", lambda: b"new") == b"new"
+        assert cache.stats()["entries"] == 1
+
+    def test_evicts_least_recently_used(self):
+        """Test that the cache holds at most max_entries."""
+        cache = RenderCache(max_entries=2)
+        cache.get(("cm", "a", "1"), "1", lambda: b"1")
+        cache.get(("cm", "a", "2"), "1", lambda: b"2")
+        cache.get(("cm", "a", "1"), "1", lambda: b"1")
+        cache.get(("cm", "a", "3"), "1", lambda: b"3")
+
+        render = Mock(return_value=b"2")
+        cache.get(("cm", "a", "2"), "1", render)
+        render.assert_called_once()
+
+    def test_modified_configmap_drops_only_its_entry(self):
+        """Test that MODIFIED invalidates the ConfigMap but not the root."""
+        cache = RenderCache()
+        cache.get(("cm", "a", "b"), "1", lambda: b"cm")
+        cache.get(("root", "http", "host"), "d", lambda: b"root")
+
+        cache.on_change("MODIFIED", ("a", "b"), Mock())
+
+        assert cache.stats()["entries"] == 1
+        assert cache.get(("root", "http", "host"), "d", Mock()) == b"root"
+
+    def test_added_or_deleted_configmap_drops_root(self):
+        """Test that membership changes invalidate every root rendering."""
+        cache = RenderCache()
+        cache.get(("root", "http", "a"), "d", lambda: b"root")
+        cache.get(("root", "https", "b"), "d", lambda: b"root")
+
+        cache.on_change("ADDED", ("a", "b"), Mock())
+
+        assert cache.stats()["entries"] == 0
+
+    def test_membership_change_drops_only_its_shard(self):
+        """Test that an added ConfigMap leaves other namespaces' Locations cached."""
+        cache = RenderCache()
+        cache.get(("shard", "a", "http", "host"), "d", lambda: b"a")
+        cache.get(("shard", "b", "http", "host"), "d", lambda: b"b")
+
+        cache.on_change("ADDED", ("a", "x"), Mock())
+
+        assert cache.stats()["entries"] == 1
+        assert cache.get(("shard", "b", "http", "host"), "d", Mock()) == b"b"
+
+    def test_stats_counts_bytes(self):
+        """Test that stats report the total cached bytes."""
+        cache = RenderCache()
+        cache.get(("cm", "a", "b"), "1", lambda: b"12345")
+
+        assert cache.stats()["bytes"] == 5
+
+    def test_evicts_to_fit_max_bytes(self):
+        """Test that the cache holds at most max_bytes of bodies."""
+        cache = RenderCache(max_bytes=10)
+        cache.get(("cm", "a", "1"), "1", lambda: b"12345")
+        cache.get(("cm", "a", "2"), "1", lambda: b"12345")
+        cache.get(("cm", "a", "2"), "1", lambda: b"[]", "json")
+
+        assert cache.stats()["entries"] == 1
+        assert cache.stats()["bytes"] == 7
+
+    def test_new_version_releases_old_bytes(self):
+        """Test that re-rendering at a new version doesn't count the old bodies."""
+        cache = RenderCache()
+        cache.get(("cm", "a", "b"), "1", lambda: b"12345")
+        cache.get(("cm", "a", "b"), "1", lambda: b"[]", "json")
+        cache.get(("cm", "a", "b"), "2", lambda: b"123")
+
+        assert cache.stats()["bytes"] == 3
+
+    def test_oversized_body_not_cached(self):
+        """Test that a body larger than max_bytes is returned but not kept."""
+        cache = RenderCache(max_bytes=4)
+        cache.get(("cm", "a", "1"), "1", lambda: b"1234")
+
+        assert cache.get(("cm", "a", "2"), "1", lambda: b"12345") == b"12345"
+        assert cache.stats()["entries"] == 1
+        assert cache.stats()["bytes"] == 4
+
+
+class TestTTLCache:
+    """Tests for the byte-bounded TTL/LRU read cache."""
+
+    def test_hit_before_expiry(self):
+        """Test that a value is served until its TTL runs out."""
+        clock = FakeClock()
+        cache = TTLCache(1000, clock=clock)
+        cache.put("k", "v", 10, ttl=5)
+
+        clock.now = 4.9
+        assert cache.get("k") == "v"
+        clock.now = 5.0
+        assert cache.get("k") is None
+        assert cache.stats() == {"hits": 1, "misses": 1, "entries": 0, "bytes": 0}
+
+    def test_per_entry_ttl(self):
+        """Test that entries can carry different TTLs (e.g. negative results)."""
+        clock = FakeClock()
+        cache = TTLCache(1000, clock=clock)
+        cache.put("found", "v", 10, ttl=30)
+        cache.put("missing", "404", 10, ttl=5)
+
+        clock.now = 10
+        assert cache.get("found") == "v"
+        assert cache.get("missing") is None
+
+    def test_bounded_by_bytes(self):
+        """Test that least recently used entries go once max_bytes is exceeded."""
+        cache = TTLCache(100, clock=FakeClock())
+        cache.put("a", "a", 40, ttl=10)
+        cache.put("b", "b", 40, ttl=10)
+        cache.get("a")
+        cache.put("c", "c", 40, ttl=10)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "a"
+        assert cache.get("c") == "c"
+        assert cache.stats()["bytes"] == 80
+
+    def test_oversized_and_zero_ttl_not_cached(self):
+        """Test that values bigger than the cache, or with TTL 0, are skipped."""
+        cache = TTLCache(100, clock=FakeClock())
+        cache.put("big", "x", 101, ttl=10)
+        cache.put("off", "x", 1, ttl=0)
+
+        assert cache.stats()["entries"] == 0
+
+    def test_replacing_entry_updates_bytes(self):
+        """Test that re-putting a key doesn't double count its size."""
+        cache = TTLCache(100, clock=FakeClock())
+        cache.put("a", "v1", 30, ttl=10)
+        cache.put("a", "v2", 50, ttl=10)
+
+        assert cache.get("a") == "v2"
+        assert cache.stats()["bytes"] == 50
+
+
+class TestLastGoodCache:
+    """Tests for the serve-stale fallback store."""
+
+    def test_returns_value_with_age(self):
+        """Test that entries never expire and report how old they are."""
+        clock = FakeClock()
+        cache = LastGoodCache(1000, clock=clock)
+        cache.put("k", "v", 10)
+
+        clock.now = 3600
+        assert cache.get("k") == ("v", 3600)
+        assert cache.get("missing") is None
+        assert cache.stats() == {"served": 1, "entries": 1, "bytes": 10}
+
+    def test_bounded_by_bytes(self):
+        """Test that least recently used entries go once max_bytes is exceeded."""
+        cache = LastGoodCache(100, clock=FakeClock())
+        cache.put("a", "a", 60)
+        cache.put("a", "a2", 40)
+        cache.put("b", "b", 40)
+        cache.get("a")
+        cache.put("c", "c", 40)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == ("a2", 0)
+        assert cache.stats()["bytes"] == 80
+
+
+class TestValueInterner:
+    """Tests for sharing identical ConfigMap values."""
+
+    @staticmethod
+    def value(text):
+        # A fresh str object, as each decoded API response would hold
+        return "".join(list(text))
+
+    def test_identical_values_shared(self, make_cm):
+        """Test that equal values in different ConfigMaps become one object."""
+        interner = ValueInterner()
+        a = make_cm("team-a", "catalog", {"system.yaml": self.value("kind: System"),
+                                          "own.yaml": "kind: A"})
+        b = make_cm("team-b", "catalog", {"system.yaml": self.value("kind: System")})
+        assert a.data["system.yaml"] is not b.data["system.yaml"]
+
+        interner.on_change("ADDED", ("team-a", "catalog"), a)
+        interner.on_change("ADDED", ("team-b", "catalog"), b)
+
+        assert a.data["system.yaml"] is b.data["system.yaml"]
+        assert interner.stats() == {"values": 2, "bytes": 19, "saved_bytes": 12}
+
+    def test_released_with_last_holder(self, make_cm):
+        """Test that a value goes once no ConfigMap holds it."""
+        interner = ValueInterner()
+        a = make_cm("team-a", "catalog", {"k": "kind: System"})
+        b = make_cm("team-b", "catalog", {"k": "kind: System"})
+        interner.on_change("ADDED", ("team-a", "catalog"), a)
+        interner.on_change("ADDED", ("team-b", "catalog"), b)
+
+        interner.on_change("MODIFIED", ("team-a", "catalog"),
+                           make_cm("team-a", "catalog", {"k": "kind: Domain"}))
+        interner.on_change("DELETED", ("team-b", "catalog"), b)
+
+        assert interner.stats() == {"values": 1, "bytes": 12, "saved_bytes": 0}
+
+    def test_unchanged_value_keeps_its_copy(self, make_cm):
+        """Test that re-interning a ConfigMap doesn't churn its values."""
+        interner = ValueInterner()
+        first = make_cm("team-a", "catalog", {"k": self.value("kind: System")})
+        interner.on_change("ADDED", ("team-a", "catalog"), first)
+        again = make_cm("team-a", "catalog", {"k": self.value("kind: System")}, "2")
+
+        interner.on_change("MODIFIED", ("team-a", "catalog"), again)
+
+        assert again.data["k"] is first.data["k"]
+        assert interner.stats()["values"] == 1
+
+
+class TestSingleFlight:
+    """Tests for coalescing concurrent upstream calls."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_one_call(self):
+        """Test that N concurrent callers for a key trigger one call."""
+        flights = SingleFlight()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flights.do("k", fetch) for _ in range(10)))
+
+        assert results == ["result"] * 10
+        assert calls == 1
+        assert flights.stats() == {"leaders": 1, "followers": 9, "in_flight": 0}
+
+    @pytest.mark.asyncio
+    async def test_different_keys_do_not_share(self):
+        """Test that only callers for the same key are coalesced."""
+        flights = SingleFlight()
+
+        async def fetch(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        results = await asyncio.gather(
+            flights.do("a", lambda: fetch("a")), flights.do("b", lambda: fetch("b"))
+        )
+
+        assert results == ["a", "b"]
+        assert flights.leaders == 2
+
+    @pytest.mark.asyncio
+    async def test_exception_shared_and_key_released(self):
+        """Test that failures reach every waiter and don't stick around."""
+        flights = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(
+            flights.do("k", fail), flights.do("k", fail), return_exceptions=True
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+        async def succeed():
+            return "ok"
+
+        assert await flights.do("k", succeed) == "ok"
+        assert flights.leaders == 2
+
+    @pytest.mark.asyncio
+    async def test_cancelled_leader_does_not_cancel_followers(self):
+        """Test that the leader going away leaves the call running."""
+        flights = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.02)
+            return "result"
+
+        leader = asyncio.ensure_future(flights.do("k", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.do("k", fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        assert await follower == "result"
@@ -0,0 +1,171 @@
+import asyncio
+import threading
+import pytest
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from changes import ChangeFeed, CursorExpired
+
+
+@pytest.fixture
+def feed():
+    return ChangeFeed(max_events=4)
+
+
+class TestSince:
+    """Tests for reading changes after a cursor."""
+
+    def test_returns_changes_after_cursor(self, feed, make_cm):
+        """Test that only events after the cursor are returned."""
+        feed.on_change("ADDED", ("default", "a"), make_cm("default", "a", resource_version="1"))
+        cursor = feed.cursor()
+        feed.on_change("ADDED", ("default", "b"), make_cm("default", "b", resource_version="2"))
+
+        changes, next_cursor = feed.since(cursor)
+
+        assert changes == [{"type": "ADDED", "namespace": "default", "name": "b",
+                            "resourceVersion": "2"}]
+        assert feed.since(next_cursor) == ([], next_cursor)
+
+    def test_collapses_events_per_configmap(self, feed, make_cm):
+        """Test that several events for one ConfigMap report only the latest."""
+        cursor = feed.cursor()
+        feed.on_change("ADDED", ("default", "a"), make_cm("default", "a", resource_version="1"))
+        feed.on_change("ADDED", ("default", "b"), make_cm("default", "b", resource_version="2"))
+        feed.on_change("DELETED", ("default", "a"), make_cm("default", "a", resource_version="3"))
+
+        changes, _ = feed.since(cursor)
+
+        assert [(c["type"], c["name"]) for c in changes] == [("ADDED", "b"), ("DELETED", "a")]
+
+    def test_expired_cursor(self, feed, make_cm):
+        """Test that a cursor older than the retained events is rejected."""
+        cursor = feed.cursor()
+        for i in range(5):
+            feed.on_change("ADDED", ("default", str(i)), make_cm("default", str(i)))
+
+        with pytest.raises(CursorExpired):
+            feed.since(cursor)
+
+    def test_cursor_from_another_run(self, feed):
+        """Test that cursors from a different feed (a restart) are rejected."""
+        with pytest.raises(CursorExpired):
+            feed.since(ChangeFeed().cursor())
+
+    def test_garbage_cursor(self, feed):
+        """Test that an undecodable cursor is rejected."""
+        with pytest.raises(CursorExpired):
+            feed.since("not-a-cursor!")
+
+
+class TestWait:
+    """Tests for waiting on new changes."""
+
+    def test_wakes_on_change_from_another_thread(self, feed, make_cm):
+        """Test that a change made by the informer thread ends the wait."""
+        cursor = feed.cursor()
+
+        async def wait():
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.05, lambda: threading.Thread(
+                target=feed.on_change,
+                args=("ADDED", ("default", "a"), make_cm("default", "a")),
+            ).start())
+            return await feed.wait(cursor, 5)
+
+        assert asyncio.run(wait()) is True
+        assert feed.stats()["waiters"] == 0
+
+    def test_times_out(self, feed):
+        """Test that wait returns False when nothing changes."""
+        assert asyncio.run(feed.wait(feed.cursor(), 0.01)) is False
+
+    def test_returns_immediately_when_behind(self, feed, make_cm):
+        """Test that a cursor with pending changes doesn't wait."""
+        cursor = feed.cursor()
+        feed.on_change("ADDED", ("default", "a"), make_cm("default", "a"))
+
+        assert asyncio.run(feed.wait(cursor, 60)) is True
+
+
+def following(listed, max_events=4):
+    """A feed following a stand-in informer whose LIST was at ``listed``."""
+    feed = ChangeFeed(max_events=max_events)
+    feed.follow(SimpleNamespace(resource_version=listed, listed_resource_version=listed))
+    return feed
+
+
+def watch_event(feed, make_cm, name, resource_version):
+    feed._source.resource_version = resource_version
+    feed.on_change("MODIFIED", ("default", name),
+                   make_cm("default", name, resource_version=resource_version))
+
+
+class TestOtherProcesses:
+    """Tests for cursors handed out by another replica or before a restart."""
+
+    def test_resumes_from_resource_version(self, make_cm):
+        """Test that a replica that saw the same watch events picks up the cursor."""
+        first, second = following("10"), following("10")
+        for feed in (first, second):
+            watch_event(feed, make_cm, "a", "11")
+        cursor = first.cursor()
+        for feed in (first, second):
+            watch_event(feed, make_cm, "b", "12")
+
+        changes, next_cursor = second.since(cursor)
+
+        assert [c["name"] for c in changes] == ["b"]
+        assert second.since(next_cursor) == ([], next_cursor)
+
+    def test_restart_listed_after_cursor(self, make_cm):
+        """Test that a cursor from before this process's LIST is rejected."""
+        before = following("10")
+        watch_event(before, make_cm, "a", "11")
+
+        with pytest.raises(CursorExpired):
+            following("20").since(before.cursor())
+
+    def test_changes_since_cursor_dropped(self, make_cm):
+        """Test that a cursor older than the retained events is rejected."""
+        first, second = following("10"), following("10", max_events=2)
+        watch_event(first, make_cm, "a", "11")
+        for i in range(12, 15):
+            watch_event(second, make_cm, str(i), str(i))
+
+        with pytest.raises(CursorExpired):
+            second.since(first.cursor())
+
+
+class TestSnapshot:
+    """Tests for following another process's feed."""
+
+    def test_cursors_carry_over(self, feed, make_cm):
+        """Test that a restored feed accepts the original's cursors."""
+        cursor = feed.cursor()
+        feed.on_change("ADDED", ("default", "a"), make_cm("default", "a", resource_version="5"))
+        follower = ChangeFeed()
+
+        follower.restore(feed.snapshot())
+
+        changes, next_cursor = follower.since(cursor)
+        assert changes == [{"type": "ADDED", "namespace": "default", "name": "a",
+                            "resourceVersion": "5"}]
+        assert next_cursor == feed.cursor()
+
+    def test_restore_wakes_waiters(self, feed, make_cm):
+        """Test that readers waiting on a follower see restored changes."""
+        follower = ChangeFeed()
+        follower.restore(feed.snapshot())
+        cursor = follower.cursor()
+        feed.on_change("ADDED", ("default", "a"), make_cm("default", "a"))
+
+        async def wait():
+            asyncio.get_running_loop().call_later(0.05, follower.restore, feed.snapshot())
+            return await follower.wait(cursor, 5)
+
+        assert asyncio.run(wait()) is True
@@ -0,0 +1,135 @@
+import pytest
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from entities import EntityIndex, parse_entities
+
+CATALOG = """\
+apiVersion: backstage.io/v1alpha1
+kind: Component
+metadata:
+  name: web
+spec:
+  owner: team-a
+  system: shop
+  lifecycle: production
+---
+apiVersion: backstage.io/v1alpha1
+kind: API
+metadata:
+  name: orders
+  namespace: sales
+spec:
+  owner: team-b
+  system: shop
+"""
+
+
+@pytest.fixture
+def index(make_cm):
+    index = EntityIndex()
+    index.on_change("ADDED", ("default", "shop"),
+                    make_cm("default", "shop", {"catalog.yaml": CATALOG}))
+    return index
+
+
+def names(entities):
+    return [entity["metadata"]["name"] for entity in entities]
+
+
+class TestParseEntities:
+    """Tests for reading entities out of ConfigMap values."""
+
+    def test_multi_document_values(self, make_cm):
+        """Test that every document in every value is parsed."""
+        cm = make_cm("default", "a", {
+            "a.yaml": CATALOG, "b.yaml": "---\nkind: Group\nmetadata: {name: x}",
+        })
+
+        assert names(parse_entities(cm)) == ["web", "orders", "x"]
+
+    def test_values_read_as_one_stream(self, make_cm):
+        """Test that a value without a --- marker continues the previous
+        document, as in the ConfigMap's YAML."""
+        cm = make_cm("default", "a", {
+            "a.yaml": "kind: Component\nmetadata: {name: web}",
+            "b.yaml": "spec: {owner: team-a}",
+        })
+
+        assert parse_entities(cm) == [{
+            "kind": "Component", "metadata": {"name": "web"}, "spec": {"owner": "team-a"},
+        }]
+
+    def test_invalid_yaml_skipped(self, make_cm):
+        """Test that a ConfigMap whose YAML is broken is skipped, not fatal."""
+        cm = make_cm("default", "a", {"bad.yaml": "kind: [", "good.yaml": CATALOG})
+
+        assert parse_entities(cm) == []
+
+
+class TestEntityIndex:
+    """Tests for indexing and querying entities."""
+
+    def test_query_by_field(self, index):
+        """Test lookups by kind, owner and system."""
+        assert names(index.query(kind="component")) == ["web"]
+        assert names(index.query(owner="team-b")) == ["orders"]
+        assert names(index.query(system="shop")) == ["orders", "web"]
+
+    def test_query_intersects_fields(self, index):
+        """Test that several filters must all match."""
+        assert names(index.query(system="shop", owner="team-a")) == ["web"]
+        assert index.query(system="shop", owner="team-c") == []
+
+    def test_namespace_defaults(self, index):
+        """Test that entities without a namespace are in default."""
+        assert names(index.query(namespace="default")) == ["web"]
+        assert names(index.query(namespace="sales")) == ["orders"]
+
+    def test_get_by_ref(self, index):
+        """Test direct lookup by entity ref."""
+        assert index.get("Component:default/web")["spec"]["owner"] == "team-a"
+        assert index.get("api:default/orders") is None
+
+    def test_modified_configmap_reindexed(self, index, make_cm):
+        """Test that a change replaces the ConfigMap's entities."""
+        index.on_change("MODIFIED", ("default", "shop"), make_cm(
+            "default", "shop", {"c.yaml": "kind: Component\nmetadata: {name: web}\nspec: {owner: team-c}"}
+        ))
+
+        assert names(index.query()) == ["web"]
+        assert index.query(owner="team-a") == []
+        assert names(index.query(owner="team-c")) == ["web"]
+
+    def test_deleted_configmap_unindexed(self, index, make_cm):
+        """Test that deleting a ConfigMap drops its entities."""
+        index.on_change("DELETED", ("default", "shop"), make_cm("default", "shop"))
+
+        assert len(index) == 0
+        assert index.query(system="shop") == []
+
+    def test_duplicate_ref_served_from_latest(self, index, make_cm):
+        """Test that an entity defined twice is served from the later ConfigMap."""
+        index.on_change("ADDED", ("other", "copy"), make_cm(
+            "other", "copy", {"c.yaml": "kind: Component\nmetadata: {name: web}\nspec: {owner: team-c}"}
+        ))
+
+        assert names(index.query(owner="team-c")) == ["web"]
+        assert index.query(owner="team-a", kind="component") == []
+
+    def test_duplicate_ref_outlives_later_configmap(self, index, make_cm):
+        """Test that deleting the later definition falls back to the earlier one."""
+        shared = {"s.yaml": "kind: System\nmetadata: {name: shared}"}
+        index.on_change("ADDED", ("t1", "a"), make_cm("t1", "a", shared))
+        index.on_change("ADDED", ("t2", "b"), make_cm("t2", "b", shared))
+        before = len(index)
+
+        index.on_change("DELETED", ("t2", "b"), make_cm("t2", "b"))
+
+        assert len(index) == before
+        assert names(index.query(kind="system", name="shared")) == ["shared"]
+        index.on_change("DELETED", ("t1", "a"), make_cm("t1", "a"))
+        assert index.query(name="shared") == []
@@ -0,0 +1,59 @@
+import pytest
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import formats
+
+
+class TestNegotiate:
+    """Tests for choosing a representation from Accept."""
+
+    @pytest.mark.parametrize("accept, expected", [
+        (None, "yaml"),
+        ("*/*", "yaml"),
+        ("application/json", "json"),
+        ("application/yaml", "yaml"),
+        ("text/html, application/json;q=0.9", "json"),
+        ("application/json;q=0.5, application/yaml", "yaml"),
+        ("application/yaml;q=0.2, application/json;q=0.8", "json"),
+        ("application/json;q=bogus", "yaml"),
+        ("application/json;q=0.1, */*", "yaml"),
+        ("application/json;q=0.1, text/*", "yaml"),
+        ("application/json, */*;q=0.8", "json"),
+        ("application/json, application/yaml", "yaml"),
+        ("application/*;q=0.5, text/yaml;q=0.2", "yaml"),
+        ("text/html, */*;q=0.1", "yaml"),
+    ])
+    def test_negotiate(self, accept, expected):
+        """Test that the highest-q supported media type wins, YAML by default."""
+        assert formats.negotiate(accept) == expected
+
+
+class TestSerialization:
+    """Tests for the YAML and JSON serializers."""
+
+    def test_yaml_keeps_key_order(self):
+        """Test that dumped YAML keeps insertion order."""
+        assert formats.dump_yaml({"b": 1, "a": [2]}) == b"b: 1\na:\n- 2\n"
+
+    def test_json_is_compact(self):
+        """Test that JSON is rendered without whitespace."""
+        assert formats.dump_json({"a": [1, "x"]}) == b'{"a":[1,"x"]}'
+
+    def test_json_from_unusual_yaml(self):
+        """Test that non-string keys, sets and dates from YAML encode as JSON."""
+        documents = formats.load_documents("8080: http\non: !!set {a}\nd: 2024-01-01")
+
+        assert formats.dump_json(documents) == b'[{"8080":"http","true":["a"],"d":"2024-01-01"}]'
+
+    def test_load_documents_skips_empty(self):
+        """Test that empty documents in a stream are dropped."""
+        assert formats.load_documents("---\na: 1\n---\n---\nb: 2\n") == [{"a": 1}, {"b": 2}]
+
+    def test_etag_per_representation(self):
+        """Test that each representation has its own ETag."""
+        assert formats.etag("7", "yaml") == '"7"'
+        assert formats.etag("7", "json") == '"7-json"'
@@ -0,0 +1,443 @@
+from functools import partial
+import json
+from unittest.mock import Mock, MagicMock, patch
+import pytest
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from kubernetes import client as k8s_client, watch
+from informer import ConfigMapInformer, NamespacedInformer, list_config_map_metadata, list_pages
+
+
+def list_response(items, resource_version="100", continue_token=None):
+    return Mock(
+        items=items,
+        metadata=Mock(resource_version=resource_version, _continue=continue_token),
+    )
+
+
+def namespace_list(*names):
+    return k8s_client.V1NamespaceList(items=[
+        k8s_client.V1Namespace(metadata=k8s_client.V1ObjectMeta(name=name))
+        for name in names
+    ])
+
+
+@pytest.fixture
+def api():
+    return MagicMock()
+
+
+@pytest.fixture
+def informer(api):
+    return ConfigMapInformer(api, "eda.io/backstage-catalog=true", retry_delay=0)
+
+
+class TestRelist:
+    """Tests for seeding the cache from a LIST."""
+
+    def test_relist_populates_store(self, informer, api, make_cm):
+        """Test that a LIST fills the map and records its resourceVersion."""
+        api.list_config_map_for_all_namespaces.return_value = list_response(
+            [make_cm("default", "a"), make_cm("prod", "b")], "42"
+        )
+
+        informer.relist()
+
+        assert informer.synced
+        assert informer.resource_version == "42"
+        assert informer.get("default", "a").metadata.name == "a"
+        assert len(informer) == 2
+        api.list_config_map_for_all_namespaces.assert_called_once_with(
+            label_selector="eda.io/backstage-catalog=true", limit=50
+        )
+
+    def test_listeners_hear_initial_list_before_synced(self, informer, api, make_cm):
+        """Test that the first LIST's events arrive while the cache isn't synced yet."""
+        api.list_config_map_for_all_namespaces.return_value = list_response(
+            [make_cm("default", "a")]
+        )
+        seen = []
+        informer.add_listener(lambda *event: seen.append(informer.synced))
+
+        informer.relist()
+
+        assert seen == [False]
+        assert informer.synced
+
+    def test_relist_replaces_previous_contents(self, informer, api, make_cm):
+        """Test that ConfigMaps missing from a new LIST are dropped."""
+        api.list_config_map_for_all_namespaces.side_effect = [
+            list_response([make_cm("default", "a")]),
+            list_response([make_cm("default", "b")]),
+        ]
+
+        informer.relist()
+        informer.relist()
+
+        assert informer.get("default", "a") is None
+        assert informer.get("default", "b") is not None
+
+    def test_relist_pages_through_continue_tokens(self, informer, api, make_cm):
+        """Test that a relist builds the map from every LIST page."""
+        informer.page_size = 1
+        api.list_config_map_for_all_namespaces.side_effect = [
+            list_response([make_cm("default", "a")], "42", "token-1"),
+            list_response([make_cm("default", "b")], "42"),
+        ]
+
+        informer.relist()
+
+        assert len(informer) == 2
+        assert informer.resource_version == "42"
+        second = api.list_config_map_for_all_namespaces.call_args_list[1]
+        assert second.kwargs["_continue"] == "token-1"
+        assert second.kwargs["limit"] == 1
+
+    def test_list_is_ordered(self, informer, api, make_cm):
+        """Test that list() returns ConfigMaps ordered by namespace/name."""
+        api.list_config_map_for_all_namespaces.return_value = list_response(
+            [make_cm("prod", "a"), make_cm("default", "z"), make_cm("default", "b")]
+        )
+
+        informer.relist()
+
+        names = [(cm.metadata.namespace, cm.metadata.name) for cm in informer.list()]
+        assert names == [("default", "b"), ("default", "z"), ("prod", "a")]
+
+
+class TestWatchEvents:
+    """Tests for applying watch events to the cache."""
+
+    def test_added_and_modified(self, informer, make_cm):
+        """Test that ADDED and MODIFIED events upsert the ConfigMap."""
+        informer.apply("ADDED", make_cm("default", "a", {"k": "v1"}, "5"))
+        informer.apply("MODIFIED", make_cm("default", "a", {"k": "v2"}, "6"))
+
+        assert informer.get("default", "a").data == {"k": "v2"}
+        assert informer.resource_version == "6"
+
+    def test_deleted(self, informer, make_cm):
+        """Test that DELETED events remove the ConfigMap."""
+        informer.apply("ADDED", make_cm("default", "a", resource_version="5"))
+        informer.apply("DELETED", make_cm("default", "a", resource_version="7"))
+
+        assert informer.get("default", "a") is None
+        assert informer.resource_version == "7"
+
+    def test_bookmark_only_advances_resource_version(self, informer, make_cm):
+        """Test that BOOKMARK events, as the client emits them, don't touch the map."""
+        listener = Mock()
+        informer.add_listener(listener)
+        bookmark = watch.Watch().unmarshal_event(json.dumps({
+            "type": "BOOKMARK",
+            "object": {"kind": "ConfigMap", "apiVersion": "v1",
+                       "metadata": {"resourceVersion": "9"}},
+        }), "V1ConfigMap")
+
+        with patch("informer.watch.Watch") as mock_watch:
+            mock_watch.return_value.stream.return_value = iter([bookmark])
+            informer.watch_once()
+
+        assert len(informer) == 0
+        assert informer.resource_version == "9"
+        listener.assert_not_called()
+
+    def test_watch_resumes_from_list_resource_version(self, informer, api, make_cm):
+        """Test that the watch starts at the LIST resourceVersion."""
+        api.list_config_map_for_all_namespaces.return_value = list_response([], "42")
+        informer.relist()
+
+        with patch("informer.watch.Watch") as mock_watch:
+            mock_watch.return_value.stream.return_value = iter([
+                {"type": "ADDED", "object": make_cm("default", "a", resource_version="43")},
+            ])
+            informer.watch_once()
+
+            kwargs = mock_watch.return_value.stream.call_args.kwargs
+            assert kwargs["resource_version"] == "42"
+            assert kwargs["label_selector"] == "eda.io/backstage-catalog=true"
+
+        assert informer.get("default", "a") is not None
+        assert informer.resource_version == "43"
+
+
+class TestListeners:
+    """Tests for change notifications."""
+
+    def test_watch_events_notify_listeners(self, informer, make_cm):
+        """Test that listeners see each watch event with its key."""
+        listener = Mock()
+        informer.add_listener(listener)
+        cm = make_cm("default", "a")
+
+        informer.apply("ADDED", cm)
+        informer.bookmark("2")
+
+        listener.assert_called_once_with("ADDED", ("default", "a"), cm)
+
+    def test_relist_notifies_differences(self, informer, api, make_cm):
+        """Test that a relist reports what changed since the last store."""
+        api.list_config_map_for_all_namespaces.side_effect = [
+            list_response([make_cm("default", "same", resource_version="1"),
+                           make_cm("default", "changed", resource_version="1"),
+                           make_cm("default", "gone", resource_version="1")]),
+            list_response([make_cm("default", "same", resource_version="1"),
+                           make_cm("default", "changed", resource_version="2"),
+                           make_cm("default", "new", resource_version="3")]),
+        ]
+        informer.relist()
+        listener = Mock()
+        informer.add_listener(listener)
+
+        informer.relist()
+
+        events = sorted((c.args[0], c.args[1][1]) for c in listener.call_args_list)
+        assert events == [
+            ("ADDED", "new"), ("DELETED", "gone"), ("MODIFIED", "changed"),
+        ]
+
+    def test_relist_keeps_unchanged_objects(self, informer, api, make_cm):
+        """Test that a relist keeps the object listeners saw when nothing changed."""
+        api.list_config_map_for_all_namespaces.side_effect = [
+            list_response([make_cm("default", "same", resource_version="1"),
+                           make_cm("default", "changed", resource_version="1")]),
+            list_response([make_cm("default", "same", resource_version="1"),
+                           make_cm("default", "changed", resource_version="2")]),
+        ]
+        informer.relist()
+        same, changed = informer.get("default", "same"), informer.get("default", "changed")
+
+        informer.relist()
+
+        assert informer.get("default", "same") is same
+        assert informer.get("default", "changed") is not changed
+
+    def test_failing_listener_does_not_break_others(self, informer, make_cm):
+        """Test that one listener raising doesn't stop the rest."""
+        listener = Mock()
+        informer.add_listener(Mock(side_effect=RuntimeError("boom")))
+        informer.add_listener(listener)
+
+        informer.apply("ADDED", make_cm("default", "a"))
+
+        listener.assert_called_once()
+        assert informer.get("default", "a") is not None
+
+
+class TestRunLoop:
+    """Tests for the list/watch loop."""
+
+    def test_relists_on_gone(self, informer, api, make_cm):
+        """Test that a 410 Gone from the watch triggers a fresh LIST."""
+        api.list_config_map_for_all_namespaces.side_effect = [
+            list_response([make_cm("default", "a")], "1"),
+            list_response([make_cm("default", "b")], "50"),
+        ]
+        watches = iter([
+            k8s_client.exceptions.ApiException(status=410, reason="Gone"),
+            None,
+        ])
+
+        def watch_once():
+            outcome = next(watches)
+            if outcome is not None:
+                raise outcome
+            informer._stopped.set()
+
+        informer.watch_once = watch_once
+        informer.run()
+
+        assert api.list_config_map_for_all_namespaces.call_count == 2
+        assert informer.get("default", "a") is None
+        assert informer.get("default", "b") is not None
+        assert informer.resource_version == "50"
+
+    def test_keeps_store_on_other_errors(self, informer, api, make_cm):
+        """Test that non-410 failures retry the watch without relisting."""
+        api.list_config_map_for_all_namespaces.return_value = list_response(
+            [make_cm("default", "a")], "1"
+        )
+        watches = iter([
+            k8s_client.exceptions.ApiException(status=500, reason="Boom"),
+            None,
+        ])
+
+        def watch_once():
+            outcome = next(watches)
+            if outcome is not None:
+                raise outcome
+            informer._stopped.set()
+
+        informer.watch_once = watch_once
+        informer.run()
+
+        assert api.list_config_map_for_all_namespaces.call_count == 1
+        assert informer.get("default", "a") is not None
+
+
+class TestMetadataListing:
+    """Tests for PartialObjectMetadata LISTs."""
+
+    def test_metadata_page_parsed_into_configmap_list(self, api):
+        """Test that the metadata body becomes a pageable V1ConfigMapList."""
+        api.api_client.call_api.return_value = {
+            "kind": "PartialObjectMetadataList",
+            "metadata": {"resourceVersion": "9", "continue": "next"},
+            "items": [{"metadata": {
+                "namespace": "default", "name": "a", "resourceVersion": "3",
+            }}],
+        }
+
+        page = list_config_map_metadata(api, "x=y", limit=1, _continue="prev")
+
+        assert page.metadata._continue == "next"
+        assert page.metadata.resource_version == "9"
+        assert page.items[0].metadata.name == "a"
+        assert page.items[0].data is None
+        kwargs = api.api_client.call_api.call_args.kwargs
+        assert kwargs["query_params"] == [
+            ("labelSelector", "x=y"), ("limit", 1), ("continue", "prev")
+        ]
+
+    def test_metadata_listing_pages(self, api):
+        """Test that metadata LISTs can be driven by list_pages."""
+        api.api_client.call_api.side_effect = [
+            {"metadata": {"continue": "t"},
+             "items": [{"metadata": {"namespace": "a", "name": "1"}}]},
+            {"metadata": {},
+             "items": [{"metadata": {"namespace": "b", "name": "2"}}]},
+        ]
+
+        def list_func(**kwargs):
+            return list_config_map_metadata(api, **kwargs)
+
+        pages = list(list_pages(list_func, "x=y", 1))
+
+        assert [p.items[0].metadata.name for p in pages] == ["1", "2"]
+
+    def test_metadata_listing_with_real_client(self):
+        """Test that metadata LISTs work through the installed client's ApiClient."""
+        sys.path.insert(0, str(Path(__file__).parent.parent / "benchmarks"))
+        from fake_kube import FakeKubeAPI
+
+        kube = FakeKubeAPI(count=3, namespaces=1)
+        configuration = k8s_client.Configuration(host=kube.start())
+        try:
+            with k8s_client.ApiClient(configuration) as api_client:
+                api = k8s_client.CoreV1Api(api_client)
+                pages = list(list_pages(partial(list_config_map_metadata, api), "x=y", 2))
+        finally:
+            kube.stop()
+
+        assert [len(page.items) for page in pages] == [2, 1]
+        assert [cm.metadata.name for page in pages for cm in page.items] == [
+            "catalog-0", "catalog-1", "catalog-2"
+        ]
+        assert pages[0].items[0].metadata.resource_version == "1"
+        assert pages[0].items[0].data is None
+
+
+class TestNamespacedInformer:
+    """Tests for per-namespace list/watch."""
+
+    @pytest.fixture
+    def namespaced_api(self, api, make_cm):
+        pages = {
+            "team-a": [make_cm("team-a", "x")],
+            "team-b": [make_cm("team-b", "y"), make_cm("team-b", "z")],
+        }
+        api.list_namespaced_config_map.side_effect = (
+            lambda namespace, **kwargs: list_response(pages[namespace])
+        )
+        return api
+
+    def test_namespace_informer_lists_one_namespace(self, api, make_cm):
+        """Test that a namespace-scoped informer never lists cluster-wide."""
+        api.list_namespaced_config_map.return_value = list_response([make_cm("team-a", "x")])
+        informer = ConfigMapInformer(api, "x=y", namespace="team-a")
+
+        informer.relist()
+
+        api.list_config_map_for_all_namespaces.assert_not_called()
+        assert api.list_namespaced_config_map.call_args.kwargs["namespace"] == "team-a"
+        assert informer.get("team-a", "x") is not None
+
+    def test_merges_namespaces(self, namespaced_api):
+        """Test that ConfigMaps from each namespace appear in one view."""
+        informer = NamespacedInformer(namespaced_api, "x=y", ["team-b", "team-a"])
+        listener = Mock()
+        informer.add_listener(listener)
+        with patch.object(ConfigMapInformer, "start", ConfigMapInformer.relist):
+            informer.sync_namespaces()
+
+        assert informer.synced
+        assert informer.keys() == [("team-a", "x"), ("team-b", "y"), ("team-b", "z")]
+        assert informer.get("team-b", "y") is not None
+        assert informer.get("elsewhere", "y") is None
+        assert len(informer) == 3
+        assert listener.call_count == 3
+
+    def test_namespace_selector_adds_and_drops(self, namespaced_api, make_cm):
+        """Test that namespaces leaving the selector are reported DELETED."""
+        namespaced_api.list_namespace.side_effect = [
+            namespace_list("team-a", "team-b"), namespace_list("team-b"),
+        ]
+        informer = NamespacedInformer(namespaced_api, "x=y", namespace_selector="catalog=true")
+        listener = Mock()
+
+        with patch.object(ConfigMapInformer, "start", ConfigMapInformer.relist):
+            informer.sync_namespaces()
+            informer.add_listener(listener)
+            informer.sync_namespaces()
+
+        namespaced_api.list_namespace.assert_called_with(label_selector="catalog=true")
+        assert informer.keys() == [("team-b", "y"), ("team-b", "z")]
+        listener.assert_called_once()
+        assert listener.call_args.args[:2] == ("DELETED", ("team-a", "x"))
+
+
+class TestSnapshots:
+    """Tests for warm-starting from a snapshot."""
+
+    def test_restore_serves_and_resumes_watch(self, informer, api, make_cm):
+        """Test that a restored informer is synced and watches from the saved version."""
+        api.list_config_map_for_all_namespaces.return_value = list_response(
+            [make_cm("default", "a", {"k": "v"}, "40")], "42"
+        )
+        informer.relist()
+        restored = ConfigMapInformer(api, "eda.io/backstage-catalog=true")
+        listener = Mock()
+        restored.add_listener(listener)
+
+        restored.restore(informer.snapshot())
+
+        assert restored.synced
+        assert restored.get("default", "a").data == {"k": "v"}
+        assert restored.get("default", "a").metadata.resource_version == "40"
+        listener.assert_called_once()
+        with patch("informer.watch.Watch") as mock_watch:
+            mock_watch.return_value.stream.return_value = iter([])
+            restored.watch_once()
+            assert mock_watch.return_value.stream.call_args.kwargs["resource_version"] == "42"
+
+    def test_namespaced_restore(self, api, make_cm):
+        """Test that per-namespace state is restored and watched once started."""
+        api.list_namespaced_config_map.return_value = list_response(
+            [make_cm("team-a", "x")], "7"
+        )
+        source = NamespacedInformer(api, "x=y", ["team-a"])
+        with patch.object(ConfigMapInformer, "start", ConfigMapInformer.relist):
+            source.sync_namespaces()
+        restored = NamespacedInformer(api, "x=y", ["team-a"])
+
+        restored.restore(source.snapshot())
+
+        assert restored.synced
+        assert restored.keys() == [("team-a", "x")]
+        with patch.object(ConfigMapInformer, "start") as start:
+            restored.sync_namespaces()
+        start.assert_called_once()
@@ -0,0 +1,91 @@
+import pytest
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from kubernetes import client as k8s_client
+from prometheus_client import CollectorRegistry, REGISTRY
+
+from metrics import StatsCollector, kube_call
+
+
+def sample(name, labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class TestKubeCall:
+    """Tests for counting and timing Kubernetes API calls."""
+
+    def test_success_counted_and_timed(self):
+        """Test that a successful call increments the success counter."""
+        before = sample("catalog_api_kube_requests_total",
+                        {"operation": "read", "outcome": "success"})
+        timed = sample("catalog_api_kube_request_duration_seconds_count",
+                       {"operation": "read"})
+
+        with kube_call("read"):
+            pass
+
+        assert sample("catalog_api_kube_requests_total",
+                      {"operation": "read", "outcome": "success"}) == before + 1
+        assert sample("catalog_api_kube_request_duration_seconds_count",
+                      {"operation": "read"}) == timed + 1
+
+    def test_api_error_outcome_is_status(self):
+        """Test that API errors are labelled with their HTTP status."""
+        before = sample("catalog_api_kube_requests_total",
+                        {"operation": "read", "outcome": "404"})
+
+        with pytest.raises(k8s_client.exceptions.ApiException):
+            with kube_call("read"):
+                raise k8s_client.exceptions.ApiException(status=404, reason="Not Found")
+
+        assert sample("catalog_api_kube_requests_total",
+                      {"operation": "read", "outcome": "404"}) == before + 1
+
+    def test_watch_not_timed(self):
+        """Test that watches are counted but kept out of the latency histogram."""
+        with kube_call("watch"):
+            pass
+
+        assert REGISTRY.get_sample_value(
+            "catalog_api_kube_request_duration_seconds_count", {"operation": "watch"}
+        ) is None
+
+
+class TestStatsCollector:
+    """Tests for exporting cache stats."""
+
+    def test_exports_cache_and_informer_stats(self):
+        """Test that /-/stats numbers become labelled metrics."""
+        cache = {"hits": 3, "misses": 1, "entries": 2, "bytes": 100}
+        registry = CollectorRegistry()
+        registry.register(StatsCollector(lambda: {
+            "render_cache": cache,
+            "read_cache": {"hits": 0, "misses": 5, "entries": 0, "bytes": 0},
+            "single_flight": {"leaders": 4, "followers": 6, "in_flight": 0},
+            "last_good": {"served": 2, "entries": 1, "bytes": 10},
+            "rate_limit": {"tokens": 1.0, "rejected": 3},
+            "circuit_breaker": {"state": "open", "failures": 5, "opened": 1},
+            "backstage_refresh": {"pending": 0, "sent": 8, "failed": 1},
+            "interned_values": {"values": 2, "bytes": 300, "saved_bytes": 1200},
+            "configmaps": 7,
+        }))
+
+        assert registry.get_sample_value(
+            "catalog_api_cache_hits_total", {"cache": "render"}) == 3
+        assert registry.get_sample_value(
+            "catalog_api_cache_misses_total", {"cache": "read"}) == 5
+        assert registry.get_sample_value(
+            "catalog_api_cache_bytes", {"cache": "render"}) == 100
+        assert registry.get_sample_value(
+            "catalog_api_single_flight_calls_total", {"role": "follower"}) == 6
+        assert registry.get_sample_value("catalog_api_tracked_configmaps") == 7
+        assert registry.get_sample_value("catalog_api_stale_responses_total") == 2
+        assert registry.get_sample_value("catalog_api_circuit_open") == 1
+        assert registry.get_sample_value(
+            "catalog_api_backstage_refreshes_total", {"result": "failed"}) == 1
+        assert registry.get_sample_value(
+            "catalog_api_interned_value_bytes", {"kind": "saved"}) == 1200
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import threading
+import time
+import pytest
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from refresh import RefreshNotifier, location_ref
+
+
+@pytest.fixture
+def backstage():
+    """A stub Backstage catalog backend recording refresh requests."""
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            received.append((self.path, self.headers.get("Authorization"), body["entityRef"]))
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/api/catalog", received
+    server.shutdown()
+
+
+class TestLocationRef:
+    """Tests for naming the Locations Backstage generates."""
+
+    def test_matches_backstage_generated_name(self):
+        """Test that refs follow Backstage's generated-<sha1> naming."""
+        digest = hashlib.sha1(b"url:http://catalog/default/a").hexdigest()
+
+        assert location_ref("http://catalog/default/a") == f"location:default/generated-{digest}"
+
+
+class TestRefreshNotifier:
+    """Tests for batching refresh calls to Backstage."""
+
+    def test_flush_sends_each_target_once(self, backstage):
+        """Test that queued targets are de-duplicated into one refresh per target."""
+        url, received = backstage
+        notifier = RefreshNotifier(url, token="secret")
+        notifier.queue(["http://catalog/default/a", "http://catalog/"])
+        notifier.queue(["http://catalog/default/a"])
+        notifier.queue(["http://catalog/default/b", "http://catalog/"])
+
+        assert notifier.flush() == 3
+
+        assert sorted(ref for _, _, ref in received) == sorted(
+            location_ref(t) for t in ("http://catalog/default/a", "http://catalog/default/b",
+                                      "http://catalog/"))
+        assert {(path, auth) for path, auth, _ in received} == {
+            ("/api/catalog/refresh", "Bearer secret")}
+        assert notifier.stats() == {"pending": 0, "sent": 3, "failed": 0}
+
+    def test_failures_are_counted(self):
+        """Test that an unreachable Backstage is logged and counted, not raised."""
+        notifier = RefreshNotifier("http://127.0.0.1:1/api/catalog", timeout=1)
+        notifier.queue(["http://catalog/default/a", "http://catalog/"])
+
+        notifier.flush()
+
+        assert notifier.stats()["failed"] == 2
+
+    def test_background_thread_batches_a_burst(self, backstage):
+        """Test that targets queued within the window go out together."""
+        url, received = backstage
+        notifier = RefreshNotifier(url, window=0.2)
+        notifier.start()
+        try:
+            for name in ("a", "b", "c"):
+                notifier.queue([f"http://catalog/default/{name}", "http://catalog/"])
+            deadline = time.monotonic() + 5
+            while notifier.stats()["sent"] < 4 and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            notifier.stop()
+
+        assert len(received) == 4
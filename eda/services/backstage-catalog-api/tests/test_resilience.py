@@ -0,0 +1,117 @@
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from resilience import CircuitBreaker, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket:
+    """Tests for the client-side rate limit."""
+
+    def test_burst_then_paced(self):
+        """Test that a full bucket allows a burst and then spaces calls out."""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, burst=2, clock=clock)
+
+        assert bucket.reserve(1) == 0
+        assert bucket.reserve(1) == 0
+        assert bucket.reserve(1) == pytest.approx(0.1)
+        assert bucket.reserve(1) == pytest.approx(0.2)
+
+    def test_refills_over_time(self):
+        """Test that tokens come back at the configured rate."""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, burst=1, clock=clock)
+        bucket.reserve(1)
+
+        clock.now = 0.1
+
+        assert bucket.reserve(1) == 0
+
+    def test_rejects_when_wait_too_long(self):
+        """Test that calls which would wait past max_wait are refused."""
+        bucket = TokenBucket(rate=1, burst=1, clock=FakeClock())
+        bucket.reserve(0)
+
+        assert bucket.reserve(0.5) is None
+        assert bucket.stats()["rejected"] == 1
+
+    def test_zero_rate_disables(self):
+        """Test that a rate of 0 never waits."""
+        bucket = TokenBucket(rate=0, burst=0)
+
+        assert asyncio.run(bucket.acquire(0)) is True
+
+
+class TestCircuitBreaker:
+    """Tests for the circuit breaker state machine."""
+
+    def test_opens_after_consecutive_failures(self):
+        """Test that the threshold of consecutive failures opens the breaker."""
+        breaker = CircuitBreaker(threshold=2, clock=FakeClock())
+
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+
+        assert not breaker.allow()
+        assert breaker.stats() == {"state": "open", "failures": 2, "opened": 1}
+
+    def test_half_open_trial(self):
+        """Test that after the timeout one trial call decides the state."""
+        clock = FakeClock()
+        breaker = CircuitBreaker(threshold=1, reset_timeout=30, clock=clock)
+        breaker.record_failure()
+
+        clock.now = 30
+        assert breaker.allow()
+        assert not breaker.allow()
+        breaker.record_failure()
+        assert not breaker.allow()
+
+        clock.now = 60
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.allow()
+        assert breaker.state == "closed"
+
+    def test_abandoned_trial_is_offered_again(self):
+        """Test that a trial call that wasn't made doesn't leave it half-open."""
+        clock = FakeClock()
+        breaker = CircuitBreaker(threshold=1, reset_timeout=30, clock=clock)
+        breaker.record_failure()
+
+        clock.now = 30
+        assert breaker.allow()
+        breaker.abandon()
+
+        assert breaker.state == "open"
+        assert breaker.allow()
+
+    def test_retry_after(self):
+        """Test that an open breaker says how long until its trial call."""
+        clock = FakeClock()
+        breaker = CircuitBreaker(threshold=1, reset_timeout=30, clock=clock)
+        assert breaker.retry_after() is None
+
+        breaker.record_failure()
+        clock.now = 10
+        assert breaker.retry_after() == 20
+
+        clock.now = 30
+        breaker.allow()
+        assert breaker.retry_after() is None
@@ -0,0 +1,114 @@
+import pytest
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import shared
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "catalog.shared")
+
+
+class TestPublish:
+    """Tests for publishing ConfigMaps and mapping them back."""
+
+    def test_round_trip(self, path, make_cm):
+        """Test that published ConfigMaps read back with their rendered YAML."""
+        shared.publish(path, [
+            make_cm("default", "a", {"x.yaml": "kind: Component", "y.yaml": "kind: Ü"}, "7"),
+            make_cm("team", "b", None, "8"),
+        ], {"epoch": "e"})
+        catalog = shared.SharedCatalog(path)
+
+        assert catalog.refresh()
+
+        cm = catalog.get("default", "a")
+        assert cm.metadata.resource_version == "7"
+        assert dict(cm.data) == {"x.yaml": "kind: Component", "y.yaml": "kind: Ü"}
+        assert bytes(cm.rendered) == "kind: Component\nkind: Ü\n".encode()
+        assert not catalog.get("team", "b").data
+        assert catalog.keys() == [("default", "a"), ("team", "b")]
+        assert catalog.changes == {"epoch": "e"}
+        assert catalog.synced
+        assert [p.name for p in Path(path).parent.iterdir()] == ["catalog.shared"]
+
+    def test_refresh_only_when_republished(self, path, make_cm):
+        """Test that an unchanged file isn't mapped again."""
+        shared.publish(path, [make_cm("default", "a", {"k": "v"})])
+        catalog = shared.SharedCatalog(path)
+        catalog.refresh()
+
+        assert not catalog.refresh()
+
+    def test_refresh_notifies_differences(self, path, make_cm):
+        """Test that listeners see what changed between published files."""
+        shared.publish(path, [make_cm("default", "a", {"k": "v"}, "1"),
+                              make_cm("default", "b", {"k": "v"}, "1")])
+        catalog = shared.SharedCatalog(path)
+        catalog.refresh()
+        events = []
+        catalog.add_listener(lambda event_type, key, cm: events.append((event_type, key)))
+
+        shared.publish(path, [make_cm("default", "a", {"k": "v2"}, "2"),
+                              make_cm("default", "c", {"k": "v"}, "1")])
+        catalog.refresh()
+
+        assert sorted(events) == [("ADDED", ("default", "c")),
+                                  ("DELETED", ("default", "b")),
+                                  ("MODIFIED", ("default", "a"))]
+
+    def test_listener_replay(self, path, make_cm):
+        """Test that a late listener can first catch up on what's mapped."""
+        shared.publish(path, [make_cm("default", "a", {"k": "v"})])
+        catalog = shared.SharedCatalog(path)
+        catalog.refresh()
+        events = []
+
+        catalog.add_listener(lambda event_type, key, cm: events.append((event_type, key)),
+                             replay=True)
+
+        assert events == [("ADDED", ("default", "a"))]
+
+    def test_earlier_views_stay_valid(self, path, make_cm):
+        """Test that a ConfigMap held across a republish keeps its contents."""
+        shared.publish(path, [make_cm("default", "a", {"k": "old"})])
+        catalog = shared.SharedCatalog(path)
+        catalog.refresh()
+        held = catalog.get("default", "a")
+
+        shared.publish(path, [make_cm("default", "a", {"k": "new"}, "2")])
+        catalog.refresh()
+
+        assert bytes(held.rendered) == b"old\n"
+        assert bytes(catalog.get("default", "a").rendered) == b"new\n"
+
+    def test_missing_and_corrupt_files(self, path):
+        """Test that an unusable file leaves the catalog unsynced."""
+        catalog = shared.SharedCatalog(path)
+        assert not catalog.refresh()
+
+        Path(path).write_bytes(b"not a shared file at all, no.........")
+        assert not catalog.refresh()
+        assert not catalog.synced
+
+    def test_unwritable_path(self, tmp_path, make_cm):
+        """Test that a failed publish is reported as None, not raised."""
+        assert shared.publish(str(tmp_path / "missing" / "f"), [make_cm("d", "a")]) is None
+
+
+class TestWatcherLock:
+    """Tests for electing one watcher among worker processes."""
+
+    def test_single_holder(self, path):
+        """Test that only one lock holder exists until it releases."""
+        first, second = shared.WatcherLock(path), shared.WatcherLock(path)
+
+        assert first.acquire()
+        assert not second.acquire()
+        first.release()
+        assert second.acquire()
+        second.release()
@@ -0,0 +1,48 @@
+import gzip
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import snapshot
+
+SCOPE = {"labelSelector": "x=y", "namespaces": [], "namespaceSelector": ""}
+STATE = {"resourceVersion": "42", "configmaps": [
+    {"namespace": "default", "name": "a", "resourceVersion": "40", "data": {"k": "v"}},
+]}
+
+
+class TestSnapshotFile:
+    """Tests for writing and reading snapshot files."""
+
+    def test_round_trip(self, tmp_path):
+        """Test that a saved snapshot loads back unchanged."""
+        path = tmp_path / "snapshot.json.gz"
+
+        assert snapshot.save(str(path), SCOPE, STATE)
+
+        assert snapshot.load(str(path), SCOPE) == STATE
+        assert [p.name for p in tmp_path.iterdir()] == ["snapshot.json.gz"]
+
+    def test_missing_file(self, tmp_path):
+        """Test that a missing snapshot loads as None."""
+        assert snapshot.load(str(tmp_path / "none"), SCOPE) is None
+
+    def test_different_scope_ignored(self, tmp_path):
+        """Test that a snapshot of a different selector isn't used."""
+        path = str(tmp_path / "snapshot.json.gz")
+        snapshot.save(path, SCOPE, STATE)
+
+        assert snapshot.load(path, {**SCOPE, "namespaces": ["team-a"]}) is None
+
+    def test_corrupt_file_ignored(self, tmp_path):
+        """Test that an unreadable snapshot loads as None."""
+        path = tmp_path / "snapshot.json.gz"
+        path.write_bytes(gzip.compress(b"{not json"))
+
+        assert snapshot.load(str(path), SCOPE) is None
+
+    def test_unwritable_path_reported(self, tmp_path):
+        """Test that a failed save returns False instead of raising."""
+        assert snapshot.save(str(tmp_path / "missing" / "s.gz"), SCOPE, STATE) is False